@@ -0,0 +1,49 @@
+"""In-process stand-in for Supabase used by the benchmarks.
+
+FakeBackend is the embedded SQLite backend (same table/rpc API the DAOs call) on an
+in-memory database, with every request counted as one round trip, its request and response
+bodies measured as the JSON PostgREST would send, and an optional sleep per request to model
+network latency.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import json
+import time
+from typing import Dict
+from backends.sqlite_backend import SQLiteBackend, Response
+
+def _json_size(value) -> int:
+    if value is None:
+        return 0
+    return len(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+class FakeBackend(SQLiteBackend):
+    def __init__(self, latency: float = 0.0):
+        super().__init__(":memory:")
+        self.latency = latency
+        self.reset()
+
+    def reset(self) -> None:
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.by_table: Dict[str, int] = {}
+
+    def stats(self) -> Dict:
+        return {
+            "round_trips": self.round_trips,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "by_table": dict(self.by_table),
+        }
+
+    def _run(self, query) -> Response:
+        name = getattr(query, "_table", None) or f"rpc:{getattr(query, '_fn', '?')}"
+        self.round_trips += 1
+        self.by_table[name] = self.by_table.get(name, 0) + 1
+        self.bytes_sent += _json_size(getattr(query, "_payload", None) or getattr(query, "_params", None))
+        if self.latency:
+            time.sleep(self.latency)
+        resp = super()._run(query)
+        self.bytes_received += _json_size(resp.data)
+        return resp
@@ -0,0 +1,173 @@
+"""Benchmarks for the core service operations against the in-process FakeBackend.
+
+Usage (from the project root):
+    python bench/run.py                                  # default scenarios, JSON to stdout
+    python bench/run.py --sizes 500x20x4096 --latency 0.005 --out after.json
+    python bench/run.py --out after.json --compare before.json
+
+A scenario FILESxCOMMITSxSIZE builds a repository with FILES files of SIZE bytes and COMMITS
+commits (each touching 5% of the files), then measures make_commit, list_commits,
+show_history_page, merge_branches and rollback_commit. Each measurement records wall time,
+round trips, request/response bytes and peak Python memory (tracemalloc), starting from
+cold caches unless --warm is given.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+sys.path.append(os.path.join(os.getcwd(), 'bench'))
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+import config
+from dao.blob_dao import content_hash
+from dao.cache import clear_caches
+from fake_backend import FakeBackend
+
+DEFAULT_SIZES = "100x10x1024,1000x20x1024,200x5x65536"
+METRICS = ("wall_s", "round_trips", "bytes_sent", "bytes_received", "peak_memory_bytes")
+
+def _content(file_no: int, revision: int, size: int) -> str:
+    line = f"file {file_no} revision {revision} " + "x" * 40 + "\n"
+    return (line * (size // len(line) + 1))[:size]
+
+def _file_row(repo_id: int, file_no: int, revision: int, size: int) -> Dict:
+    content = _content(file_no, revision, size)
+    return {"repo_id": repo_id, "filename": f"f{file_no}.txt", "content": content,
+            "content_hash": content_hash(content), "size": len(content.encode("utf-8"))}
+
+def _touch(vcs, files: List[Dict], start: int, count: int, revision: int, size: int) -> None:
+    """Rewrite `count` files (wrapping around) with new content, without measuring it."""
+    rows = []
+    for i in range(count):
+        f = files[(start + i) % len(files)]
+        file_no = int(f["filename"][1:-4])
+        rows.append({**_file_row(f["repo_id"], file_no, revision, size), "file_id": f["file_id"]})
+    vcs.file.upsert_files(rows)
+
+def run_scenario(n_files: int, n_commits: int, size: int, latency: float, warm: bool,
+                 memory: bool = True) -> List[Dict]:
+    from services.vcs_services import VCSService
+    from services.branch_services import BranchService
+    from services.history_services import HistoryService
+
+    backend = FakeBackend()
+    config.set_backend(backend)
+    vcs, branches, history = VCSService(), BranchService(), HistoryService()
+
+    # ---- setup (not measured) ----
+    repo = vcs.create_repo(f"bench-{n_files}x{n_commits}x{size}")
+    rid = repo["repo_id"]
+    for start in range(0, n_files, 500):
+        rows = [_file_row(rid, i, 0, size) for i in range(start, min(n_files, start + 500))]
+        backend.table("file").insert(rows).execute()
+    files = vcs.file.list_file_meta(rid)
+    first = vcs.make_commit(rid, "initial")
+    per_commit = max(1, n_files // 20)
+    for c in range(1, n_commits):
+        _touch(vcs, files, c * per_commit, per_commit, c, size)
+        vcs.make_commit(rid, f"commit {c}")
+    head = vcs.commit.get_latest_commit(rid)
+    main = branches.add_branch(rid, "main", head["commit_id"])
+    topic = branches.add_branch(rid, "topic", head["commit_id"])
+    # The branches change different files, so merging them is clean
+    _touch(vcs, files, 0, per_commit, n_commits + 1, size)
+    vcs.make_commit(rid, "topic change", branch_id=topic["branch_id"])
+    vcs.rollback_commit(head["commit_id"])
+    _touch(vcs, files, per_commit, per_commit, n_commits + 2, size)
+
+    operations: List[Tuple[str, Callable]] = [
+        ("make_commit", lambda: vcs.make_commit(rid, "measured", branch_id=main["branch_id"])),
+        ("list_commits", lambda: vcs.list_commits(rid)),
+        ("show_history_page", lambda: history.show_history_page(rid, 50)),
+        ("merge_branches", lambda: branches.merge_branches(topic["branch_id"], main["branch_id"])),
+        ("rollback_commit", lambda: vcs.rollback_commit(first["commit_id"])),
+    ]
+    scenario = {"files": n_files, "commits": n_commits, "file_size": size, "latency_s": latency, "warm": warm}
+    results = []
+    backend.latency = latency
+    for name, op in operations:
+        if not warm:
+            clear_caches()
+        backend.reset()
+        if memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        op()
+        wall = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+        results.append({"scenario": scenario, "operation": name, "wall_s": round(wall, 6),
+                        "peak_memory_bytes": peak, **backend.stats()})
+    config.set_backend(None)
+    return results
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(baseline: Dict, current: Dict) -> List[str]:
+    """One line per measurement: each metric's current value and change against the baseline."""
+    def key(r):
+        s = r["scenario"]
+        return (s["files"], s["commits"], s["file_size"], r["operation"])
+    before = {key(r): r for r in baseline["results"]}
+    lines = []
+    for r in current["results"]:
+        old = before.get(key(r))
+        label = "{}x{}x{} {}".format(*key(r))
+        if not old:
+            lines.append(f"{label}: no baseline")
+            continue
+        parts = []
+        for metric in METRICS:
+            new_v, old_v = r.get(metric), old.get(metric)
+            if new_v is None or old_v is None:
+                continue
+            change = f"{(new_v - old_v) / old_v:+.0%}" if old_v else "n/a"
+            parts.append(f"{metric}={new_v} ({change})")
+        lines.append(f"{label}: " + ", ".join(parts))
+    return lines
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CompactVCS service operations")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated FILESxCOMMITSxSIZE scenarios")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--warm", action="store_true", help="keep caches between measurements")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows wall time)")
+    parser.add_argument("--out", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for spec in args.sizes.split(","):
+        n_files, n_commits, size = (int(x) for x in spec.lower().split("x"))
+        results += run_scenario(n_files, n_commits, size, args.latency, args.warm, not args.no_memory)
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print("\n".join(compare(baseline, report)), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Stress test for concurrent committers on one branch.
+
+Usage (from the project root):
+    python bench/stress_commits.py                              # 8 processes x 25 commits on SQLite
+    python bench/stress_commits.py --workers 16 --commits 50 --merge-every 5
+    python bench/stress_commits.py --backend supabase           # against the configured project
+
+Each worker process owns one file of a fresh repository and, for every round, rewrites it
+and commits to the shared `main` branch (with --merge-every N, every Nth round commits on a
+branch of its own instead and merges that into main). Workers run truly in parallel, each
+with its own DAO caches, so branch heads go stale under them. Afterwards the history of main
+is walked and checked: every commit and merge a worker was told succeeded must be reachable
+from the head, the first-parent chain must hold every commit made on main, and the head tree
+must carry each worker's final content. The summary (JSON) reports throughput and how many
+head updates lost a race and were retried; the exit status is 1 if anything was lost.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from typing import Dict, List
+
+def _content(worker: int, round_no: int) -> str:
+    return f"worker {worker} round {round_no}\n"
+
+def _worker(args) -> Dict:
+    """One committer: `commits` rounds of rewrite-and-commit (or branch-commit-merge) on main."""
+    worker, repo_id, file_id, main_id, commits, merge_every = args
+    from services.vcs_services import VCSService
+    from services.branch_services import BranchService, MergeConflictError
+    vcs, branches = VCSService(), BranchService()
+
+    # Count head updates that lost a race: every attempt goes through create_commit_with_files
+    # (or, for fast-forwards, compare_and_set_head), and only a stale head makes it raise
+    from dao.branch_dao import StaleHeadError
+    stale = [0]
+    def counting(fn):
+        def wrapper(*a, **kw):
+            try:
+                return fn(*a, **kw)
+            except StaleHeadError:
+                stale[0] += 1
+                raise
+        return wrapper
+    vcs.commit.create_commit_with_files = counting(vcs.commit.create_commit_with_files)
+    branches.commit.create_commit_with_files = counting(branches.commit.create_commit_with_files)
+    branches.branch.compare_and_set_head = counting(branches.branch.compare_and_set_head)
+
+    on_main: List[int] = []
+    merged: List[int] = []
+    conflicts = 0
+    for round_no in range(1, commits + 1):
+        vcs.update_file(file_id, new_content=_content(worker, round_no))
+        message = f"worker {worker} round {round_no}"
+        if merge_every and round_no % merge_every == 0:
+            head = vcs.branch.get_branch_by_id(main_id)["head_commit_id"]
+            topic = branches.add_branch(repo_id, f"w{worker}-r{round_no}", head)
+            vcs.make_commit(repo_id, message, branch_id=topic["branch_id"])
+            try:
+                merged.append(branches.merge_branches(topic["branch_id"], main_id)["head_commit_id"])
+            except MergeConflictError:
+                # Refused outright (nothing written), so nothing is lost: commit the file on main instead
+                conflicts += 1
+                on_main.append(vcs.make_commit(repo_id, message, branch_id=main_id)["commit_id"])
+        else:
+            on_main.append(vcs.make_commit(repo_id, message, branch_id=main_id)["commit_id"])
+    return {"worker": worker, "on_main": on_main, "merged": merged, "conflicts": conflicts, "stale": stale[0]}
+
+def _verify(repo_id: int, main_id: int, files: Dict[int, int], results: List[Dict], commits: int) -> Dict:
+    """Walk main's history and check nothing a worker committed or merged went missing."""
+    from dao.branch_dao import Branch
+    from dao.commit_dao import Commit
+    from dao.tree_dao import Tree
+    from dao.blob_dao import content_hash
+    commit_dao = Commit()
+    by_id = {c["commit_id"]: c for c in commit_dao.list_commits(repo_id)}
+    head = Branch().get_branch_by_id(main_id)["head_commit_id"]
+
+    reachable, stack = set(), [head]
+    while stack:
+        commit_id = stack.pop()
+        if commit_id is None or commit_id in reachable:
+            continue
+        reachable.add(commit_id)
+        stack += [by_id[commit_id].get("parent_id"), by_id[commit_id].get("merge_parent_id")]
+    first_parent, commit_id = set(), head
+    while commit_id is not None:
+        first_parent.add(commit_id)
+        commit_id = by_id[commit_id].get("parent_id")
+
+    on_main = [c for r in results for c in r["on_main"]]
+    merged = [c for r in results for c in r["merged"]]
+    tree = Tree().get_commit_tree(by_id[head])
+    stale_content = [w for w, file_id in files.items()
+                     if tree.get(file_id, {}).get("blob_hash") != content_hash(_content(w, commits))]
+    return {
+        "head_commit_id": head,
+        "lost_commits": sorted(set(on_main) - first_parent),
+        "lost_merges": sorted(set(merged) - reachable),
+        "stale_files": stale_content,
+        "first_parent_length": len(first_parent),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent committers on one branch")
+    parser.add_argument("--workers", type=int, default=8, help="committing processes")
+    parser.add_argument("--commits", type=int, default=25, help="rounds per worker")
+    parser.add_argument("--merge-every", type=int, default=0, help="every Nth round commits on a topic branch and merges it")
+    parser.add_argument("--backend", choices=["sqlite", "supabase"], default="sqlite")
+    parser.add_argument("--db", help="SQLite database path (default: a fresh temporary file)")
+    args = parser.parse_args()
+
+    # Set before config is imported, here and (through the environment) in every worker
+    os.environ["storage_backend"] = args.backend
+    os.environ.pop("journal_path", None)
+    if args.backend == "sqlite":
+        os.environ["sqlite_path"] = args.db or os.path.join(tempfile.mkdtemp(prefix="compactvcs-stress-"), "stress.db")
+    from services.vcs_services import VCSService
+    from services.branch_services import BranchService
+
+    vcs = VCSService()
+    repo = vcs.create_repo(f"stress-{int(time.time())}")
+    repo_id = repo["repo_id"]
+    files = {w: vcs.add_file(repo_id, f"worker{w}.txt", _content(w, 0))["file_id"] for w in range(args.workers)}
+    initial = vcs.make_commit(repo_id, "initial")
+    main_id = BranchService().add_branch(repo_id, "main", initial["commit_id"])["branch_id"]
+
+    jobs = [(w, repo_id, files[w], main_id, args.commits, args.merge_every) for w in range(args.workers)]
+    start = time.perf_counter()
+    # spawn: workers import the storage client afresh instead of sharing the parent's connection
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        results = pool.map(_worker, jobs)
+    wall = time.perf_counter() - start
+
+    check = _verify(repo_id, main_id, files, results, args.commits)
+    total = sum(len(r["on_main"]) + len(r["merged"]) for r in results)
+    summary = {
+        "backend": args.backend,
+        "workers": args.workers,
+        "rounds_per_worker": args.commits,
+        "commits_on_main": sum(len(r["on_main"]) for r in results),
+        "merges": sum(len(r["merged"]) for r in results),
+        "merge_conflicts": sum(r["conflicts"] for r in results),
+        "stale_head_retries": sum(r["stale"] for r in results),
+        "wall_s": round(wall, 3),
+        "updates_per_second": round(total / wall, 1) if wall else None,
+        **check,
+        "ok": not (check["lost_commits"] or check["lost_merges"] or check["stale_files"]),
+    }
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+-- Content-addressed blob store: each distinct file body is stored once.
+create table if not exists blob (
+    hash text primary key,
+    content text,
+    size int
+);
+
+alter table commitfile add column if not exists blob_hash text references blob(hash);
+alter table commitfile alter column content drop not null;
+create index if not exists commitfile_blob_hash_idx on commitfile (blob_hash);
+
+-- Existing rows keep their inline content until `MigrationService.migrate_commitfile_blobs()`
+-- moves it into `blob` and clears `commitfile.content`.
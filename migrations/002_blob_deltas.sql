@@ -0,0 +1,5 @@
+-- Delta storage mode (blob_storage_mode=delta): a blob either holds full `content`
+-- (a keyframe, depth 0) or a line `delta` against `base_hash` at depth base.depth + 1.
+alter table blob add column if not exists base_hash text references blob(hash);
+alter table blob add column if not exists delta text;
+alter table blob add column if not exists depth int not null default 0;
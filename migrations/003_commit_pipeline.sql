@@ -0,0 +1,25 @@
+-- Atomic commit pipeline: the commit row and all of its commitfile rows are written by
+-- one function call, i.e. one HTTP round trip and one transaction.
+create or replace function create_commit_with_files(p_repo_id int, p_message text, p_files jsonb)
+returns json
+language plpgsql
+as $$
+declare
+    v_commit "commit";
+begin
+    insert into "commit" (repo_id, message)
+    values (p_repo_id, p_message)
+    returning * into v_commit;
+
+    insert into commitfile (commit_id, file_id, version_number, blob_hash)
+    select v_commit.commit_id,
+           (f->>'file_id')::int,
+           (f->>'version_number')::int,
+           f->>'blob_hash'
+    from jsonb_array_elements(coalesce(p_files, '[]'::jsonb)) as f;
+
+    return row_to_json(v_commit);
+end;
+$$;
+
+create index if not exists commitfile_commit_id_idx on commitfile (commit_id);
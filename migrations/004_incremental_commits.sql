@@ -0,0 +1,31 @@
+-- Incremental commits: files carry the hash of their current content, commits point at a
+-- tree blob listing every file, and commitfile only holds versions that actually changed.
+alter table file add column if not exists content_hash text;
+alter table "commit" add column if not exists tree_hash text references blob(hash);
+create index if not exists file_repo_id_idx on file (repo_id);
+create index if not exists commitfile_file_version_idx on commitfile (file_id, version_number);
+
+drop function if exists create_commit_with_files(int, text, jsonb);
+create or replace function create_commit_with_files(p_repo_id int, p_message text, p_files jsonb, p_tree_hash text default null)
+returns json
+language plpgsql
+as $$
+declare
+    v_commit "commit";
+begin
+    insert into "commit" (repo_id, message, tree_hash)
+    values (p_repo_id, p_message, p_tree_hash)
+    returning * into v_commit;
+
+    insert into commitfile (commit_id, file_id, version_number, blob_hash)
+    select v_commit.commit_id,
+           (f->>'file_id')::int,
+           (f->>'version_number')::int,
+           f->>'blob_hash'
+    from jsonb_array_elements(coalesce(p_files, '[]'::jsonb)) as f;
+
+    return row_to_json(v_commit);
+end;
+$$;
+
+-- Existing files get their content_hash from `MigrationService.backfill_file_hashes()`.
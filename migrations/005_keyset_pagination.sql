@@ -0,0 +1,3 @@
+-- Keyset pagination: each page is a range scan on these indexes.
+create index if not exists commit_repo_timestamp_idx on "commit" (repo_id, timestamp desc, commit_id desc);
+create index if not exists file_repo_file_id_idx on file (repo_id, file_id desc);
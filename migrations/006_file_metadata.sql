@@ -0,0 +1,3 @@
+-- Metadata-only listings: files carry their content size so listings can skip content.
+alter table file add column if not exists size int;
+update file set size = octet_length(content) where size is null and content is not null;
@@ -0,0 +1,60 @@
+-- Commit DAG: commits record their parent(s) and a generation number
+-- (1 for a root commit, otherwise 1 + the highest parent generation). A commit can only be an
+-- ancestor of commits with a higher generation, which bounds every ancestry walk.
+alter table "commit" add column if not exists parent_id int references "commit"(commit_id);
+alter table "commit" add column if not exists merge_parent_id int references "commit"(commit_id);
+alter table "commit" add column if not exists generation int;
+create index if not exists commit_repo_generation_idx on "commit" (repo_id, generation desc);
+
+-- Existing history was linear per repository: chain it in (timestamp, commit_id) order
+update "commit" c
+set parent_id = x.prev_id, generation = x.gen
+from (
+    select commit_id,
+           lag(commit_id) over w as prev_id,
+           row_number() over w as gen
+    from "commit"
+    window w as (partition by repo_id order by timestamp, commit_id)
+) x
+where c.commit_id = x.commit_id and c.generation is null;
+
+drop function if exists create_commit_with_files(int, text, jsonb, text);
+create or replace function create_commit_with_files(
+    p_repo_id int,
+    p_message text,
+    p_files jsonb,
+    p_tree_hash text default null,
+    p_parent_id int default null,
+    p_merge_parent_id int default null,
+    p_branch_id int default null
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_commit "commit";
+    v_generation int;
+begin
+    select coalesce(max(generation), 0) + 1 into v_generation
+    from "commit"
+    where commit_id in (p_parent_id, p_merge_parent_id);
+
+    insert into "commit" (repo_id, message, tree_hash, parent_id, merge_parent_id, generation)
+    values (p_repo_id, p_message, p_tree_hash, p_parent_id, p_merge_parent_id, v_generation)
+    returning * into v_commit;
+
+    insert into commitfile (commit_id, file_id, version_number, blob_hash)
+    select v_commit.commit_id,
+           (f->>'file_id')::int,
+           (f->>'version_number')::int,
+           f->>'blob_hash'
+    from jsonb_array_elements(coalesce(p_files, '[]'::jsonb)) as f;
+
+    -- Advancing the branch in the same transaction keeps head and history consistent
+    if p_branch_id is not null then
+        update branch set head_commit_id = v_commit.commit_id where branch_id = p_branch_id;
+    end if;
+
+    return row_to_json(v_commit);
+end;
+$$;
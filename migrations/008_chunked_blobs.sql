@@ -0,0 +1,3 @@
+-- Chunked blobs: a large body is stored as a manifest row whose `chunks` lists the hashes of
+-- its content-defined chunks (ordinary blob rows), in order. `content` is null on manifests.
+alter table blob add column if not exists chunks text;
@@ -0,0 +1,43 @@
+-- Content search: a trigram index over every blob committed to a repository.
+-- search_doc numbers the blobs of a repo; a blob becomes `indexed` once all its trigrams are
+-- stored. Blobs too large to index (or interrupted mid-way) stay unindexed and are always
+-- returned as candidates, then scanned.
+create table if not exists search_doc (
+    doc_id bigserial primary key,
+    repo_id int not null references repository(repo_id) on delete cascade,
+    blob_hash text not null,
+    indexed boolean not null default false,
+    unique (repo_id, blob_hash)
+);
+
+create table if not exists search_trigram (
+    repo_id int not null references repository(repo_id) on delete cascade,
+    trigram text not null,
+    doc_id bigint not null references search_doc(doc_id) on delete cascade,
+    primary key (repo_id, trigram, doc_id)
+);
+
+-- Blobs of a repo containing every given (case-folded) trigram, plus the unindexed ones.
+-- Without trigrams every blob of the repo is a candidate.
+create or replace function search_blobs(p_repo_id int, p_trigrams text[])
+returns table (blob_hash text)
+language sql
+stable
+as $$
+    select d.blob_hash
+    from search_doc d
+    join (
+        select t.doc_id
+        from search_trigram t
+        where t.repo_id = p_repo_id
+          and t.trigram = any(p_trigrams)
+        group by t.doc_id
+        having count(*) = cardinality(p_trigrams)
+    ) m on m.doc_id = d.doc_id
+    where coalesce(cardinality(p_trigrams), 0) > 0
+    union
+    select d.blob_hash
+    from search_doc d
+    where d.repo_id = p_repo_id
+      and (not d.indexed or coalesce(cardinality(p_trigrams), 0) = 0);
+$$;
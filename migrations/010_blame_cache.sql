@@ -0,0 +1,8 @@
+-- Blame cache: line provenance of each file version, written once when first computed.
+-- `runs` is a JSON list of [origin_commit_id, line_count] covering the version's lines in order.
+create table if not exists blame_cache (
+    commit_id int not null references "commit"(commit_id) on delete cascade,
+    file_id int not null,
+    runs text not null,
+    primary key (commit_id, file_id)
+);
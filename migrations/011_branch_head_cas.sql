@@ -0,0 +1,53 @@
+-- Compare-and-swap branch heads: create_commit_with_files only advances p_branch_id if its head is
+-- still p_parent_id. Otherwise it writes nothing and returns null, and the caller rebases onto
+-- the new head and retries. Only the one branch row is locked, for the length of the call, so
+-- commits to other branches never wait and no global lock is taken.
+create or replace function create_commit_with_files(
+    p_repo_id int,
+    p_message text,
+    p_files jsonb,
+    p_tree_hash text default null,
+    p_parent_id int default null,
+    p_merge_parent_id int default null,
+    p_branch_id int default null
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_commit "commit";
+    v_generation int;
+begin
+    -- Under read committed, a head moved by a concurrent commit is re-read after its
+    -- transaction ends, so the check fails instead of overwriting it
+    if p_branch_id is not null then
+        perform 1 from branch
+        where branch_id = p_branch_id and head_commit_id is not distinct from p_parent_id
+        for update;
+        if not found then
+            return null;
+        end if;
+    end if;
+
+    select coalesce(max(generation), 0) + 1 into v_generation
+    from "commit"
+    where commit_id in (p_parent_id, p_merge_parent_id);
+
+    insert into "commit" (repo_id, message, tree_hash, parent_id, merge_parent_id, generation)
+    values (p_repo_id, p_message, p_tree_hash, p_parent_id, p_merge_parent_id, v_generation)
+    returning * into v_commit;
+
+    insert into commitfile (commit_id, file_id, version_number, blob_hash)
+    select v_commit.commit_id,
+           (f->>'file_id')::int,
+           (f->>'version_number')::int,
+           f->>'blob_hash'
+    from jsonb_array_elements(coalesce(p_files, '[]'::jsonb)) as f;
+
+    if p_branch_id is not null then
+        update branch set head_commit_id = v_commit.commit_id where branch_id = p_branch_id;
+    end if;
+
+    return row_to_json(v_commit);
+end;
+$$;
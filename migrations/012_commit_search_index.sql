@@ -0,0 +1,74 @@
+-- Commits index their new blobs themselves: create_commit_with_files takes the search entries
+-- ({blob_hash, trigrams}, trigrams null for blobs left unindexed) and writes them in the same
+-- transaction, so a commit costs no extra round trips for search whatever the size of its
+-- changes. Docs are marked indexed together with their trigrams; docs the repository already
+-- has are left as they are.
+drop function if exists create_commit_with_files(int, text, jsonb, text, int, int, int);
+create or replace function create_commit_with_files(
+    p_repo_id int,
+    p_message text,
+    p_files jsonb,
+    p_tree_hash text default null,
+    p_parent_id int default null,
+    p_merge_parent_id int default null,
+    p_branch_id int default null,
+    p_search jsonb default null
+)
+returns json
+language plpgsql
+as $$
+declare
+    v_commit "commit";
+    v_generation int;
+begin
+    -- Under read committed, a head moved by a concurrent commit is re-read after its
+    -- transaction ends, so the check fails instead of overwriting it
+    if p_branch_id is not null then
+        perform 1 from branch
+        where branch_id = p_branch_id and head_commit_id is not distinct from p_parent_id
+        for update;
+        if not found then
+            return null;
+        end if;
+    end if;
+
+    select coalesce(max(generation), 0) + 1 into v_generation
+    from "commit"
+    where commit_id in (p_parent_id, p_merge_parent_id);
+
+    insert into "commit" (repo_id, message, tree_hash, parent_id, merge_parent_id, generation)
+    values (p_repo_id, p_message, p_tree_hash, p_parent_id, p_merge_parent_id, v_generation)
+    returning * into v_commit;
+
+    insert into commitfile (commit_id, file_id, version_number, blob_hash)
+    select v_commit.commit_id,
+           (f->>'file_id')::int,
+           (f->>'version_number')::int,
+           f->>'blob_hash'
+    from jsonb_array_elements(coalesce(p_files, '[]'::jsonb)) as f;
+
+    with entry as (
+        select e->>'blob_hash' as blob_hash, e->'trigrams' as trigrams
+        from jsonb_array_elements(coalesce(p_search, '[]'::jsonb)) as e
+    ), doc as (
+        insert into search_doc (repo_id, blob_hash, indexed)
+        select p_repo_id, entry.blob_hash, jsonb_typeof(entry.trigrams) = 'array'
+        from entry
+        on conflict (repo_id, blob_hash) do nothing
+        returning doc_id, blob_hash, indexed
+    )
+    insert into search_trigram (repo_id, trigram, doc_id)
+    select p_repo_id, t.trigram, doc.doc_id
+    from doc
+    join entry on entry.blob_hash = doc.blob_hash
+    cross join lateral jsonb_array_elements_text(entry.trigrams) as t(trigram)
+    where doc.indexed
+    on conflict do nothing;
+
+    if p_branch_id is not null then
+        update branch set head_commit_id = v_commit.commit_id where branch_id = p_branch_id;
+    end if;
+
+    return row_to_json(v_commit);
+end;
+$$;
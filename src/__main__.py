@@ -0,0 +1,6 @@
+"""Entry point for `python -m src`; see cli.py."""
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cli import main
+
+sys.exit(main())
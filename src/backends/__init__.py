@@ -0,0 +1,3 @@
+from backends.base import StorageBackend, BackendError
+
+__all__ = ["StorageBackend", "BackendError"]
@@ -0,0 +1,16 @@
+"""Storage backend interface the DAOs are written against.
+
+It is the subset of the supabase-py client the DAOs use: `table(name)` returns a PostgREST-style
+query builder (select/insert/upsert/update/delete, eq/neq/gt/gte/lt/lte/in_/is_/or_ filters,
+order/limit/range, execute() -> response with `.data`) and `rpc(fn, params)` calls a server-side
+function. A supabase `Client` satisfies it as-is.
+"""
+from typing import Any, Dict, Optional, Protocol
+
+class BackendError(Exception):
+    pass
+
+class StorageBackend(Protocol):
+    def table(self, table_name: str) -> Any: ...
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> Any: ...
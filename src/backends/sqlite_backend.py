@@ -0,0 +1,479 @@
+"""Embedded SQLite backend exposing the subset of the Supabase/PostgREST table API the DAOs use.
+
+Queries run in-process against one connection (WAL journal, so other processes can read while a
+writer commits). Server-side functions from migrations/*.sql are implemented in Python below.
+"""
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from backends.base import BackendError
+
+
+class Response:
+    """Mirrors postgrest's APIResponse: rows live in `.data`."""
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+# Bound parameters per statement that every SQLite build accepts (SQLITE_MAX_VARIABLE_NUMBER before 3.32)
+MAX_VARIABLES = 999
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _split_top_level(expr: str) -> List[str]:
+    parts, depth, quoted, buf = [], 0, False, []
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append("".join(buf))
+            buf = []
+            continue
+        buf.append(ch)
+    if buf:
+        parts.append("".join(buf))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_logic(expr: str, joiner: str) -> Tuple[str, List]:
+    """Translate a PostgREST logic tree such as `a.lt.1,and(a.eq.1,b.lt.2)` into SQL."""
+    clauses, params = [], []
+    for part in _split_top_level(expr):
+        for kw in ("and", "or"):
+            if part.startswith(kw + "(") and part.endswith(")"):
+                sql, p = _parse_logic(part[len(kw) + 1:-1], " AND " if kw == "and" else " OR ")
+                clauses.append(f"({sql})")
+                params.extend(p)
+                break
+        else:
+            col, op, value = part.split(".", 2)
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            if op == "is":
+                clauses.append(f"{_quote(col)} IS NULL" if value == "null" else f"{_quote(col)} = ?")
+                if value != "null":
+                    params.append(value == "true")
+            elif op == "in":
+                values = _split_top_level(value.strip("()"))
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' for _ in values)})")
+                params.extend(v.strip('"') for v in values)
+            elif op in _OPS:
+                clauses.append(f"{_quote(col)} {_OPS[op]} ?")
+                params.append(value)
+            else:
+                raise BackendError(f"Unsupported filter operator: {op}")
+    return joiner.join(clauses), params
+
+
+class _Query:
+    def __init__(self, backend: "SQLiteBackend", table: str):
+        self._backend = backend
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+        self._where: List[Tuple[str, List]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    # ---- actions ----
+    def select(self, *columns: str, count: Optional[str] = None) -> "_Query":
+        self._action = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        return self
+
+    def insert(self, json: Any, **_: Any) -> "_Query":
+        self._action, self._payload = "insert", json
+        return self
+
+    def upsert(self, json: Any, on_conflict: str = "", ignore_duplicates: bool = False, **_: Any) -> "_Query":
+        self._action, self._payload = "upsert", json
+        self._on_conflict = on_conflict or None
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict, **_: Any) -> "_Query":
+        self._action, self._payload = "update", json
+        return self
+
+    def delete(self, **_: Any) -> "_Query":
+        self._action = "delete"
+        return self
+
+    # ---- filters ----
+    def _filter(self, column: str, op: str, value: Any) -> "_Query":
+        self._where.append((f"{_quote(column)} {_OPS[op]} ?", [value]))
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, "lte", value)
+
+    def in_(self, column: str, values: List[Any]) -> "_Query":
+        values = list(values)
+        if not values:
+            self._where.append(("0", []))
+        else:
+            self._where.append((f"{_quote(column)} IN ({', '.join('?' for _ in values)})", values))
+        return self
+
+    def is_(self, column: str, value: Any) -> "_Query":
+        if value is None or value == "null":
+            self._where.append((f"{_quote(column)} IS NULL", []))
+        else:
+            self._where.append((f"{_quote(column)} = ?", [value in (True, "true")]))
+        return self
+
+    def or_(self, filters: str) -> "_Query":
+        sql, params = _parse_logic(filters, " OR ")
+        self._where.append((f"({sql})", params))
+        return self
+
+    # ---- modifiers ----
+    def order(self, column: str, desc: bool = False, **_: Any) -> "_Query":
+        self._order.append(f"{_quote(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int, **_: Any) -> "_Query":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **_: Any) -> "_Query":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # ---- execution ----
+    def _where_sql(self) -> Tuple[str, List]:
+        if not self._where:
+            return "", []
+        params: List = []
+        for _, p in self._where:
+            params.extend(p)
+        return " WHERE " + " AND ".join(c for c, _ in self._where), params
+
+    @property
+    def writes(self) -> bool:
+        return self._action != "select"
+
+    def execute(self) -> Response:
+        return self._backend._run(self)
+
+    def _execute(self, conn: sqlite3.Connection) -> Response:
+        table = _quote(self._table)
+        where, params = self._where_sql()
+        if self._action == "select":
+            cols = "*" if self._columns.strip() == "*" else ", ".join(
+                _quote(c.strip()) for c in self._columns.split(",") if c.strip()
+            )
+            sql = f"SELECT {cols} FROM {table}{where}"
+            if self._order:
+                sql += " ORDER BY " + ", ".join(self._order)
+            if self._limit is not None:
+                sql += f" LIMIT {int(self._limit)}"
+                if self._offset:
+                    sql += f" OFFSET {int(self._offset)}"
+            return Response([dict(r) for r in conn.execute(sql, params)])
+        if self._action in ("insert", "upsert"):
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            out: List[Dict] = []
+            conflict = ""
+            if self._action == "upsert":
+                target = self._on_conflict or self._backend._primary_key(conn, self._table)
+                target_cols = {c.strip() for c in target.split(",")}
+                conflict = f" ON CONFLICT ({', '.join(_quote(c) for c in target_cols)}) DO "
+            # Consecutive rows with the same columns go in one multi-row statement
+            i = 0
+            while i < len(rows):
+                cols = list(rows[i].keys())
+                j = i + 1
+                limit = max(1, MAX_VARIABLES // max(1, len(cols)))
+                while j < len(rows) and j - i < limit and list(rows[j].keys()) == cols:
+                    j += 1
+                group = rows[i:j]
+                values = ", ".join(["(" + ", ".join("?" for _ in cols) + ")"] * len(group))
+                sql = f"INSERT INTO {table} ({', '.join(_quote(c) for c in cols)}) VALUES {values}"
+                if conflict:
+                    updates = [c for c in cols if c not in target_cols]
+                    if self._ignore_duplicates or not updates:
+                        sql += conflict + "NOTHING"
+                    else:
+                        sql += conflict + "UPDATE SET " + ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+                sql += " RETURNING *"
+                out.extend(dict(r) for r in conn.execute(sql, [row[c] for row in group for c in cols]))
+                i = j
+            return Response(out)
+        if self._action == "update":
+            cols = list(self._payload.keys())
+            sets = ", ".join(f"{_quote(c)} = ?" for c in cols)
+            sql = f"UPDATE {table} SET {sets}{where} RETURNING *"
+            return Response([dict(r) for r in conn.execute(sql, [self._payload[c] for c in cols] + params)])
+        if self._action == "delete":
+            return Response([dict(r) for r in conn.execute(f"DELETE FROM {table}{where} RETURNING *", params)])
+        raise BackendError(f"Unknown action {self._action}")
+
+
+class _Rpc:
+    def __init__(self, backend: "SQLiteBackend", fn: str, params: Dict):
+        self._backend = backend
+        self._fn = fn
+        self._params = params
+
+    writes = True
+
+    def execute(self) -> Response:
+        return self._backend._run(self)
+
+    def _execute(self, conn: sqlite3.Connection) -> Response:
+        impl = self._backend.functions.get(self._fn)
+        if impl is None:
+            raise BackendError(f"Unknown function {self._fn}")
+        return Response(impl(conn, self._params or {}))
+
+
+# Schema versions, applied in order and tracked with PRAGMA user_version (mirrors migrations/*.sql).
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS repository (
+        repo_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS file (
+        file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        repo_id INTEGER NOT NULL,
+        filename TEXT,
+        content TEXT,
+        content_hash TEXT
+    );
+    CREATE INDEX IF NOT EXISTS file_repo_id_idx ON file (repo_id);
+    CREATE TABLE IF NOT EXISTS blob (
+        hash TEXT PRIMARY KEY,
+        content TEXT,
+        size INTEGER,
+        base_hash TEXT,
+        delta TEXT,
+        depth INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS "commit" (
+        commit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        repo_id INTEGER NOT NULL,
+        message TEXT,
+        timestamp TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+        tree_hash TEXT
+    );
+    CREATE INDEX IF NOT EXISTS commit_repo_id_idx ON "commit" (repo_id, timestamp);
+    CREATE TABLE IF NOT EXISTS commitfile (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        commit_id INTEGER NOT NULL,
+        file_id INTEGER NOT NULL,
+        version_number INTEGER,
+        content TEXT,
+        blob_hash TEXT
+    );
+    CREATE INDEX IF NOT EXISTS commitfile_commit_id_idx ON commitfile (commit_id);
+    CREATE INDEX IF NOT EXISTS commitfile_file_version_idx ON commitfile (file_id, version_number);
+    CREATE INDEX IF NOT EXISTS commitfile_blob_hash_idx ON commitfile (blob_hash);
+    CREATE TABLE IF NOT EXISTS branch (
+        branch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        repo_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        head_commit_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS branch_repo_id_idx ON branch (repo_id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS commit_repo_timestamp_idx ON "commit" (repo_id, timestamp DESC, commit_id DESC);
+    CREATE INDEX IF NOT EXISTS file_repo_file_id_idx ON file (repo_id, file_id DESC);
+    """,
+    """
+    ALTER TABLE file ADD COLUMN size INTEGER;
+    UPDATE file SET size = length(CAST(content AS BLOB)) WHERE content IS NOT NULL;
+    """,
+    """
+    ALTER TABLE "commit" ADD COLUMN parent_id INTEGER REFERENCES "commit" (commit_id);
+    ALTER TABLE "commit" ADD COLUMN merge_parent_id INTEGER REFERENCES "commit" (commit_id);
+    ALTER TABLE "commit" ADD COLUMN generation INTEGER;
+    CREATE INDEX IF NOT EXISTS commit_repo_generation_idx ON "commit" (repo_id, generation DESC);
+    UPDATE "commit" SET parent_id = x.prev_id, generation = x.gen
+    FROM (
+        SELECT commit_id,
+               lag(commit_id) OVER w AS prev_id,
+               row_number() OVER w AS gen
+        FROM "commit"
+        WINDOW w AS (PARTITION BY repo_id ORDER BY timestamp, commit_id)
+    ) AS x
+    WHERE "commit".commit_id = x.commit_id AND "commit".generation IS NULL;
+    """,
+    """
+    ALTER TABLE blob ADD COLUMN chunks TEXT;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_doc (
+        doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        repo_id INTEGER NOT NULL,
+        blob_hash TEXT NOT NULL,
+        indexed INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (repo_id, blob_hash)
+    );
+    CREATE TABLE IF NOT EXISTS search_trigram (
+        repo_id INTEGER NOT NULL,
+        trigram TEXT NOT NULL,
+        doc_id INTEGER NOT NULL,
+        PRIMARY KEY (repo_id, trigram, doc_id)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blame_cache (
+        commit_id INTEGER NOT NULL,
+        file_id INTEGER NOT NULL,
+        runs TEXT NOT NULL,
+        PRIMARY KEY (commit_id, file_id)
+    );
+    """,
+]
+
+
+def _create_commit_with_files(conn: sqlite3.Connection, params: Dict) -> Optional[Dict]:
+    parent_id, merge_parent_id = params.get("p_parent_id"), params.get("p_merge_parent_id")
+    branch_id = params.get("p_branch_id")
+    # Compare-and-swap: a branch only takes a commit whose parent is still its head (the
+    # IMMEDIATE transaction holds the write lock from this check to the update)
+    if branch_id is not None:
+        head = conn.execute("SELECT head_commit_id FROM branch WHERE branch_id = ?", (branch_id,)).fetchone()
+        if head is None or head["head_commit_id"] != parent_id:
+            return None
+    generation = conn.execute(
+        'SELECT coalesce(max(generation), 0) + 1 FROM "commit" WHERE commit_id IN (?, ?)',
+        (parent_id, merge_parent_id),
+    ).fetchone()[0]
+    commit = conn.execute(
+        'INSERT INTO "commit" (repo_id, message, tree_hash, parent_id, merge_parent_id, generation) '
+        "VALUES (?, ?, ?, ?, ?, ?) RETURNING *",
+        (params["p_repo_id"], params["p_message"], params.get("p_tree_hash"), parent_id, merge_parent_id, generation),
+    ).fetchone()
+    conn.executemany(
+        "INSERT INTO commitfile (commit_id, file_id, version_number, blob_hash) VALUES (?, ?, ?, ?)",
+        [(commit["commit_id"], f["file_id"], f["version_number"], f["blob_hash"]) for f in params.get("p_files") or []],
+    )
+    _index_commit_blobs(conn, params["p_repo_id"], params.get("p_search") or [])
+    if branch_id is not None:
+        conn.execute("UPDATE branch SET head_commit_id = ? WHERE branch_id = ?", (commit["commit_id"], branch_id))
+    return dict(commit)
+
+
+def _index_commit_blobs(conn: sqlite3.Connection, repo_id: int, entries: List[Dict]) -> None:
+    """Search docs (with their trigrams) of a commit's new blobs; blobs the repo has indexed already are skipped."""
+    for entry in entries:
+        doc = conn.execute(
+            "INSERT INTO search_doc (repo_id, blob_hash, indexed) VALUES (?, ?, ?) "
+            "ON CONFLICT (repo_id, blob_hash) DO NOTHING RETURNING doc_id",
+            (repo_id, entry["blob_hash"], entry.get("trigrams") is not None),
+        ).fetchone()
+        if doc is None or entry.get("trigrams") is None:
+            continue
+        conn.executemany(
+            "INSERT INTO search_trigram (repo_id, trigram, doc_id) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+            [(repo_id, t, doc["doc_id"]) for t in entry["trigrams"]],
+        )
+
+
+def _search_blobs(conn: sqlite3.Connection, params: Dict) -> List[Dict]:
+    trigrams = sorted(set(params.get("p_trigrams") or []))
+    repo_id = params["p_repo_id"]
+    if not trigrams:
+        rows = conn.execute("SELECT blob_hash FROM search_doc WHERE repo_id = ?", (repo_id,))
+    else:
+        marks = ", ".join("?" * len(trigrams))
+        rows = conn.execute(
+            "SELECT d.blob_hash FROM search_doc d JOIN ("
+            f"SELECT doc_id FROM search_trigram WHERE repo_id = ? AND trigram IN ({marks}) "
+            "GROUP BY doc_id HAVING count(*) = ?) t ON t.doc_id = d.doc_id "
+            "UNION SELECT blob_hash FROM search_doc WHERE repo_id = ? AND NOT indexed",
+            (repo_id, *trigrams, len(trigrams), repo_id),
+        )
+    return [dict(r) for r in rows]
+
+
+FUNCTIONS: Dict[str, Callable[[sqlite3.Connection, Dict], Any]] = {
+    "create_commit_with_files": _create_commit_with_files,
+    "search_blobs": _search_blobs,
+}
+
+
+class SQLiteBackend:
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._pk_cache: Dict[str, str] = {}
+        self.functions = dict(FUNCTIONS)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for i, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+                self._conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {i};\nCOMMIT;")
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> _Rpc:
+        return _Rpc(self, fn, params or {})
+
+    def _primary_key(self, conn: sqlite3.Connection, table: str) -> str:
+        if table not in self._pk_cache:
+            cols = [r["name"] for r in conn.execute(f"PRAGMA table_info({_quote(table)})") if r["pk"]]
+            self._pk_cache[table] = ",".join(cols)
+        return self._pk_cache[table]
+
+    def _run(self, query) -> Response:
+        """Reads run as single statements; writes (and functions) in one IMMEDIATE transaction."""
+        with self._lock:
+            if not query.writes:
+                try:
+                    return query._execute(self._conn)
+                except sqlite3.Error as e:
+                    raise BackendError(str(e)) from e
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                resp = query._execute(self._conn)
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                raise BackendError(str(e)) from e
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return resp
@@ -0,0 +1,168 @@
+"""Per-query tracing for any storage backend.
+
+TracedBackend wraps a backend so every query builder it hands out times its `execute()`.
+A sampled fraction of queries (trace_sample_rate) is recorded with duration, row count,
+response bytes, the DAO method that issued it and the service method that called the DAO.
+Records are aggregated into per-operation latency histograms, exportable as JSON or
+Prometheus text. Unsampled queries only pay one random() call.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_ACTIONS = ("select", "insert", "upsert", "update", "delete")
+_SRC = os.path.join("src", "")
+
+def _caller() -> Tuple[str, str]:
+    """(dao method, service method) of the code that issued the query, from the call stack."""
+    dao = service = ""
+    frame = sys._getframe(2)
+    while frame is not None and not service:
+        path = frame.f_code.co_filename
+        if _SRC in path:
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            if not dao and os.path.join("dao", "") in path:
+                dao = name
+            elif os.path.join("services", "") in path:
+                service = name
+        frame = frame.f_back
+    return dao, service
+
+class QueryStats:
+    """Thread-safe aggregation of sampled queries keyed by (operation, dao, caller)."""
+    def __init__(self, sample_rate: float, recent: int = 100):
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], Dict] = {}
+        self.recent: deque = deque(maxlen=recent)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, operation: str, dao: str, caller: str, seconds: float, rows: int, nbytes: int) -> None:
+        key = (operation, dao, caller)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = {"count": 0, "sum_s": 0.0, "max_s": 0.0, "rows": 0, "bytes": 0,
+                                         "buckets": [0] * (len(BUCKETS) + 1)}
+            s["count"] += 1
+            s["sum_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+            s["rows"] += rows
+            s["bytes"] += nbytes
+            i = 0
+            while i < len(BUCKETS) and seconds > BUCKETS[i]:
+                i += 1
+            s["buckets"][i] += 1
+            self.recent.append({"operation": operation, "dao": dao, "caller": caller,
+                                "duration_s": round(seconds, 6), "rows": rows, "bytes": nbytes, "at": time.time()})
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self.recent.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-ready view: one entry per series (slowest total first) plus the latest queries."""
+        with self._lock:
+            series = [
+                {"operation": op, "dao": dao, "caller": caller, **{k: (list(v) if k == "buckets" else v) for k, v in s.items()},
+                 "avg_s": s["sum_s"] / s["count"]}
+                for (op, dao, caller), s in self._series.items()
+            ]
+            recent = list(self.recent)
+        series.sort(key=lambda s: s["sum_s"], reverse=True)
+        return {"sample_rate": self.sample_rate, "buckets": list(BUCKETS), "series": series, "recent": recent}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition: a duration histogram plus row and byte counters per series."""
+        def labels(s: Dict, extra: str = "") -> str:
+            pairs = [f'{k}="{s[k]}"' for k in ("operation", "dao", "caller")]
+            return "{" + ",".join(pairs + ([extra] if extra else [])) + "}"
+        snap = self.snapshot()
+        lines = [
+            "# HELP compactvcs_query_duration_seconds Storage query latency (sampled).",
+            "# TYPE compactvcs_query_duration_seconds histogram",
+        ]
+        for s in snap["series"]:
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS) + ["+Inf"], s["buckets"]):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"compactvcs_query_duration_seconds_bucket{labels(s, le)} {cumulative}")
+            lines.append(f"compactvcs_query_duration_seconds_sum{labels(s)} {s['sum_s']:.6f}")
+            lines.append(f"compactvcs_query_duration_seconds_count{labels(s)} {s['count']}")
+        for metric, field, help_text in (("rows", "rows", "Rows returned"), ("response_bytes", "bytes", "Response bytes")):
+            lines += [f"# HELP compactvcs_query_{metric}_total {help_text} by sampled queries.",
+                      f"# TYPE compactvcs_query_{metric}_total counter"]
+            lines += [f"compactvcs_query_{metric}_total{labels(s)} {s[field]}" for s in snap["series"]]
+        lines.append(f"compactvcs_query_sample_rate {snap['sample_rate']}")
+        return "\n".join(lines) + "\n"
+
+class _TracedQuery:
+    """Forwards the builder chain to the wrapped query and times its execute()."""
+    def __init__(self, query: Any, stats: QueryStats, table: str, action: str = "select"):
+        self._query = query
+        self._stats = stats
+        self._table = table
+        self._action = action
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            return _TracedQuery(result, self._stats, self._table, name if name in _ACTIONS else self._action)
+        return call
+
+    def execute(self) -> Any:
+        if not self._stats.sampled():
+            return self._query.execute()
+        start = time.perf_counter()
+        resp = self._query.execute()
+        elapsed = time.perf_counter() - start
+        data = getattr(resp, "data", None)
+        rows = len(data) if isinstance(data, list) else (1 if data else 0)
+        nbytes = len(json.dumps(data, default=str)) if data is not None else 0
+        dao, caller = _caller()
+        self._stats.record(f"{self._table}.{self._action}", dao, caller, elapsed, rows, nbytes)
+        return resp
+
+class TracedBackend:
+    """StorageBackend proxy whose queries are traced into `stats`."""
+    def __init__(self, backend: Any, stats: QueryStats):
+        self._backend = backend
+        self.stats = stats
+
+    def table(self, name: str) -> _TracedQuery:
+        return _TracedQuery(self._backend.table(name), self.stats, name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> _TracedQuery:
+        return _TracedQuery(self._backend.rpc(fn, params), self.stats, "rpc", fn)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._backend, name)
+
+# Process-wide stats shared by every traced backend
+query_stats: Optional[QueryStats] = None
+
+def get_query_stats(sample_rate: float) -> QueryStats:
+    global query_stats
+    if query_stats is None:
+        query_stats = QueryStats(sample_rate)
+    return query_stats
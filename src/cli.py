@@ -0,0 +1,256 @@
+"""
+Command-line interface: `python -m src <command>`.
+
+Only argparse is imported up front. Services (and through them config, the storage backend
+and its client) are imported inside the command that needs them, so `--help` or a command
+against the local SQLite backend does not pay for Streamlit, Supabase or unused services.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+if SRC not in sys.path:
+    sys.path.append(SRC)
+
+# Repository used when --repo is not given
+REPO_ENV = "COMPACTVCS_REPO"
+
+class CLIError(Exception):
+    pass
+
+# ---------------- Helpers ----------------
+def _out(args, result, text: str) -> None:
+    """Print a command's result: as JSON with --json, else the human-readable text."""
+    if args.json:
+        print(json.dumps(result, default=str, indent=2))
+    elif text:
+        print(text)
+
+def _repo_id(args) -> int:
+    """--repo, else $COMPACTVCS_REPO, else the repository checked out in the current directory."""
+    repo_id = args.repo
+    if repo_id is None and os.getenv(REPO_ENV):
+        repo_id = int(os.environ[REPO_ENV])
+    if repo_id is None:
+        from dao.worktree import WorktreeIndex
+        repo_id = WorktreeIndex(os.getcwd()).load().repo_id
+    if repo_id is None:
+        raise CLIError(f"No repository given: use --repo, set {REPO_ENV} or run inside a checkout")
+    from dao.repo_dao import Repo
+    if not Repo().get_repo_by_id(repo_id):
+        raise CLIError(f"Repository {repo_id} not found")
+    return repo_id
+
+def _branch(repo_id: int, ref: str) -> Dict:
+    """A branch of repo_id by name, or by id when ref is a number."""
+    from dao.branch_dao import Branch
+    branch = Branch().get_branch_by_id(int(ref)) if ref.isdigit() else Branch().get_branch_by_name(repo_id, ref)
+    if not branch or branch["repo_id"] != repo_id:
+        raise CLIError(f"Branch {ref} not found in repository {repo_id}")
+    return branch
+
+def _latest_commit(repo_id: int) -> Dict:
+    from dao.commit_dao import Commit
+    commit = Commit().get_latest_commit(repo_id)
+    if not commit:
+        raise CLIError(f"Repository {repo_id} has no commits yet")
+    return commit
+
+def _print_diff(args, result: Dict) -> None:
+    lines = []
+    for f in result["files"]:
+        if f["status"] == "renamed":
+            lines.append(f"renamed {f['old_filename']} -> {f['filename']}")
+        elif f["diff"]:
+            lines.append(f["diff"].rstrip("\n"))
+        else:
+            lines.append(f"{f['status']} {f['filename']}")
+    _out(args, result, "\n".join(lines))
+
+# ---------------- Commands ----------------
+def cmd_repos(args) -> None:
+    from services.vcs_services import VCSService
+    repos = VCSService().list_repos()
+    _out(args, repos, "\n".join(f"{r['repo_id']}\t{r['name']}" for r in repos))
+
+def cmd_init(args) -> None:
+    from services.vcs_services import VCSService
+    repo = VCSService().create_repo(args.name)
+    _out(args, repo, f"Created repository {repo['repo_id']} ({repo['name']})")
+
+def cmd_add(args) -> None:
+    """Directories are ingested as a tree (names relative to it); single files are added or updated by path."""
+    from services.vcs_services import VCSService
+    vcs = VCSService()
+    repo_id = _repo_id(args)
+    results: List[Dict] = []
+    lines: List[str] = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            result = vcs.add_directory(repo_id, path, delete_missing=not args.keep_missing)
+            results.append(result)
+            lines.append(
+                f"{path}: {result['added']} added, {result['updated']} updated, {result['deleted']} deleted, "
+                f"{result['unchanged']} unchanged ({result['files_per_second']} files/s)"
+            )
+            continue
+        name = os.path.normpath(path).replace(os.sep, "/")
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as fh:
+                content = fh.read()
+        except (OSError, UnicodeDecodeError) as e:
+            raise CLIError(f"Cannot add {path}: {e}")
+        existing = next((f for f in vcs.file.list_file_meta(repo_id) if f["filename"] == name), None)
+        if existing:
+            results.append(vcs.update_file(existing["file_id"], new_content=content))
+        else:
+            results.append(vcs.add_file(repo_id, name, content))
+        lines.append(f"{'updated' if existing else 'added'} {name}")
+    _out(args, results, "\n".join(lines))
+
+def cmd_commit(args) -> None:
+    from services.vcs_services import VCSService
+    repo_id = _repo_id(args)
+    branch_id = _branch(repo_id, args.branch)["branch_id"] if args.branch else None
+    commit = VCSService().make_commit(repo_id, args.message, branch_id=branch_id)
+    _out(args, commit, f"[{commit['commit_id']}] {commit['message']}")
+
+def cmd_log(args) -> None:
+    from services.history_services import HistoryService
+    commits, _ = HistoryService().show_history_page(_repo_id(args), limit=args.limit)
+    _out(args, commits, "\n".join(f"{c['commit_id']}\t{c['timestamp']}\t{c['message']}" for c in commits))
+
+def cmd_status(args) -> None:
+    """Working files changed since the latest commit, and files edited in the current checkout."""
+    from services.diff_services import DiffService
+    repo_id = _repo_id(args)
+    result = DiffService().diff_working(_latest_commit(repo_id)["commit_id"], context=0)
+    changes = [{"filename": f["filename"], "status": f["status"]} for f in result["files"]]
+    lines = [f"{c['status']:<9}{c['filename']}" for c in changes] or ["Working files match the latest commit"]
+    from dao.worktree import WorktreeIndex
+    index = WorktreeIndex(os.getcwd()).load()
+    local: List[str] = []
+    if index.repo_id == repo_id:
+        local = sorted(p for p in index.entries if not index.is_clean(p))
+        lines += [f"local    {p}" for p in local]
+    _out(args, {"repo_id": repo_id, "changes": changes, "local": local}, "\n".join(lines))
+
+def cmd_diff(args) -> None:
+    """No commit: working files against the latest commit; one: against that commit; two: between them."""
+    from services.diff_services import DiffService
+    diffs = DiffService()
+    if len(args.commits) > 2:
+        raise CLIError("diff takes at most two commits")
+    if len(args.commits) == 2:
+        result = diffs.diff_commits(args.commits[0], args.commits[1], context=args.context)
+    else:
+        base = args.commits[0] if args.commits else _latest_commit(_repo_id(args))["commit_id"]
+        result = diffs.diff_working(base, context=args.context)
+    _print_diff(args, result)
+
+def cmd_checkout(args) -> None:
+    from services.checkout_services import CheckoutService
+    checkout = CheckoutService()
+    if args.commit:
+        result = checkout.checkout_commit(int(args.target), args.directory, force=args.force)
+    else:
+        branch = _branch(_repo_id(args), args.target)
+        result = checkout.checkout_branch(branch["branch_id"], args.directory, force=args.force)
+    _out(args, result, (
+        f"Checked out commit {result['commit_id']} into {result['directory']}: {result['written']} written, "
+        f"{result['deleted']} deleted, {result['unchanged']} unchanged"
+    ))
+
+def cmd_branch(args) -> None:
+    """List branches, or create (at --at, else the latest commit) or delete one."""
+    from services.branch_services import BranchService
+    branches = BranchService()
+    repo_id = _repo_id(args)
+    if args.delete:
+        branch = _branch(repo_id, args.delete)
+        branches.delete_branch(branch["branch_id"])
+        _out(args, branch, f"Deleted branch {branch['name']}")
+    elif args.name:
+        head = args.at if args.at is not None else _latest_commit(repo_id)["commit_id"]
+        branch = branches.add_branch(repo_id, args.name, head)
+        _out(args, branch, f"Created branch {branch['name']} ({branch['branch_id']}) at commit {head}")
+    else:
+        rows = branches.list_branches(repo_id)
+        _out(args, rows, "\n".join(f"{b['branch_id']}\t{b['name']}\t{b.get('head_commit_id') or '-'}" for b in rows))
+
+def cmd_merge(args) -> None:
+    from services.branch_services import BranchService
+    repo_id = _repo_id(args)
+    source, target = _branch(repo_id, args.source), _branch(repo_id, args.target)
+    merged = BranchService().merge_branches(source["branch_id"], target["branch_id"], args.message)
+    _out(args, merged, f"Merged {source['name']} into {target['name']}: head is now {merged.get('head_commit_id')}")
+
+# ---------------- Entry point ----------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="CompactVCS command line")
+    parser.add_argument("--repo", type=int, help=f"repository id (default: ${REPO_ENV} or the current checkout's)")
+    parser.add_argument("--backend", choices=["supabase", "sqlite"], help="storage backend (overrides storage_backend)")
+    parser.add_argument("--db", help="SQLite database path (overrides sqlite_path)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("repos", help="list repositories").set_defaults(func=cmd_repos)
+    p = sub.add_parser("init", help="create a repository")
+    p.add_argument("name")
+    p.set_defaults(func=cmd_init)
+    p = sub.add_parser("add", help="add or update files, or every file under a directory")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--keep-missing", action="store_true", help="keep working files missing from an added directory")
+    p.set_defaults(func=cmd_add)
+    p = sub.add_parser("commit", help="commit the working files")
+    p.add_argument("-m", "--message", required=True)
+    p.add_argument("-b", "--branch", help="branch (name or id) to commit on")
+    p.set_defaults(func=cmd_commit)
+    p = sub.add_parser("log", help="show commit history, newest first")
+    p.add_argument("-n", "--limit", type=int, default=20)
+    p.set_defaults(func=cmd_log)
+    sub.add_parser("status", help="show working changes since the latest commit").set_defaults(func=cmd_status)
+    p = sub.add_parser("diff", help="diff working files or commits")
+    p.add_argument("commits", nargs="*", type=int)
+    p.add_argument("-U", "--context", type=int, default=3)
+    p.set_defaults(func=cmd_diff)
+    p = sub.add_parser("checkout", help="write a branch head or commit into a directory")
+    p.add_argument("target", help="branch name or id (commit id with --commit)")
+    p.add_argument("directory", nargs="?", default=".")
+    p.add_argument("--commit", action="store_true", help="target is a commit id")
+    p.add_argument("-f", "--force", action="store_true", help="discard local changes in the way")
+    p.set_defaults(func=cmd_checkout)
+    p = sub.add_parser("branch", help="list, create or delete branches")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--at", type=int, help="commit id for a new branch (default: latest commit)")
+    p.add_argument("-d", "--delete", metavar="BRANCH")
+    p.set_defaults(func=cmd_branch)
+    p = sub.add_parser("merge", help="merge one branch into another")
+    p.add_argument("source")
+    p.add_argument("target")
+    p.add_argument("-m", "--message")
+    p.set_defaults(func=cmd_merge)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # config reads these at import time, which has not happened yet
+    if args.backend:
+        os.environ["storage_backend"] = args.backend
+    if args.db:
+        os.environ["sqlite_path"] = args.db
+    try:
+        args.func(args)
+    except CLIError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        # Service errors (VCSError, BranchError, ...) are user-facing; anything else is a bug
+        if type(e).__module__.startswith("services.") and type(e).__name__.endswith("Error"):
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        raise
+    return 0
@@ -1,7 +1,12 @@
 import os
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from supabase import create_client, Client
+
+if TYPE_CHECKING:
+    from supabase import Client # pyright: ignore[reportMissingImports]
+    from backends import StorageBackend
 
 # Load .env from project root or CWD without touching st.secrets
 _here = Path(__file__).resolve()
@@ -25,8 +30,103 @@ SUPABASE_URL = _get_env("supabase_url", "SUPABASE_URL")
 SUPABASE_KEY = _get_env("supabase_key", "SUPABASE_KEY")
 SUPABASE_SERVICE_ROLE_KEY = _get_env("supabase_service_role_key", "SUPABASE_SERVICE_ROLE_KEY")
 
-def get_supabase() -> Client:
-    """Public (anon) Supabase client — reads from environment only."""
+# Blob storage: "full" stores every version whole, "delta" stores line deltas against the
+# previous version with a full keyframe every DELTA_KEYFRAME_INTERVAL versions.
+BLOB_STORAGE_MODE = (_get_env("blob_storage_mode", "BLOB_STORAGE_MODE") or "full").lower()
+DELTA_KEYFRAME_INTERVAL = int(_get_env("delta_keyframe_interval", "DELTA_KEYFRAME_INTERVAL") or 16)
+BLOB_CACHE_SIZE = int(_get_env("blob_cache_size", "BLOB_CACHE_SIZE") or 256)
+BLOB_CACHE_MAX_BYTES = int(_get_env("blob_cache_max_bytes", "BLOB_CACHE_MAX_BYTES") or 64 * 1024 * 1024)
+
+# Chunked storage: bodies larger than CHUNK_THRESHOLD bytes (UTF-8) are stored as content-defined
+# chunks of CHUNK_MIN_SIZE..CHUNK_MAX_SIZE characters (shared between versions) plus a manifest.
+CHUNK_THRESHOLD = int(_get_env("chunk_threshold", "CHUNK_THRESHOLD") or 1024 * 1024)
+CHUNK_MIN_SIZE = int(_get_env("chunk_min_size", "CHUNK_MIN_SIZE") or 32 * 1024)
+CHUNK_MAX_SIZE = int(_get_env("chunk_max_size", "CHUNK_MAX_SIZE") or 256 * 1024)
+
+# Read-through DAO cache: entry and approximate byte bounds, TTL (seconds) for mutable data;
+# immutable rows (commits, commit file versions) never expire.
+DAO_CACHE_ENABLED = (_get_env("dao_cache_enabled", "DAO_CACHE_ENABLED") or "true").lower() not in ("0", "false", "no")
+DAO_CACHE_SIZE = int(_get_env("dao_cache_size", "DAO_CACHE_SIZE") or 1024)
+DAO_CACHE_TTL = float(_get_env("dao_cache_ttl", "DAO_CACHE_TTL") or 30)
+DAO_CACHE_MAX_BYTES = int(_get_env("dao_cache_max_bytes", "DAO_CACHE_MAX_BYTES") or 64 * 1024 * 1024)
+
+# Diff results kept per (old commit, new commit) pair; commits are immutable so entries never expire.
+DIFF_CACHE_SIZE = int(_get_env("diff_cache_size", "DIFF_CACHE_SIZE") or 128)
+
+# Commit ancestry rows kept in memory by each CommitGraph; rows are immutable so entries never expire.
+GRAPH_CACHE_SIZE = int(_get_env("graph_cache_size", "GRAPH_CACHE_SIZE") or 65536)
+
+# Content search: new file versions are added to a trigram index when they are committed.
+# Bodies longer than SEARCH_MAX_INDEXED_SIZE characters are not indexed and are scanned instead.
+SEARCH_INDEX_ENABLED = (_get_env("search_index_enabled", "SEARCH_INDEX_ENABLED") or "true").lower() not in ("0", "false", "no")
+SEARCH_MAX_INDEXED_SIZE = int(_get_env("search_max_indexed_size", "SEARCH_MAX_INDEXED_SIZE") or 256 * 1024)
+
+# Storage backend the DAOs run against: "supabase" (default) or "sqlite" (embedded, single node).
+STORAGE_BACKEND = (_get_env("storage_backend", "STORAGE_BACKEND") or "supabase").lower()
+SQLITE_PATH = _get_env("sqlite_path", "SQLITE_PATH") or str(_here.parents[1] / "compactvcs.db")
+
+# Keep-alive connections per shared Supabase client (one client per URL/key in the process).
+SUPABASE_POOL_SIZE = int(_get_env("supabase_pool_size", "SUPABASE_POOL_SIZE") or 20)
+
+# Fraction of storage queries traced (timing, rows, bytes, calling DAO/service); 0 disables tracing.
+TRACE_SAMPLE_RATE = float(_get_env("trace_sample_rate", "TRACE_SAMPLE_RATE") or 0)
+
+# Requests the async service facades keep in flight at once (worker threads).
+ASYNC_CONCURRENCY = int(_get_env("async_concurrency", "ASYNC_CONCURRENCY") or 8)
+
+# Threads writing files during a checkout to a local directory.
+CHECKOUT_WORKERS = int(_get_env("checkout_workers", "CHECKOUT_WORKERS") or 8)
+
+# Offline write journal (src/dao/journal.py): working-file writes are appended to JOURNAL_PATH
+# and synced in the background every JOURNAL_SYNC_INTERVAL seconds (backing off up to
+# JOURNAL_MAX_BACKOFF while the storage is unreachable). Unset: writes go straight to storage.
+JOURNAL_PATH = _get_env("journal_path", "JOURNAL_PATH")
+JOURNAL_SYNC_INTERVAL = float(_get_env("journal_sync_interval", "JOURNAL_SYNC_INTERVAL") or 1.0)
+JOURNAL_MAX_BACKOFF = float(_get_env("journal_max_backoff", "JOURNAL_MAX_BACKOFF") or 60)
+
+# Processes hashing files when a local directory is ingested (default: one per CPU).
+INGEST_WORKERS = int(_get_env("ingest_workers", "INGEST_WORKERS") or os.cpu_count() or 1)
+
+# Attempts a commit or merge makes when another writer advanced the branch head first; each
+# retry rebases onto the new head after a short randomized backoff.
+COMMIT_RETRIES = int(_get_env("commit_retries", "COMMIT_RETRIES") or 20)
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+def _create_pooled_client(url: str, key: str) -> "Client":
+    """Client whose PostgREST/storage/functions calls share one keep-alive httpx pool."""
+    from supabase import create_client # pyright: ignore[reportMissingImports]
+    try:
+        import httpx
+        from supabase import ClientOptions # pyright: ignore[reportMissingImports]
+        limits = httpx.Limits(
+            max_connections=SUPABASE_POOL_SIZE,
+            max_keepalive_connections=SUPABASE_POOL_SIZE,
+        )
+        options = ClientOptions(httpx_client=httpx.Client(limits=limits, timeout=120))
+    except (ImportError, TypeError):
+        # Older supabase-py without a shared httpx client option: registry reuse still applies
+        return create_client(url, key)
+    return create_client(url, key, options=options)
+
+def _get_client(url: str, key: str, shared: bool) -> "Client":
+    if not shared:
+        from supabase import create_client # pyright: ignore[reportMissingImports]
+        return create_client(url, key)
+    with _clients_lock:
+        client = _clients.get((url, key))
+        if client is None:
+            client = _create_pooled_client(url, key)
+            _clients[(url, key)] = client
+        return client
+
+def get_supabase(shared: bool = True) -> "Client":
+    """
+    Public (anon) Supabase client — reads from environment only.
+    The process-wide pooled client is returned unless shared=False, which builds a private
+    client (needed for auth sessions, since signing in rewrites the client's auth headers).
+    """
     if not SUPABASE_URL or not SUPABASE_KEY:
         missing = []
         if not SUPABASE_URL:
@@ -34,9 +134,9 @@ def get_supabase() -> Client:
         if not SUPABASE_KEY:
             missing.append("supabase_key")
         raise ValueError(f"Missing config: {', '.join(missing)}")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _get_client(SUPABASE_URL, SUPABASE_KEY, shared)
 
-def get_supabase_admin() -> Client:
+def get_supabase_admin(shared: bool = True) -> "Client":
     """Admin client using service role key from environment only."""
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         missing = []
@@ -45,4 +145,46 @@ def get_supabase_admin() -> Client:
         if not SUPABASE_SERVICE_ROLE_KEY:
             missing.append("supabase_service_role_key")
         raise ValueError(f"Missing config: {', '.join(missing)}")
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return _get_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, shared)
+
+_backend_override: "StorageBackend | None" = None
+
+def set_backend(backend: "StorageBackend | None") -> None:
+    """
+    Make get_backend() return `backend` (None restores STORAGE_BACKEND). DAOs bind their
+    backend when constructed, so create services after switching. The in-process caches are
+    cleared, since their entries were read from the previous backend.
+    """
+    global _backend_override
+    _backend_override = backend
+    from dao.cache import clear_caches
+    clear_caches()
+
+def get_backend() -> "StorageBackend":
+    """
+    Storage backend for the DAOs, selected by STORAGE_BACKEND; one shared instance per process.
+    With trace_sample_rate > 0 it is wrapped so sampled queries are traced.
+    """
+    backend = _backend_override if _backend_override is not None else _select_backend()
+    if TRACE_SAMPLE_RATE <= 0:
+        return backend
+    with _clients_lock:
+        traced = _clients.get(("traced", id(backend)))
+        if traced is None:
+            from backends.tracing import TracedBackend, get_query_stats
+            traced = TracedBackend(backend, get_query_stats(TRACE_SAMPLE_RATE))
+            _clients[("traced", id(backend))] = traced
+        return traced
+
+def _select_backend() -> "StorageBackend":
+    if STORAGE_BACKEND == "supabase":
+        return get_supabase()
+    if STORAGE_BACKEND == "sqlite":
+        with _clients_lock:
+            backend = _clients.get(("sqlite", SQLITE_PATH))
+            if backend is None:
+                from backends.sqlite_backend import SQLiteBackend
+                backend = SQLiteBackend(SQLITE_PATH)
+                _clients[("sqlite", SQLITE_PATH)] = backend
+            return backend
+    raise ValueError(f"Unknown storage_backend: {STORAGE_BACKEND}")
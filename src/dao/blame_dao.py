@@ -0,0 +1,31 @@
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import json
+from typing import Optional, List
+from config import get_backend
+from backends import StorageBackend
+from dao.cache import cached
+
+class BlameCache:
+    """
+    Persisted blame of file versions, keyed by the commit that wrote the version and the file.
+    A blame is a list of [origin_commit_id, line_count] runs covering the version's lines in
+    order. Versions are immutable, so entries are written once and never invalidated.
+    """
+    def __init__(self):
+        self._sb : StorageBackend = get_backend()
+
+    @cached("blame", immutable=True)
+    def get(self, commit_id: int, file_id: int) -> Optional[List[List[int]]]:
+        resp = (
+            self._sb.table("blame_cache")
+            .select("runs")
+            .eq("commit_id", commit_id)
+            .eq("file_id", file_id)
+            .execute()
+        )
+        return json.loads(resp.data[0]["runs"]) if resp.data else None
+
+    def put(self, commit_id: int, file_id: int, runs: List[List[int]]) -> None:
+        row = {"commit_id": commit_id, "file_id": file_id, "runs": json.dumps(runs, separators=(",", ":"))}
+        self._sb.table("blame_cache").upsert([row], on_conflict="commit_id,file_id", ignore_duplicates=True).execute()
@@ -0,0 +1,268 @@
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import hashlib
+import json
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
+from config import get_backend, BLOB_STORAGE_MODE, DELTA_KEYFRAME_INTERVAL, BLOB_CACHE_SIZE, BLOB_CACHE_MAX_BYTES
+from config import CHUNK_THRESHOLD, CHUNK_MIN_SIZE, CHUNK_MAX_SIZE
+from backends import StorageBackend
+from dao.delta import make_delta, apply_delta
+from dao.chunking import split_chunks
+from dao.cache import new_cache
+
+def content_hash(content: str) -> str:
+    """Content address of a file body (sha256 of its UTF-8 bytes)."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+def content_size(content: str) -> int:
+    """Size of a file body in bytes (UTF-8)."""
+    return len((content or "").encode("utf-8"))
+
+# Hashes per `in` filter; keeps PostgREST query strings well under common URL limits.
+IN_FILTER_CHUNK = 100
+
+def chunked(items: List, size: int = IN_FILTER_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# A line ends a chunk when these low bits of its CRC-32 are zero (about 1 line in 64)
+CHUNK_LINE_MASK = 0x3F
+# Chunks written per request while streaming
+CHUNK_BATCH = 16
+
+# Bodies larger than this (in UTF-8 bytes, the unit of file sizes) are stored as chunks. A chunk
+# holds at most CHUNK_MAX_SIZE characters of up to 4 bytes each, so it is never chunked itself.
+CHUNKED_ABOVE = max(CHUNK_THRESHOLD, 4 * CHUNK_MAX_SIZE)
+
+def is_chunked(content: str) -> bool:
+    """Whether a body is large enough to be stored as chunks rather than one blob row."""
+    n = len(content or "")
+    # A character takes 1 to 4 bytes, so only lengths in between need encoding to decide
+    if n > CHUNKED_ABOVE or n * 4 <= CHUNKED_ABOVE:
+        return n > CHUNKED_ABOVE
+    return is_chunked_size(content_size(content))
+
+def is_chunked_size(size: int) -> bool:
+    """Whether a body of `size` bytes (a file or tree entry size) is stored as chunks."""
+    return (size or 0) > CHUNKED_ABOVE
+
+# Recently rebuilt contents, shared by every Blob instance so delta chains are walked once.
+# Blobs are immutable, so entries never expire.
+_content_cache = new_cache("blob", BLOB_CACHE_SIZE, max_bytes=BLOB_CACHE_MAX_BYTES)
+
+def _cache_get(blob_hash: str) -> Optional[str]:
+    return _content_cache.get(blob_hash, "blob")[1]
+
+def _cache_put(blob_hash: str, content: Optional[str]) -> None:
+    if content is not None:
+        _content_cache.set(blob_hash, content, namespace="blob")
+
+class Blob:
+    """
+    Content-addressed store: every distinct file body is written exactly once.
+    In delta mode a blob may instead hold a line delta against a base blob; chains are
+    cut by a full keyframe every DELTA_KEYFRAME_INTERVAL versions.
+    Large bodies are stored as a manifest row listing content-defined chunks, each an
+    ordinary blob, so versions share unchanged chunks and can be streamed piece by piece.
+    The manifest's hash is the hash of the whole body, as for any other blob.
+    """
+    def __init__(self):
+        self._sb : StorageBackend = get_backend()
+
+    def put_blob(self, content: str, base_hash: Optional[str] = None) -> str:
+        """Store content if it is not already present and return its hash."""
+        return self.put_blobs([content], [base_hash])[0]
+
+    def put_blobs(self, contents: Iterable[str], base_hashes: Optional[Iterable[Optional[str]]] = None) -> List[str]:
+        """
+        Store many contents with batched existence checks and a single insert; returns hashes in input order.
+        base_hashes optionally names each content's previous version, used as the delta base.
+        """
+        contents = list(contents)
+        bases = list(base_hashes) if base_hashes is not None else [None] * len(contents)
+        hashes = [content_hash(c) for c in contents]
+        missing = self.missing_hashes(hashes)
+        new: Dict[str, tuple] = {}
+        for h, c, b in zip(hashes, contents, bases):
+            if h in missing and h not in new:
+                if is_chunked(c):
+                    self.put_stream([c])
+                    missing.discard(h)
+                    continue
+                new[h] = (c or "", b)
+        if new:
+            (
+                self._sb.table("blob")
+                .upsert(self._encode(new), on_conflict="hash", ignore_duplicates=True)
+                .execute()
+            )
+            for h, (c, _) in new.items():
+                _cache_put(h, c)
+        return hashes
+
+    def put_stream(self, pieces: Iterable[str]) -> Tuple[str, int]:
+        """
+        Store a body given as an iterable of text pieces without joining it: chunks are
+        written in batches as they are cut, then the manifest. Returns (hash, size in bytes).
+        """
+        sha = hashlib.sha256()
+        size = 0
+        chunk_hashes: List[str] = []
+        batch: List[str] = []
+        for chunk in split_chunks(pieces, CHUNK_MIN_SIZE, CHUNK_MAX_SIZE, CHUNK_LINE_MASK):
+            data = chunk.encode("utf-8")
+            sha.update(data)
+            size += len(data)
+            batch.append(chunk)
+            if len(batch) >= CHUNK_BATCH:
+                chunk_hashes += self.put_blobs(batch)
+                batch = []
+        if batch or not chunk_hashes:
+            chunk_hashes += self.put_blobs(batch or [""])
+        h = sha.hexdigest()
+        # A body that fits in one chunk is that chunk's blob
+        if chunk_hashes == [h] or not self.missing_hashes([h]):
+            return h, size
+        row = {"hash": h, "content": None, "chunks": json.dumps(chunk_hashes), "size": size}
+        if BLOB_STORAGE_MODE == "delta":
+            row.update({"base_hash": None, "delta": None, "depth": 0})
+        self._sb.table("blob").upsert([row], on_conflict="hash", ignore_duplicates=True).execute()
+        return h, size
+
+    def iter_blob(self, blob_hash: str) -> Iterator[str]:
+        """Yield a body in pieces: chunked blobs are fetched CHUNK_BATCH chunks at a time."""
+        cached = _cache_get(blob_hash)
+        if cached is not None:
+            yield cached
+            return
+        resp = self._sb.table("blob").select("*").eq("hash", blob_hash).execute()
+        if not resp.data:
+            return
+        row = resp.data[0]
+        manifest = row.get("chunks")
+        if not manifest:
+            content = row["content"] if row.get("delta") is None else self.get_blob(blob_hash)
+            if content is not None:
+                yield content
+            return
+        chunk_hashes = json.loads(manifest)
+        for i in range(0, len(chunk_hashes), CHUNK_BATCH):
+            batch = chunk_hashes[i:i + CHUNK_BATCH]
+            contents = self.get_blobs(batch)
+            for h in batch:
+                yield contents[h]
+
+    def missing_hashes(self, hashes: Iterable[str]) -> set:
+        """Return the subset of hashes that are not stored yet."""
+        wanted = set(hashes)
+        found = set()
+        for chunk in chunked(list(wanted)):
+            resp = self._sb.table("blob").select("hash").in_("hash", chunk).execute()
+            found.update(r["hash"] for r in (resp.data or []))
+        return wanted - found
+
+    def get_sizes(self, hashes: Iterable[str]) -> Dict[str, int]:
+        """Content size in bytes per hash, without transferring content."""
+        sizes: Dict[str, int] = {}
+        for chunk in chunked(list({h for h in hashes if h})):
+            resp = self._sb.table("blob").select("hash, size").in_("hash", chunk).execute()
+            sizes.update((r["hash"], r.get("size") or 0) for r in (resp.data or []))
+        return sizes
+
+    def get_blob(self, blob_hash: str) -> Optional[str]:
+        return self.get_blobs([blob_hash]).get(blob_hash)
+
+    def get_blobs(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Fetch contents for the given hashes, rebuilding delta chains (one query per chain level)."""
+        wanted = {h for h in hashes if h}
+        known: Dict[str, Optional[str]] = {}
+        for h in wanted:
+            cached = _cache_get(h)
+            if cached is not None:
+                known[h] = cached
+        rows: Dict[str, Dict] = {}
+        pending = wanted - known.keys()
+        while pending:
+            fetched: List[Dict] = []
+            for chunk in chunked(list(pending)):
+                fetched.extend(self._sb.table("blob").select("*").in_("hash", chunk).execute().data or [])
+            pending = set()
+            for r in fetched:
+                rows[r["hash"]] = r
+                if r.get("chunks"):
+                    pending.update(
+                        c for c in json.loads(r["chunks"])
+                        if c not in rows and c not in known and not self._cached_into(c, known)
+                    )
+                    continue
+                base = r.get("base_hash")
+                if r.get("delta") is not None and base not in rows and base not in known:
+                    cached = _cache_get(base)
+                    if cached is not None:
+                        known[base] = cached
+                    else:
+                        pending.add(base)
+        for h in wanted - known.keys():
+            self._rebuild(h, rows, known)
+        return {h: known[h] for h in wanted if known.get(h) is not None}
+
+    @staticmethod
+    def _cached_into(blob_hash: str, known: Dict[str, Optional[str]]) -> bool:
+        cached = _cache_get(blob_hash)
+        if cached is not None:
+            known[blob_hash] = cached
+        return cached is not None
+
+    def _rebuild(self, blob_hash: str, rows: Dict[str, Dict], known: Dict[str, Optional[str]]) -> None:
+        chain: List[Dict] = []
+        h = blob_hash
+        while h not in known:
+            row = rows.get(h)
+            if row is None:
+                return
+            if row.get("chunks"):
+                parts = []
+                for c in json.loads(row["chunks"]):
+                    if c not in known:
+                        self._rebuild(c, rows, known)
+                    parts.append(known.get(c))
+                known[h] = None if None in parts else "".join(parts)
+                _cache_put(h, known[h])
+                break
+            if row.get("delta") is None:
+                known[h] = row.get("content")
+                _cache_put(h, known[h])
+                break
+            chain.append(row)
+            h = row["base_hash"]
+        content = known[h]
+        if content is None:
+            return
+        for row in reversed(chain):
+            content = apply_delta(content, row["delta"])
+            known[row["hash"]] = content
+            _cache_put(row["hash"], content)
+
+    def _encode(self, new: Dict[str, tuple]) -> List[Dict]:
+        """Build blob rows, delta-encoding against the base where that is both allowed and smaller."""
+        delta_mode = BLOB_STORAGE_MODE == "delta"
+        rows: List[Dict] = []
+        depths: Dict[str, int] = {}
+        base_contents: Dict[str, str] = {}
+        if delta_mode:
+            base_hashes = [b for b in {b for _, b in new.values() if b} if b not in new]
+            for chunk in chunked(base_hashes):
+                resp = self._sb.table("blob").select("hash, depth").in_("hash", chunk).execute()
+                depths.update((r["hash"], r.get("depth") or 0) for r in (resp.data or []))
+            if depths:
+                base_contents = self.get_blobs(b for b, d in depths.items() if d + 1 < DELTA_KEYFRAME_INTERVAL)
+        for h, (content, base) in new.items():
+            row = {"hash": h, "content": content, "size": content_size(content)}
+            if delta_mode:
+                row.update({"base_hash": None, "delta": None, "depth": 0})
+                if base in base_contents:
+                    delta = make_delta(base_contents[base], content)
+                    if len(delta) < len(content):
+                        row.update({"content": None, "base_hash": base, "delta": delta, "depth": depths[base] + 1})
+            rows.append(row)
+        return rows
@@ -1,26 +1,62 @@
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
+import random
 from typing import Optional, List, Dict
-from config import get_supabase
-from supabase import Client # pyright: ignore[reportMissingImports]
+from config import get_backend
+from backends import StorageBackend
+from dao.cache import cached, invalidate
+
+class StaleHeadError(Exception):
+    """A branch head was not the expected commit any more: another writer advanced it first."""
+    def __init__(self, branch_id: int, expected_head_commit_id: Optional[int]):
+        super().__init__(f"Head of branch {branch_id} is no longer commit {expected_head_commit_id}")
+        self.branch_id = branch_id
+        self.expected_head_commit_id = expected_head_commit_id
+
+# Backoff between compare-and-swap attempts: the first retries are nearly immediate, later ones
+# spread out (randomized, so writers that collided do not collide again in lockstep)
+RETRY_BASE_DELAY = 0.005
+RETRY_MAX_DELAY = 0.5
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before retry `attempt` (1-based) of a head update that lost a race."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
 
 class Branch:
     def __init__(self):
-        self._sb : Client = get_supabase()
+        self._sb : StorageBackend = get_backend()
     
     def create_branch(self,repo_id:int,name:str,head_commit_id) -> Optional[Dict]:
         payload={"repo_id":repo_id,"name":name,"head_commit_id":head_commit_id}
         resp=self._sb.table("branch").insert(payload).execute()
+        invalidate(f"branches:{repo_id}")
         return resp.data[0] if resp.data else None
     
+    def create_branches(self, rows: List[Dict]) -> List[Dict]:
+        """Insert many {repo_id, name, head_commit_id} rows in one request."""
+        if not rows:
+            return []
+        resp = self._sb.table("branch").insert(rows).execute()
+        invalidate(*{f"branches:{r['repo_id']}" for r in resp.data or []})
+        return resp.data or []
+    
+    @cached("branch", tags=lambda branch_id: [f"branch:{branch_id}"])
     def get_branch_by_id(self, branch_id: int) -> Optional[Dict]:
         resp = self._sb.table("branch").select("*").eq("branch_id", branch_id).execute()
         return resp.data[0] if resp.data else None
 
     def delete_branch(self,branch_id:int) -> bool:
         resp=self._sb.table("branch").delete().eq("branch_id",branch_id).execute()
+        self._invalidate(branch_id, resp.data)
         return bool(resp.data)
     
+    def delete_branches(self, repo_id: int) -> int:
+        """Delete every branch of a repository."""
+        resp = self._sb.table("branch").delete().eq("repo_id", repo_id).execute()
+        invalidate(f"branches:{repo_id}", *{f"branch:{r['branch_id']}" for r in resp.data or []})
+        return len(resp.data or [])
+
+    @cached("branch", tags=lambda repo_id, name: [f"branches:{repo_id}"])
     def get_branch_by_name(self, repo_id: int, name: str) -> Optional[Dict]:
         """Get a branch by name within a repository."""
         resp = (
@@ -32,6 +68,7 @@ class Branch:
         )
         return resp.data[0] if resp.data else None
     
+    @cached("branch", tags=lambda repo_id: [f"branches:{repo_id}"])
     def list_branches(self, repo_id: int) -> List[Dict]:
         """List all branches in a repository."""
         resp = (
@@ -44,13 +81,35 @@ class Branch:
         return resp.data or []
     
     def update_head_commit(self, branch_id: int, head_commit_id: int) -> Optional[Dict]:
-        """Update the head commit of a branch (useful after commit or merge)."""
+        """
+        Unconditionally move a branch head. Concurrent writers can overwrite each other here;
+        commits and merges advance heads through compare_and_set_head instead.
+        """
         resp = (
             self._sb.table("branch")
             .update({"head_commit_id": head_commit_id})
             .eq("branch_id", branch_id)
             .execute()
         )
+        self._invalidate(branch_id, resp.data)
         return resp.data[0] if resp.data else None
-    
-    
\ No newline at end of file
+
+    def compare_and_set_head(self, branch_id: int, expected_head_commit_id: Optional[int],
+                             head_commit_id: int) -> Dict:
+        """
+        Move a branch head to head_commit_id only if it is still expected_head_commit_id (None for
+        a branch without commits), in one conditional update. Raises StaleHeadError otherwise.
+        """
+        query = self._sb.table("branch").update({"head_commit_id": head_commit_id}).eq("branch_id", branch_id)
+        if expected_head_commit_id is None:
+            query = query.is_("head_commit_id", "null")
+        else:
+            query = query.eq("head_commit_id", expected_head_commit_id)
+        resp = query.execute()
+        self._invalidate(branch_id, resp.data)
+        if not resp.data:
+            raise StaleHeadError(branch_id, expected_head_commit_id)
+        return resp.data[0]
+
+    def _invalidate(self, branch_id: int, rows: Optional[List[Dict]]) -> None:
+        invalidate(f"branch:{branch_id}", *{f"branches:{r['repo_id']}" for r in rows or []})
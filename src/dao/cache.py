@@ -0,0 +1,192 @@
+"""Read-through cache for DAO queries.
+
+Reads decorated with `cached` are stored in a bounded LRU keyed by method and arguments, expire
+after a TTL (immutable data never expires), and are tagged so write methods can `invalidate`
+exactly the listings they affect. A read whose tags are invalidated while it runs is returned
+but not stored, so it cannot outlive the write. Hit/miss counters are kept per namespace.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+from config import DAO_CACHE_ENABLED, DAO_CACHE_SIZE, DAO_CACHE_TTL, DAO_CACHE_MAX_BYTES
+
+def _copy(value: Any) -> Any:
+    """Rows are flat dicts; hand out copies so callers can't mutate cached entries."""
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    if isinstance(value, dict):
+        return {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+    return value
+
+def _weigh(value: Any) -> int:
+    """Rough memory footprint: string/bytes lengths plus a fixed per-object overhead."""
+    if isinstance(value, (str, bytes)):
+        return len(value) + 48
+    if isinstance(value, dict):
+        return 64 + sum(_weigh(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return 56 + sum(_weigh(v) for v in value)
+    return 32
+
+# Invalidation counters are kept per stripe of tags (by hash) so they take fixed memory
+_TAG_STRIPES = 1024
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and approximate bytes, with optional TTL and tags."""
+    def __init__(self, max_entries: int, default_ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._generations = [0] * _TAG_STRIPES
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, field: str) -> None:
+        counters = self.stats.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0})
+        counters[field] += 1
+
+    def get(self, key: Any, namespace: str = "default") -> tuple:
+        """Return (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self._count(namespace, "hits")
+                return True, entry[0]
+            if entry is not None:
+                self._drop(key)
+            self._count(namespace, "misses")
+            return False, None
+
+    def stamp(self, tags: Iterable[str]) -> tuple:
+        """Invalidation counters of tags; pass them to set() to drop a value read before a later invalidate."""
+        with self._lock:
+            return self._stamp(tags)
+
+    def _stamp(self, tags: Iterable[str]) -> tuple:
+        return tuple(self._generations[hash(tag) % _TAG_STRIPES] for tag in tags)
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = (),
+            namespace: str = "default", stamp: Optional[tuple] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        tags = tuple(tags)
+        weight = _weigh(value) if self.max_bytes else 0
+        if self.max_bytes and weight > self.max_bytes:
+            return
+        with self._lock:
+            if stamp is not None and self._stamp(tags) != stamp:
+                # One of its tags was invalidated since the value was read: it may predate the write
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires, tags, weight)
+            self.bytes += weight
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._count(namespace, "evictions")
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry carrying any of the tags; returns how many were dropped."""
+        dropped = 0
+        with self._lock:
+            for tag in tags:
+                self._generations[hash(tag) % _TAG_STRIPES] += 1
+                for key in self._tags.pop(tag, set()):
+                    if key in self._entries:
+                        self._drop(key)
+                        dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.bytes = 0
+            # Reads still running were started against the cleared state
+            self._generations = [g + 1 for g in self._generations]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Any) -> None:
+        _, _, tags, weight = self._entries.pop(key)
+        self.bytes -= weight
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+# Every cache created through new_cache is reported by cache_stats()
+_registry: Dict[str, LRUCache] = {}
+
+def new_cache(name: str, max_entries: int, default_ttl: Optional[float] = None,
+              max_bytes: Optional[int] = None) -> LRUCache:
+    cache = LRUCache(max_entries, default_ttl, max_bytes)
+    _registry[name] = cache
+    return cache
+
+# Process-wide DAO cache shared by every DAO instance
+dao_cache = new_cache("dao", DAO_CACHE_SIZE if DAO_CACHE_ENABLED else 0, DAO_CACHE_TTL, DAO_CACHE_MAX_BYTES)
+
+def cached(namespace: str, tags: Optional[Callable[..., Iterable[str]]] = None, immutable: bool = False):
+    """
+    Cache a DAO read method. `tags` receives the call's arguments (without self) and names
+    the invalidation tags; immutable results never expire. Empty results are not cached.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key = (namespace, fn.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = dao_cache.get(key, namespace)
+            if found:
+                return _copy(value)
+            entry_tags = tuple(tags(*args, **kwargs)) if tags else ()
+            stamp = dao_cache.stamp(entry_tags)
+            value = fn(self, *args, **kwargs)
+            if value:
+                dao_cache.set(
+                    key,
+                    _copy(value),
+                    ttl=None if immutable else dao_cache.default_ttl,
+                    tags=entry_tags,
+                    namespace=namespace,
+                    stamp=stamp,
+                )
+            return value
+        return wrapper
+    return decorator
+
+def invalidate(*tags: str) -> int:
+    return dao_cache.invalidate(*tags)
+
+def clear_caches() -> None:
+    """Empty every registered cache (config.set_backend calls this when the backend changes)."""
+    for cache in _registry.values():
+        cache.clear()
+
+def cache_stats() -> Dict[str, Any]:
+    """Size and per-namespace hit/miss/eviction counters of every registered cache."""
+    stats: Dict[str, Any] = {}
+    for name, cache in _registry.items():
+        with cache._lock:
+            stats[name] = {
+                "size": len(cache._entries),
+                "max_entries": cache.max_entries,
+                "bytes": cache.bytes,
+                "namespaces": {ns: dict(c) for ns, c in cache.stats.items()},
+            }
+    return stats
@@ -0,0 +1,51 @@
+"""Content-defined chunking for large file bodies.
+
+Text is cut at line ends chosen by the content itself: once a chunk holds at least
+`min_size` characters, a line whose CRC-32 has its low bits (`mask`) all zero ends the
+chunk, and no chunk grows past `max_size`. Because boundaries depend on nearby lines rather
+than offsets, an edit only changes the chunks around it and every other chunk keeps its
+hash, so versions of a large file share most of their chunks in the blob store.
+"""
+import zlib
+from typing import Iterable, Iterator, List
+
+def _lines(pieces: Iterable[str], max_size: int) -> Iterator[str]:
+    """Re-split arbitrary text pieces into lines; a line longer than max_size is cut into max_size runs."""
+    pending = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        data = pending + piece
+        start = 0
+        while True:
+            end = data.find("\n", start)
+            if end < 0:
+                break
+            line = data[start:end + 1]
+            start = end + 1
+            while len(line) > max_size:
+                yield line[:max_size]
+                line = line[max_size:]
+            yield line
+        pending = data[start:]
+        while len(pending) >= max_size:
+            yield pending[:max_size]
+            pending = pending[max_size:]
+    if pending:
+        yield pending
+
+def split_chunks(pieces: Iterable[str], min_size: int, max_size: int, mask: int) -> Iterator[str]:
+    """Yield the chunks of the text formed by `pieces`, reading the input incrementally."""
+    buf: List[str] = []
+    size = 0
+    for line in _lines(pieces, max_size):
+        if buf and size + len(line) > max_size:
+            yield "".join(buf)
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line)
+        if size >= min_size and zlib.crc32(line.encode("utf-8")) & mask == 0:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
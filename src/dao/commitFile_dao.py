@@ -1,28 +1,130 @@
 import sys, os
-sys.path.append(os.path.join(os.getcwd(), 'src')) 
+sys.path.append(os.path.join(os.getcwd(), 'src'))
 from typing import Optional, List, Dict
-from config import get_supabase
-from supabase import Client # pyright: ignore[reportMissingImports]
+from config import get_backend
+from backends import StorageBackend
+from dao.blob_dao import Blob, chunked
+from dao.cache import cached, invalidate
+from dao.file_dao import LazyFile
 class CommitFile:
     def __init__(self):
-        self._sb : Client = get_supabase()
+        self._sb : StorageBackend = get_backend()
+        self.blob : Blob = Blob()
 
-    def add_file_to_commit(self, commit_id: int, file_id: int, version_number: int, content: str) -> Optional[Dict]:
-        """Add a file version to a commit."""
+    def add_file_to_commit(self, commit_id: int, file_id: int, version_number: int, content: str, base_hash: Optional[str] = None) -> Optional[Dict]:
+        """
+        Add a file version to a commit. Content is stored once in the blob store and referenced by hash;
+        base_hash (the file's previous blob) lets the store keep it as a delta.
+        """
+        blob_hash = self.blob.put_blob(content, base_hash)
         payload = {
             "commit_id": commit_id,
             "file_id": file_id,
             "version_number": version_number,
-            "content": content
+            "blob_hash": blob_hash
         }
         resp = self._sb.table("commitfile").insert(payload).execute()
-        return resp.data[0] if resp.data else None
-    
+        invalidate(f"commit:{commit_id}")
+        return self._with_content(resp.data)[0] if resp.data else None
+
+    @cached("commitfile", tags=lambda commit_id: [f"commit:{commit_id}"], immutable=True)
     def get_files_by_commit(self, commit_id: int) -> List[Dict]:
         """Retrieve all files associated with a specific commit."""
         resp = self._sb.table("commitfile").select("*").eq("commit_id", commit_id).execute()
-        return resp.data or []
-    
+        return self._with_content(resp.data or [])
+
+    @cached("commitfile", tags=lambda commit_id: [f"commit:{commit_id}"], immutable=True)
+    def get_file_meta_by_commit(self, commit_id: int) -> List[Dict]:
+        """File versions written by a commit with their blob hash and size, without content."""
+        resp = (
+            self._sb.table("commitfile")
+            .select("id, commit_id, file_id, version_number, blob_hash")
+            .eq("commit_id", commit_id)
+            .execute()
+        )
+        rows = resp.data or []
+        sizes = self.blob.get_sizes(r["blob_hash"] for r in rows)
+        for r in rows:
+            r["size"] = sizes.get(r["blob_hash"])
+        return rows
+
+    def list_by_commits(self, commit_ids: List[int]) -> List[Dict]:
+        """Version rows (without content) of many commits, fetched IN_FILTER_CHUNK commits per request."""
+        rows: List[Dict] = []
+        for chunk in chunked(list(commit_ids)):
+            resp = (
+                self._sb.table("commitfile")
+                .select("id, commit_id, file_id, version_number, blob_hash")
+                .in_("commit_id", chunk)
+                .execute()
+            )
+            rows.extend(resp.data or [])
+        return rows
+
+    def list_by_blobs(self, blob_hashes: List[str]) -> List[Dict]:
+        """Version rows (without content) referencing any of the blob hashes."""
+        rows: List[Dict] = []
+        for chunk in chunked(list(blob_hashes)):
+            resp = (
+                self._sb.table("commitfile")
+                .select("id, commit_id, file_id, version_number, blob_hash")
+                .in_("blob_hash", chunk)
+                .execute()
+            )
+            rows.extend(resp.data or [])
+        return rows
+
+    def list_by_files(self, file_ids: List[int]) -> List[Dict]:
+        """Every version row (without content) of the given files."""
+        rows: List[Dict] = []
+        for chunk in chunked(list(file_ids)):
+            resp = (
+                self._sb.table("commitfile")
+                .select("id, commit_id, file_id, version_number, blob_hash")
+                .in_("file_id", chunk)
+                .execute()
+            )
+            rows.extend(resp.data or [])
+        return rows
+
+    def insert_rows(self, rows: List[Dict], batch_size: int = 500) -> int:
+        """Insert many {commit_id, file_id, version_number, blob_hash} rows in batched requests."""
+        inserted = 0
+        for chunk in chunked(rows, batch_size):
+            resp = self._sb.table("commitfile").insert(chunk).execute()
+            inserted += len(resp.data or [])
+        invalidate(*{f"commit:{r['commit_id']}" for r in rows})
+        return inserted
+
+    def delete_by_commits(self, commit_ids: List[int]) -> int:
+        """Delete the file version rows of the given commits."""
+        deleted = 0
+        for chunk in chunked(list(commit_ids)):
+            resp = self._sb.table("commitfile").delete().in_("commit_id", chunk).execute()
+            deleted += len(resp.data or [])
+        invalidate(*{f"commit:{i}" for i in commit_ids})
+        return deleted
+
+    def lazy(self, row: Dict) -> LazyFile:
+        """Wrap a commit file row so its content is read from the blob store only when accessed."""
+        return LazyFile(row, lambda: self.blob.get_blob(row["blob_hash"]))
+
+    @cached("commitfile", tags=lambda commit_id: [f"commit:{commit_id}"], immutable=True)
+    def get_blob_hashes(self, commit_id: int) -> Dict[int, str]:
+        """Map file_id -> blob_hash for a commit without loading any content."""
+        resp = self._sb.table("commitfile").select("file_id, blob_hash").eq("commit_id", commit_id).execute()
+        return {r["file_id"]: r["blob_hash"] for r in (resp.data or [])}
+
+    def get_latest_versions(self, file_ids: List[int]) -> Dict[int, int]:
+        """Highest version_number ever committed per file_id (files never committed are absent)."""
+        latest: Dict[int, int] = {}
+        for chunk in chunked(list(file_ids)):
+            resp = self._sb.table("commitfile").select("file_id, version_number").in_("file_id", chunk).execute()
+            for r in resp.data or []:
+                latest[r["file_id"]] = max(latest.get(r["file_id"], 0), r.get("version_number") or 0)
+        return latest
+
+    @cached("commitfile", tags=lambda commit_id, file_id: [f"commit:{commit_id}"], immutable=True)
     def get_file_version(self, commit_id: int, file_id: int) -> Optional[Dict]:
         """Get a specific file version in a commit."""
         resp = (
@@ -32,4 +134,13 @@ class CommitFile:
             .eq("file_id", file_id)
             .execute()
         )
-        return resp.data[0] if resp.data else None
\ No newline at end of file
+        return self._with_content(resp.data)[0] if resp.data else None
+
+    def _with_content(self, rows: List[Dict]) -> List[Dict]:
+        """Fill in `content` from the blob store for rows that only carry a blob_hash."""
+        pending = [r for r in rows if r.get("blob_hash") and r.get("content") is None]
+        if pending:
+            blobs = self.blob.get_blobs(r["blob_hash"] for r in pending)
+            for r in pending:
+                r["content"] = blobs.get(r["blob_hash"])
+        return rows
@@ -1,25 +1,138 @@
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
-from typing import Optional, List, Dict
-from config import get_supabase
-from supabase import Client # pyright: ignore[reportMissingImports] 
+from typing import Optional, List, Dict, Tuple
+from config import get_backend
+from backends import StorageBackend
+from dao.cache import cached, invalidate
+from dao.blob_dao import chunked
+from dao.branch_dao import StaleHeadError
+from dao.journal import get_journal
+
+# Columns of the ancestry index: enough to walk the commit DAG without messages or trees
+GRAPH_COLUMNS = "commit_id, repo_id, parent_id, merge_parent_id, generation"
 
 class Commit:
-    def __init__(self):
-        self._sb : Client = get_supabase()
+    def __init__(self,journaled:bool=True):
+        self._sb : StorageBackend = get_backend()
+        # Commits are never journaled; writes settle the offline journal so the files they build on are stored
+        self.journal=get_journal() if journaled else None
+
+    def settle(self)->None:
+        """Sync pending journal entries before a write that depends on the stored state."""
+        if self.journal:
+            self.journal.sync()
 
     def create_commit(self,repo_id:int,message:str,timestamp: str = None)->Optional[Dict]:
+        self.settle()
         payload={"repo_id":repo_id,"message":message}
         if timestamp:
             payload["timestamp"] = timestamp
         resp=self._sb.table("commit").insert(payload).execute()
+        invalidate(f"commits:{repo_id}")
         return resp.data[0] if resp.data else None
     
+    def create_commit_with_files(self,repo_id:int,message:str,files:List[Dict],tree_hash:str=None,
+                                 parent_id:int=None,merge_parent_id:int=None,branch_id:int=None,
+                                 search:List[Dict]=None)->Optional[Dict]:
+        """
+        Insert a commit (with its tree_hash and parents) and its commitfile rows ({file_id, version_number, blob_hash})
+        in one round trip and one transaction (server-side create_commit_with_files function).
+        The generation number is derived from the parents. With a branch_id the commit is a
+        compare-and-swap on that branch: it is written, and the branch advanced to it, only if the
+        branch head is still parent_id; otherwise nothing is written and StaleHeadError is raised.
+        `search` holds the search index entries of the new versions (SearchIndex.commit_entries),
+        written in the same transaction.
+        """
+        self.settle()
+        params={"p_repo_id":repo_id,"p_message":message,"p_files":files,"p_tree_hash":tree_hash,
+                "p_parent_id":parent_id,"p_merge_parent_id":merge_parent_id,"p_branch_id":branch_id,
+                "p_search":search}
+        resp=self._sb.rpc("create_commit_with_files",params).execute()
+        tags=[f"commits:{repo_id}"]
+        if branch_id is not None:
+            tags+=[f"branch:{branch_id}",f"branches:{repo_id}"]
+        invalidate(*tags)
+        if branch_id is not None and not resp.data:
+            raise StaleHeadError(branch_id,parent_id)
+        return resp.data or None
+    
+    def insert_commits(self,rows:List[Dict],batch_size:int=500)->List[Dict]:
+        """Insert many commit rows in batched requests; returns the created rows in input order."""
+        self.settle()
+        out:List[Dict]=[]
+        for chunk in chunked(rows,batch_size):
+            resp=self._sb.table("commit").insert(chunk).execute()
+            out.extend(resp.data or [])
+        invalidate(*{f"commits:{r['repo_id']}" for r in out})
+        return out
+    
+    def upsert_commits(self,rows:List[Dict],batch_size:int=500)->List[Dict]:
+        """Overwrite many full commit rows (keyed by commit_id) in batched requests."""
+        self.settle()
+        out:List[Dict]=[]
+        for chunk in chunked(rows,batch_size):
+            resp=self._sb.table("commit").upsert(chunk,on_conflict="commit_id").execute()
+            out.extend(resp.data or [])
+        invalidate(*{f"commits:{r['repo_id']}" for r in out},*{f"commit:{r['commit_id']}" for r in out})
+        return out
+    
+    def delete_commits(self,repo_id:int)->int:
+        """Delete every commit of a repository (their commitfile rows must be deleted first)."""
+        self.settle()
+        resp=self._sb.table("commit").delete().eq("repo_id",repo_id).execute()
+        invalidate(f"commits:{repo_id}",*{f"commit:{r['commit_id']}" for r in resp.data or []})
+        return len(resp.data or [])
+    
+    @cached("commit", immutable=True)
     def get_commit_by_id(self,commit_id:int)->Optional[Dict]:
         resp=self._sb.table("commit").select("*").eq("commit_id",commit_id).execute()
         return resp.data[0] if resp.data else None
     
+    @cached("commit", tags=lambda repo_id: [f"commits:{repo_id}"])
+    def get_latest_commit(self,repo_id:int)->Optional[Dict]:
+        resp=self._sb.table("commit").select("*").eq("repo_id",repo_id).order("timestamp",desc=True).order("commit_id",desc=True).limit(1).execute()
+        return resp.data[0] if resp.data else None
+    
+    @cached("commit", tags=lambda repo_id: [f"commits:{repo_id}"])
     def list_commits(self,repo_id:int)->Optional[Dict]:
         resp=self._sb.table("commit").select("*").eq("repo_id",repo_id).order("timestamp",desc=True).execute()
         return resp.data or []
+    
+    @cached("commit", tags=lambda repo_id, limit=100, after=None: [f"commits:{repo_id}"])
+    def list_commits_page(self,repo_id:int,limit:int=100,after:Optional[Tuple[str,int]]=None)->List[Dict]:
+        """
+        One page of commits, newest first, ordered by (timestamp, commit_id).
+        `after` is the (timestamp, commit_id) cursor of the last row of the previous page;
+        the keyset filter keeps every page an index range scan, however deep the history.
+        """
+        q=self._sb.table("commit").select("*").eq("repo_id",repo_id)
+        if after is not None:
+            ts,commit_id=after
+            q=q.or_(f'timestamp.lt."{ts}",and(timestamp.eq."{ts}",commit_id.lt.{commit_id})')
+        resp=q.order("timestamp",desc=True).order("commit_id",desc=True).limit(limit).execute()
+        return resp.data or []
+    
+    def get_graph_nodes(self,commit_ids:List[int])->List[Dict]:
+        """Ancestry rows (GRAPH_COLUMNS) of the given commits."""
+        rows:List[Dict]=[]
+        for chunk in chunked(list(commit_ids)):
+            resp=self._sb.table("commit").select(GRAPH_COLUMNS).in_("commit_id",chunk).execute()
+            rows.extend(resp.data or [])
+        return rows
+    
+    def list_graph_range(self,repo_id:int,min_generation:int,max_generation:int)->List[Dict]:
+        """Ancestry rows of every commit in a repo whose generation lies in [min_generation, max_generation]."""
+        resp=(
+            self._sb.table("commit")
+            .select(GRAPH_COLUMNS)
+            .eq("repo_id",repo_id)
+            .gte("generation",min_generation)
+            .lte("generation",max_generation)
+            .execute()
+        )
+        return resp.data or []
+    
+    @staticmethod
+    def cursor_of(commit:Dict)->Tuple[str,int]:
+        return (commit["timestamp"],commit["commit_id"])
     
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""Line deltas used by the blob store to keep near-identical versions small.
+
+A delta is a JSON list of ops applied to the base's lines: `[start, end]` copies
+base lines start..end, a string inserts new text verbatim.
+"""
+import json
+from difflib import SequenceMatcher
+from typing import List
+
+def make_delta(base: str, target: str) -> str:
+    """Encode `target` as copy/insert ops against `base`."""
+    a = base.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+    ops: List = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            if ops and isinstance(ops[-1], list) and ops[-1][1] == i1:
+                ops[-1][1] = i2
+            else:
+                ops.append([i1, i2])
+        elif j2 > j1:
+            text = "".join(b[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += text
+            else:
+                ops.append(text)
+    return json.dumps(ops, separators=(",", ":"))
+
+def apply_delta(base: str, delta: str) -> str:
+    """Rebuild the target text from `base` and a delta produced by make_delta."""
+    a = base.splitlines(keepends=True)
+    out: List[str] = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            out.append(op)
+        else:
+            out.extend(a[op[0]:op[1]])
+    return "".join(out)
@@ -0,0 +1,159 @@
+"""Line diffs: Myers' O(ND) algorithm in linear space, and unified diff output.
+
+`diff_opcodes` returns difflib-style opcodes (`equal`, `replace`, `delete`, `insert` with
+i1, i2, j1, j2 ranges) so callers can swap it in for SequenceMatcher. Lines are interned
+to integers first, and common prefixes/suffixes are stripped before each search, so the
+cost grows with the number of differences (D) rather than with file length squared.
+"""
+from typing import List, Tuple, Iterator, Sequence
+
+Opcode = Tuple[str, int, int, int, int]
+
+def _middle_snake(a: Sequence[int], a0: int, a1: int, b: Sequence[int], b0: int, b1: int) -> Tuple[int, int, int, int]:
+    """
+    Find the middle snake of an optimal edit path between a[a0:a1] and b[b0:b1] by running the
+    greedy search forward and backward at once. Returns (x, y, u, v): the snake runs diagonally
+    from a[x], b[y] to a[u], b[v] (absolute indices).
+    """
+    n, m = a1 - a0, b1 - b0
+    delta = n - m
+    odd = delta & 1
+    limit = (n + m + 1) // 2
+    offset = limit + 1
+    vf = [0] * (2 * limit + 3)
+    vb = [0] * (2 * limit + 3)
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            sx, sy = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            back = delta - k
+            if odd and -(d - 1) <= back <= d - 1 and x + vb[offset + back] >= n:
+                return a0 + sx, b0 + sy, a0 + x, b0 + y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            sx, sy = x, y
+            while x < n and y < m and a[a1 - 1 - x] == b[b1 - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            fwd = delta - k
+            if not odd and -d <= fwd <= d and x + vf[offset + fwd] >= n:
+                return a1 - x, b1 - y, a1 - sx, b1 - sy
+    # Unreachable for valid input: the searches always meet by d = ceil((n + m) / 2)
+    return a0, b0, a0, b0
+
+def _matches(a: Sequence[int], b: Sequence[int]) -> List[Tuple[int, int, int]]:
+    """Matching blocks (i, j, size) of a shortest edit script, in order."""
+    blocks: List[Tuple[int, int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        # Common prefix and suffix never need the search
+        p = 0
+        while a0 + p < a1 and b0 + p < b1 and a[a0 + p] == b[b0 + p]:
+            p += 1
+        if p:
+            blocks.append((a0, b0, p))
+        a0, b0 = a0 + p, b0 + p
+        s = 0
+        while a1 - s > a0 and b1 - s > b0 and a[a1 - 1 - s] == b[b1 - 1 - s]:
+            s += 1
+        if s:
+            blocks.append((a1 - s, b1 - s, s))
+        a1, b1 = a1 - s, b1 - s
+        if a0 == a1 or b0 == b1:
+            continue
+        x, y, u, v = _middle_snake(a, a0, a1, b, b0, b1)
+        if u == x and (x, y) in ((a0, b0), (a1, b1)):
+            continue  # no split point: the whole range is one replacement
+        if u > x:
+            blocks.append((x, y, u - x))
+        stack.append((u, a1, v, b1))
+        stack.append((a0, x, b0, y))
+    blocks.sort()
+    return blocks
+
+def diff_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """difflib-style opcodes turning line list `a` into `b`."""
+    ids: dict = {}
+    ai = [ids.setdefault(line, len(ids)) for line in a]
+    bi = [ids.setdefault(line, len(ids)) for line in b]
+    ops: List[Opcode] = []
+    i = j = 0
+    for bi_, bj, size in _matches(ai, bi) + [(len(a), len(b), 0)]:
+        if i < bi_ and j < bj:
+            ops.append(("replace", i, bi_, j, bj))
+        elif i < bi_:
+            ops.append(("delete", i, bi_, j, bj))
+        elif j < bj:
+            ops.append(("insert", i, bi_, j, bj))
+        if size:
+            if ops and ops[-1][0] == "equal":
+                ops[-1] = ("equal", ops[-1][1], bi_ + size, ops[-1][3], bj + size)
+            else:
+                ops.append(("equal", bi_, bi_ + size, bj, bj + size))
+        i, j = bi_ + size, bj + size
+    return ops
+
+def _grouped(ops: List[Opcode], n: int) -> Iterator[List[Opcode]]:
+    """Split opcodes into hunks with up to n lines of context (as difflib's get_grouped_opcodes)."""
+    if not ops:
+        ops = [("equal", 0, 1, 0, 1)]
+    if ops[0][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[0]
+        ops[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if ops[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[-1]
+        ops[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+def _range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+def unified_diff(old: str, new: str, fromfile: str = "a", tofile: str = "b", n: int = 3) -> Tuple[str, int, int]:
+    """Unified diff text of two versions plus the number of added and removed lines."""
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    out: List[str] = []
+    added = removed = 0
+    for group in _grouped(diff_opcodes(a, b), n):
+        if not out:
+            out += [f"--- {fromfile}\n", f"+++ {tofile}\n"]
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@\n")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out += [" " + line for line in a[i1:i2]]
+                continue
+            if tag in ("replace", "delete"):
+                out += ["-" + line for line in a[i1:i2]]
+                removed += i2 - i1
+            if tag in ("replace", "insert"):
+                out += ["+" + line for line in b[j1:j2]]
+                added += j2 - j1
+    text = "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in out)
+    return text, added, removed
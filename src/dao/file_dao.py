@@ -1,37 +1,201 @@
 
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
-from typing import Optional, List, Dict
-from config import get_supabase
-from supabase import Client # pyright: ignore[reportMissingImports] 
+from typing import Optional, List, Dict, Callable, Iterable, Iterator
+from collections.abc import Mapping
+from config import get_backend
+from backends import StorageBackend
+from dao.blob_dao import Blob, content_hash, content_size, chunked, is_chunked
+from dao.cache import cached, invalidate
+from dao.journal import get_journal
+
+# Columns of a file row without its content
+META_COLUMNS = "file_id, repo_id, filename, size, content_hash"
+
+class LazyFile(Mapping):
+    """
+    Read-only file row holding only metadata; `content` is fetched by `loader` on first access
+    and kept. Supports row-style access (f["filename"]) so it drops in where dicts were used.
+    """
+    def __init__(self, meta: Dict, loader: Callable[[], Optional[str]]):
+        self._meta = dict(meta)
+        self._loader = loader
+        self._loaded = "content" in self._meta
+
+    @property
+    def content(self) -> Optional[str]:
+        if not self._loaded:
+            self._meta["content"] = self._loader()
+            self._loaded = True
+        return self._meta["content"]
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __getitem__(self, key: str):
+        if key == "content":
+            return self.content
+        return self._meta[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._meta
+        if not self._loaded:
+            yield "content"
+
+    def __len__(self) -> int:
+        return len(self._meta) + (0 if self._loaded else 1)
+
+    def __repr__(self) -> str:
+        meta = {k: v for k, v in self._meta.items() if k != "content"}
+        return f"LazyFile({meta}, loaded={self._loaded})"
 
 class File:
-    def __init__(self):
-        self._sb : Client = get_supabase()
+    """
+    Working files. Large bodies are not kept inline: they go to the blob store as chunks and
+    the row keeps only content_hash and size, with content null. Such a row already points at
+    its committed blob, and get_content/iter_content read through to the blob store.
+    With an offline journal, create_file and update_file are recorded locally, reads overlay
+    the pending changes, and bulk, streaming and delete writes sync the journal first.
+    """
+    def __init__(self, journaled: bool = True):
+        self._sb : StorageBackend = get_backend()
+        self.blob : Blob = Blob()
+        self.journal = get_journal() if journaled else None
+
+    def settle(self) -> None:
+        """Sync pending journal entries before a write that depends on the stored state."""
+        if self.journal:
+            self.journal.sync()
+
+    def _resolve(self, file_id: int) -> int:
+        return self.journal.resolve(file_id) if self.journal else file_id
     
     def create_file(self,repo_id:int,filename:str,content:str)->Optional[Dict]:
-        payload={"repo_id":repo_id,"filename":filename,"content":content}
+        if self.journal:
+            return self.journal.create_file(repo_id, filename, content)
+        payload={"repo_id":repo_id,"filename":filename,**self._content_fields(content)}
         resp=self._sb.table("file").insert(payload).execute()
+        self._invalidate(resp.data)
+        return resp.data[0] if resp.data else None
+
+    def create_file_stream(self, repo_id: int, filename: str, pieces: Iterable[str]) -> Optional[Dict]:
+        """Create a file from text pieces (e.g. an open file) without holding the whole body in memory."""
+        h, size = self.blob.put_stream(pieces)
+        payload = {"repo_id": repo_id, "filename": filename, "content": None, "content_hash": h, "size": size}
+        resp = self._sb.table("file").insert(payload).execute()
+        self._invalidate(resp.data)
         return resp.data[0] if resp.data else None
     
     def get_file_by_id(self,file_id:int)->Optional[Dict]:
+        if self.journal:
+            file_id = self.journal.resolve(file_id)
+            return self.journal.get_file(file_id) or self.journal.overlay_file(self._get_file_row(file_id))
+        return self._get_file_row(file_id)
+
+    @cached("file", tags=lambda file_id: [f"file:{file_id}"])
+    def _get_file_row(self,file_id:int)->Optional[Dict]:
         resp=self._sb.table("file").select("*").eq("file_id",file_id).execute()
         return resp.data[0] if resp.data else None
     
+    def get_content(self,file_id:int)->Optional[str]:
+        if self.journal:
+            file_id = self.journal.resolve(file_id)
+            pending = self.journal.pending_content(file_id)
+            if pending is not None:
+                return pending
+        return self._get_stored_content(file_id)
+
+    @cached("file", tags=lambda file_id: [f"file:{file_id}"])
+    def _get_stored_content(self,file_id:int)->Optional[str]:
+        resp=self._sb.table("file").select("content, content_hash").eq("file_id",file_id).execute()
+        if not resp.data:
+            return None
+        row = resp.data[0]
+        if row["content"] is None and row.get("content_hash"):
+            return self.blob.get_blob(row["content_hash"])
+        return row["content"]
+
+    def iter_content(self, file_id: int) -> Iterator[str]:
+        """Yield a file's content in pieces; large bodies are streamed chunk batch by chunk batch."""
+        file_id = self._resolve(file_id)
+        pending = self.journal.pending_content(file_id) if self.journal else None
+        if pending is not None:
+            yield pending
+            return
+        resp = self._sb.table("file").select("content, content_hash").eq("file_id", file_id).execute()
+        if not resp.data:
+            return
+        row = resp.data[0]
+        if row["content"] is None and row.get("content_hash"):
+            yield from self.blob.iter_blob(row["content_hash"])
+        elif row["content"]:
+            yield row["content"]
+
+    def get_contents(self, file_ids: List[int]) -> Dict[int, str]:
+        """Content per file_id, large bodies included (read from the blob store in one batch)."""
+        rows = self.get_files_by_ids(file_ids)
+        stored = self.blob.get_blobs(r["content_hash"] for r in rows if r["content"] is None and r.get("content_hash"))
+        contents = {
+            r["file_id"]: r["content"] if r["content"] is not None else stored.get(r.get("content_hash"), "")
+            for r in rows
+        }
+        if self.journal:
+            # Keyed by the ids asked for, even if a temporary id was synced meanwhile
+            contents = {i: contents[self.journal.resolve(i)] for i in file_ids if self.journal.resolve(i) in contents}
+        return contents
+    
     def list_files(self)->Optional[Dict]:
+        rows = self._list_files()
+        return self.journal.overlay_files(rows) if self.journal else rows
+
+    @cached("file", tags=lambda: ["files"])
+    def _list_files(self)->Optional[Dict]:
         resp=self._sb.table("file").select("*").order("file_id",desc=True).execute()
         return resp.data or []
     
+    def list_files_page(self, repo_id: Optional[int] = None, limit: int = 100, after_file_id: Optional[int] = None,
+                        meta_only: bool = False) -> List[Dict]:
+        """
+        One page of files (optionally within a repo), highest file_id first; keyset cursor on file_id.
+        meta_only leaves out content. Files created in the journal have negative temporary
+        ids, so they come after every stored file, on the last pages.
+        """
+        rows = self._list_files_page(repo_id, limit, after_file_id, meta_only)
+        if not self.journal or not self.journal.has_pending():
+            return rows
+        rows = self.journal.overlay_files(rows, repo_id, meta_only, creates=len(rows) < limit)
+        rows = [r for r in rows if after_file_id is None or r["file_id"] < after_file_id]
+        return sorted(rows, key=lambda r: r["file_id"], reverse=True)[:limit]
+
+    @cached("file", tags=lambda repo_id=None, limit=100, after_file_id=None, meta_only=False: [f"files:{repo_id}" if repo_id is not None else "files"])
+    def _list_files_page(self, repo_id: Optional[int] = None, limit: int = 100, after_file_id: Optional[int] = None,
+                         meta_only: bool = False) -> List[Dict]:
+        q = self._sb.table("file").select(META_COLUMNS if meta_only else "*")
+        if repo_id is not None:
+            q = q.eq("repo_id", repo_id)
+        if after_file_id is not None:
+            q = q.lt("file_id", after_file_id)
+        resp = q.order("file_id", desc=True).limit(limit).execute()
+        return resp.data or []
+    
     def delete_file(self,file_id:int) -> bool:
+        self.settle()
+        file_id = self._resolve(file_id)
         resp=self._sb.table("file").delete().eq("file_id",file_id).execute()
+        self._invalidate(resp.data)
         return bool(resp.data)
     
     def update_file(self, file_id: int, new_filename: str = None, new_content: str = None) -> Optional[Dict]:
+        if self.journal:
+            if new_filename is None and new_content is None:
+                return None
+            return self.journal.update_file(file_id, new_filename, new_content)
         update_fields: Dict = {}
         if new_filename is not None:
             update_fields["filename"] = new_filename
         if new_content is not None:
-            update_fields["content"] = new_content
+            update_fields.update(self._content_fields(new_content))
 
         if not update_fields:
             return None
@@ -43,9 +207,103 @@ class File:
             .eq("file_id", file_id)
             .execute()
         )
+        self._invalidate(resp.data)
         return resp.data[0] if resp.data else None
     
+    def update_file_stream(self, file_id: int, pieces: Iterable[str]) -> Optional[Dict]:
+        """Replace a file's content with text pieces, stored as chunks in the blob store."""
+        self.settle()
+        file_id = self._resolve(file_id)
+        h, size = self.blob.put_stream(pieces)
+        resp = (
+            self._sb
+            .table("file")
+            .update({"content": None, "content_hash": h, "size": size})
+            .eq("file_id", file_id)
+            .execute()
+        )
+        self._invalidate(resp.data)
+        return resp.data[0] if resp.data else None
+
+    def _content_fields(self, content: str) -> Dict:
+        """Content columns for a body: inline, or a pointer to the blob store for large bodies."""
+        if is_chunked(content):
+            h, size = self.blob.put_stream([content])
+            return {"content": None, "content_hash": h, "size": size}
+        return {"content": content, "content_hash": content_hash(content), "size": content_size(content)}
+
     def list_files_in_repo(self, repo_id: int) -> Optional[Dict]:
+        rows = self._list_files_in_repo(repo_id)
+        return self.journal.overlay_files(rows, repo_id) if self.journal else rows
+
+    @cached("file", tags=lambda repo_id: [f"files:{repo_id}"])
+    def _list_files_in_repo(self, repo_id: int) -> Optional[Dict]:
         resp = self._sb.table("file").select("*").eq("repo_id", repo_id).order("file_id", desc=True).execute()
         return resp.data or []
-    
\ No newline at end of file
+
+    def list_file_meta(self, repo_id: int) -> List[Dict]:
+        """Id, name, size and content_hash of every file in a repo, highest file_id first (no content transferred)."""
+        rows = self._list_file_meta(repo_id)
+        return self.journal.overlay_files(rows, repo_id, meta_only=True) if self.journal else rows
+
+    @cached("file", tags=lambda repo_id: [f"files:{repo_id}"])
+    def _list_file_meta(self, repo_id: int) -> List[Dict]:
+        resp = self._sb.table("file").select(META_COLUMNS).eq("repo_id", repo_id).order("file_id", desc=True).execute()
+        return resp.data or []
+
+    def lazy(self, meta: Dict) -> LazyFile:
+        """Wrap a metadata row so its content is fetched only when accessed."""
+        return LazyFile(meta, lambda: self.get_content(meta["file_id"]))
+
+    def get_files_by_ids(self, file_ids: List[int]) -> List[Dict]:
+        created: List[Dict] = []
+        if self.journal:
+            file_ids = [self.journal.resolve(i) for i in file_ids]
+            created = [r for r in map(self.journal.get_file, file_ids) if r]
+            local = {r["file_id"] for r in created}
+            file_ids = [i for i in file_ids if i not in local]
+        rows: List[Dict] = []
+        for chunk in chunked(list(file_ids)):
+            resp = self._sb.table("file").select("*").in_("file_id", chunk).execute()
+            rows.extend(resp.data or [])
+        if self.journal:
+            rows = [self.journal.overlay_file(r) for r in rows] + created
+        return rows
+
+    def insert_files(self, rows: List[Dict], batch_size: int = 500) -> List[Dict]:
+        """Insert many new file rows in batched requests; returns the created rows in input order."""
+        self.settle()
+        out: List[Dict] = []
+        for chunk in chunked(rows, batch_size):
+            resp = self._sb.table("file").insert(chunk).execute()
+            self._invalidate(resp.data)
+            out.extend(resp.data or [])
+        return out
+
+    def upsert_files(self, rows: List[Dict], batch_size: int = 500) -> List[Dict]:
+        """Insert or overwrite many file rows (keyed by file_id) in batched requests."""
+        self.settle()
+        out: List[Dict] = []
+        for chunk in chunked(rows, batch_size):
+            resp = self._sb.table("file").upsert(chunk, on_conflict="file_id").execute()
+            self._invalidate(resp.data)
+            out.extend(resp.data or [])
+        return out
+
+    def delete_files(self, file_ids: List[int]) -> int:
+        self.settle()
+        file_ids = [self._resolve(i) for i in file_ids]
+        deleted = 0
+        for chunk in chunked(list(file_ids)):
+            resp = self._sb.table("file").delete().in_("file_id", chunk).execute()
+            self._invalidate(resp.data)
+            deleted += len(resp.data or [])
+        return deleted
+
+    def _invalidate(self, rows: Optional[List[Dict]]) -> None:
+        """Drop cached reads touched by written rows: the files themselves and their repo listings."""
+        tags = {"files"}
+        for r in rows or []:
+            tags.add(f"file:{r['file_id']}")
+            tags.add(f"files:{r['repo_id']}")
+        invalidate(*tags)
@@ -0,0 +1,166 @@
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import heapq
+from typing import Optional, List, Dict, Tuple
+from config import GRAPH_CACHE_SIZE
+from dao.cache import LRUCache
+from dao.commit_dao import Commit
+
+# Generations fetched per window when the walk needs commits it has not seen yet
+GRAPH_WINDOW = 256
+
+# Paint flags of the ancestry walk
+_LEFT, _RIGHT, _STALE = 1, 2, 4
+_BOTH = _LEFT | _RIGHT
+
+class CommitGraph:
+    """
+    Ancestry index over the commit DAG.
+
+    Every commit stores its parents and a generation number (root = 1, else 1 + highest parent),
+    so a commit can only be an ancestor of commits with a higher generation. Walks visit commits
+    in decreasing generation and stop as soon as the answer is settled, so they cover only the
+    part of history between the commits asked about, never the whole repository. Graph rows are
+    immutable; the graph_cache_size most recently used are kept in memory and missing ones are
+    fetched a window of generations at a time.
+    """
+    def __init__(self):
+        self.commit : Commit = Commit()
+        self._nodes : LRUCache = LRUCache(GRAPH_CACHE_SIZE)
+
+    # ---------------- Index ----------------
+    def node(self, commit_id: int) -> Optional[Dict]:
+        """Ancestry row of a commit: commit_id, repo_id, parent_id, merge_parent_id, generation."""
+        found, node = self._nodes.get(commit_id)
+        if not found:
+            self._load([commit_id])
+            node = self._nodes.get(commit_id)[1]
+        return node
+
+    def parents(self, commit_id: int) -> List[int]:
+        node = self.node(commit_id)
+        if not node:
+            return []
+        return [p for p in (node.get("parent_id"), node.get("merge_parent_id")) if p is not None]
+
+    def generation(self, commit_id: int) -> int:
+        node = self.node(commit_id)
+        return (node or {}).get("generation") or 0
+
+    def _load(self, commit_ids: List[int]) -> None:
+        """
+        Fetch missing rows, plus the window of generations below each, so the walk continues from
+        memory. A row is only missing if its window was never fetched, was partly evicted, or has
+        gained commits since (the highest window grows with every commit, and older ones when a
+        branch off old history commits), so the window is fetched again in every case.
+        """
+        rows = self.commit.get_graph_nodes(self._missing(commit_ids))
+        windows = {(r["repo_id"], (r["generation"] - 1) // GRAPH_WINDOW) for r in rows if r.get("generation")}
+        for repo_id, window in windows:
+            self._load_window(repo_id, window)
+        # The rows asked for go in last so a small cache cannot evict them before they are read
+        for r in rows:
+            self._nodes.set(r["commit_id"], r)
+
+    def _load_window(self, repo_id: int, window: int) -> None:
+        rows = self.commit.list_graph_range(repo_id, window * GRAPH_WINDOW + 1, (window + 1) * GRAPH_WINDOW)
+        for r in rows:
+            self._nodes.set(r["commit_id"], r)
+
+    def _missing(self, commit_ids: List[int]) -> List[int]:
+        return [i for i in commit_ids if not self._nodes.get(i)[0]]
+
+    def _prefetch(self, commit_ids: List[int]) -> None:
+        missing = self._missing(commit_ids)
+        if missing:
+            self._load(missing)
+
+    # ---------------- Queries ----------------
+    def is_ancestor(self, ancestor_id: int, commit_id: int) -> bool:
+        """True if ancestor_id is commit_id itself or reachable from it through parent links."""
+        if ancestor_id == commit_id:
+            return True
+        floor = self.generation(ancestor_id)
+        if not floor or floor >= self.generation(commit_id):
+            return False
+        seen = {commit_id}
+        stack = [commit_id]
+        while stack:
+            current = stack.pop()
+            parents = self.parents(current)
+            self._prefetch(parents)
+            for p in parents:
+                if p == ancestor_id:
+                    return True
+                # Commits at or below the ancestor's generation cannot lead to it
+                if p not in seen and self.generation(p) > floor:
+                    seen.add(p)
+                    stack.append(p)
+        return False
+
+    def merge_bases(self, left_id: int, right_id: int) -> List[int]:
+        """Best common ancestors of two commits (none is an ancestor of another), highest generation first."""
+        return self._paint(left_id, right_id)[0]
+
+    def merge_base(self, left_id: int, right_id: int) -> Optional[int]:
+        """The best common ancestor of two commits, or None if their histories are unrelated."""
+        bases = self.merge_bases(left_id, right_id)
+        return bases[0] if bases else None
+
+    def divergence(self, left_id: int, right_id: int) -> Dict:
+        """
+        How two commits relate: `ahead` counts commits reachable only from left, `behind` those
+        reachable only from right, and `merge_base` is their best common ancestor.
+        """
+        bases, ahead, behind = self._paint(left_id, right_id)
+        return {"ahead": ahead, "behind": behind, "merge_base": bases[0] if bases else None}
+
+    def _paint(self, left_id: int, right_id: int) -> Tuple[List[int], int, int]:
+        """
+        Walk both histories together in decreasing generation, painting each commit with the
+        side(s) it is reachable from. Every child has a higher generation than its parents, so
+        a commit's paint is final when it is popped. Commits reachable from both sides are merge
+        base candidates; their ancestors are marked stale, and the walk ends once only stale
+        commits are queued.
+        """
+        flags: Dict[int, int] = {}
+        heap: List[Tuple[int, int]] = []
+        active = 0  # queued commits that are not stale
+
+        def push(commit_id: int, flag: int) -> None:
+            nonlocal active
+            old = flags.get(commit_id)
+            if old is None:
+                flags[commit_id] = flag
+                heapq.heappush(heap, (-self.generation(commit_id), -commit_id))
+                active += 0 if flag & _STALE else 1
+                return
+            new = old | flag
+            if new != old:
+                flags[commit_id] = new
+                if not old & _STALE and new & _STALE:
+                    active -= 1
+
+        self._prefetch([left_id, right_id])
+        push(left_id, _LEFT)
+        push(right_id, _RIGHT)
+        bases: List[int] = []
+        ahead = behind = 0
+        while heap and active:
+            _, neg_id = heapq.heappop(heap)
+            commit_id = -neg_id
+            flag = flags[commit_id]
+            if not flag & _STALE:
+                active -= 1
+                if flag & _BOTH == _BOTH:
+                    bases.append(commit_id)
+                    flag |= _STALE
+                elif flag & _LEFT:
+                    ahead += 1
+                else:
+                    behind += 1
+            parents = self.parents(commit_id)
+            self._prefetch(parents)
+            for p in parents:
+                push(p, flag)
+        return bases, ahead, behind
@@ -0,0 +1,454 @@
+"""
+Offline write journal: working-file writes recorded locally, synced in the background.
+
+With journal_path set, File.create_file / update_file append an entry to an append-only JSONL
+file and return at once; files created this way get a temporary negative id. A worker thread
+coalesces pending entries (last write wins per file, field by field) and flushes them with
+batched inserts and upserts, retrying with exponential backoff while the storage is
+unreachable. File reads overlay pending entries, so a process sees its own writes before they
+are synced. Entries survive restarts until acknowledged, and whatever is pending when the
+process exits is synced on the way out. Commits are not journaled: every write that builds on
+the stored files (commits, merges, rollbacks) settles the journal first.
+
+One process at a time owns a journal file: it holds an exclusive lock on `<journal_path>.lock`
+for as long as it runs. Other processes configured with the same path (say the CLI while the
+Streamlit app is up) write straight to the storage instead.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import atexit
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from config import JOURNAL_PATH, JOURNAL_SYNC_INTERVAL, JOURNAL_MAX_BACKOFF
+from dao.blob_dao import content_hash, content_size
+
+WRITE_OPS = ("create_file", "update_file")
+
+class JournalError(Exception):
+    pass
+
+class JournalLockedError(JournalError):
+    """Another process owns the journal file."""
+
+def _lock(path: str):
+    """Open path and take an exclusive, non-blocking lock on it; raises JournalLockedError if it is held."""
+    fh = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        fh.close()
+        raise JournalLockedError(f"Journal {path} is in use by another process")
+    return fh
+
+def coalesce(entries: List[Dict], ids: Dict[int, int]) -> Dict[int, Dict]:
+    """
+    Fold entries into one pending change per file (keyed by server id, or temporary id while
+    the file is only created locally). Later filename and content values replace earlier ones;
+    updates to a file created in the journal fold into its creation. Each change keeps the seqs
+    of the entries it covers.
+    """
+    files: Dict[int, Dict] = {}
+    for e in entries:
+        if e["op"] == "create_file":
+            files[-e["seq"]] = {"create": True, "repo_id": e["repo_id"], "filename": e["filename"],
+                                "content": e["content"], "seqs": [e["seq"]]}
+        else:
+            key = ids.get(e["file_id"], e["file_id"])
+            f = files.setdefault(key, {"create": False, "filename": None, "content": None, "seqs": []})
+            if e.get("filename") is not None:
+                f["filename"] = e["filename"]
+            if e.get("content") is not None:
+                f["content"] = e["content"]
+            f["seqs"].append(e["seq"])
+    return files
+
+class Journal:
+    """
+    One journal file and its sync worker. Entries are appended (and fsynced) under a lock;
+    each flush phase (new files, then file updates) is acknowledged with a `synced` line
+    naming the entries it covered and the ids the storage assigned, so a retry after a
+    failure never repeats a phase that already succeeded. The insert phase first writes a
+    `flushing` line: after a crash between the insert and its acknowledgement, the files it
+    names are matched against the storage on replay (by repo, name and content) instead of
+    being inserted twice. Updates are full-row upserts and safe to repeat.
+    """
+    def __init__(self, path: str, sync_interval: float = JOURNAL_SYNC_INTERVAL,
+                 max_backoff: float = JOURNAL_MAX_BACKOFF):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.max_backoff = max_backoff
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._seq = 0
+        self._ids: Dict[int, int] = {}
+        self._in_flight: set = set()
+        self._view: Optional[Dict[int, Dict]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_sync: Optional[float] = None
+        self._uncertain: Set[int] = set()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        # Taken before replaying, so two processes never replay (and sync) the same entries
+        self._lock_fh = _lock(f"{path}.lock")
+        self._load()
+        self._fh = open(path, "a", encoding="utf-8")
+        if self._fh.tell() and not self._ends_with_newline():
+            # Terminate a torn line so the next entry starts on a line of its own
+            self._fh.write("\n")
+            self._fh.flush()
+
+    # ---------------- Recording ----------------
+    def create_file(self, repo_id: int, filename: str, content: str) -> Dict:
+        content = content or ""
+        e = self._append({"op": "create_file", "repo_id": repo_id, "filename": filename, "content": content})
+        return {"file_id": -e["seq"], "repo_id": repo_id, "filename": filename, "content": content,
+                "content_hash": content_hash(content), "size": content_size(content), "pending": True}
+
+    def update_file(self, file_id: int, filename: Optional[str] = None, content: Optional[str] = None) -> Dict:
+        """Record an update; the returned row holds the pending fields (the whole row for files created locally)."""
+        # Synced temporary ids are stored resolved: the mapping does not outlive compaction
+        file_id = self.resolve(file_id)
+        self._append({"op": "update_file", "file_id": file_id, "filename": filename, "content": content})
+        row = self.get_file(file_id)
+        if row:
+            return row
+        row = {"file_id": file_id, "pending": True}
+        if filename is not None:
+            row["filename"] = filename
+        if content is not None:
+            row.update({"content": content, "content_hash": content_hash(content), "size": content_size(content)})
+        return row
+
+    def _append(self, entry: Dict) -> Dict:
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, **entry}
+            self._write_line(entry)
+            self._pending.append(entry)
+            self._view = None
+        self.start()
+        self._wake.set()
+        return entry
+
+    def _write_line(self, line: Dict) -> None:
+        """Append one line to the journal file; callers hold _lock so lines never interleave."""
+        self._fh.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def _load(self) -> None:
+        """Replay the journal file: entries not acknowledged by a `synced` line are pending."""
+        entries: Dict[int, Dict] = {}
+        flushing: Set[int] = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append; the write was never acknowledged
+                        continue
+                    if e.get("op") == "synced":
+                        for seq in e["seqs"]:
+                            entries.pop(seq, None)
+                        self._ids.update({int(k): v for k, v in e.get("ids", {}).items()})
+                    elif e.get("op") == "flushing":
+                        flushing.update(e["seqs"])
+                    elif e.get("op") in WRITE_OPS:
+                        entries[e["seq"]] = e
+                    self._seq = max(self._seq, e.get("seq") or 0)
+        except FileNotFoundError:
+            return
+        self._pending = [entries[s] for s in sorted(entries)]
+        # Inserted, maybe, by a process that died before acknowledging them
+        self._uncertain = flushing & set(entries)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) == b"\n"
+
+    # ---------------- Pending state ----------------
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def resolve(self, file_id: int) -> int:
+        """The storage id of a temporary id once its file has been synced (other ids unchanged)."""
+        return self._ids.get(file_id, file_id)
+
+    def _files(self) -> Dict[int, Dict]:
+        with self._lock:
+            if self._view is None:
+                files = coalesce(self._pending, self._ids)
+                for f in files.values():
+                    f["in_flight"] = bool(self._in_flight.intersection(f["seqs"]))
+                    if f["content"] is not None:
+                        f["content_hash"], f["size"] = content_hash(f["content"]), content_size(f["content"])
+                self._view = files
+            return self._view
+
+    @staticmethod
+    def _fields(f: Dict, meta_only: bool) -> Dict:
+        out: Dict = {}
+        if f["filename"] is not None:
+            out["filename"] = f["filename"]
+        if f["content"] is not None:
+            out.update({"content_hash": f["content_hash"], "size": f["size"]})
+            if not meta_only:
+                out["content"] = f["content"]
+        return out
+
+    def get_file(self, file_id: int, meta_only: bool = False) -> Optional[Dict]:
+        """The row of a file created in the journal (None for files that exist in the storage)."""
+        f = self._files().get(self.resolve(file_id))
+        if not f or not f["create"]:
+            return None
+        return {"file_id": self.resolve(file_id), "repo_id": f["repo_id"], **self._fields(f, meta_only), "pending": True}
+
+    def pending_content(self, file_id: int) -> Optional[str]:
+        """Content written to a file in the journal and not yet synced, if any."""
+        f = self._files().get(self.resolve(file_id))
+        return f["content"] if f else None
+
+    def overlay_file(self, row: Optional[Dict], meta_only: bool = False) -> Optional[Dict]:
+        if row is None:
+            return None
+        f = self._files().get(row["file_id"])
+        if not f or f["create"]:
+            return row
+        return {**row, **self._fields(f, meta_only), "pending": True}
+
+    def overlay_files(self, rows: List[Dict], repo_id: Optional[int] = None, meta_only: bool = False,
+                      creates: bool = True) -> List[Dict]:
+        """
+        Storage rows with pending updates applied, plus (with creates) the files created in
+        the journal, within repo_id if given. A creation being flushed can already be in the
+        storage rows, so it is left out when a row with its repo and filename is there.
+        """
+        files = self._files()
+        if not files:
+            return rows
+        out = [self.overlay_file(r, meta_only) for r in rows]
+        if creates:
+            present = {(r.get("repo_id"), r.get("filename")) for r in rows}
+            for key, f in files.items():
+                if not f["create"] or (repo_id is not None and f["repo_id"] != repo_id):
+                    continue
+                if f["in_flight"] and (f["repo_id"], f["filename"]) in present:
+                    continue
+                out.append(self.get_file(key, meta_only))
+        return out
+
+    def status(self) -> Dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_sync": self.last_sync,
+        }
+
+    # ---------------- Sync ----------------
+    def flush(self) -> int:
+        """Write the pending entries to the storage once; returns how many were synced."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                if not batch:
+                    return 0
+                self._in_flight = {e["seq"] for e in batch}
+                self._view = None
+            try:
+                files = coalesce(batch, self._ids)
+                self._flush_creates(files)
+                self._flush_updates(files)
+            finally:
+                with self._lock:
+                    self._in_flight = set()
+                    self._view = None
+            with self._lock:
+                if not self._pending:
+                    self._compact()
+                self.failures = 0
+                self.last_error = None
+                self.last_sync = time.time()
+            return len(batch)
+
+    def sync(self, retries: int = 3) -> None:
+        """Flush until nothing is pending, retrying with backoff; raises JournalError if the storage stays unreachable."""
+        attempt = 0
+        while self.has_pending():
+            try:
+                self.flush()
+            except Exception as e:
+                attempt += 1
+                self._failed(e)
+                if attempt > retries:
+                    raise JournalError(f"Journal {self.path} could not be synced: {e}")
+                time.sleep(self._backoff(attempt))
+
+    def _flush_creates(self, files: Dict[int, Dict]) -> None:
+        from dao.file_dao import File
+        creates = [(key, f) for key, f in files.items() if f["create"]]
+        if not creates:
+            return
+        dao = File(journaled=False)
+        ids: Dict[int, int] = {}
+        if self._uncertain:
+            # Files an interrupted flush may have inserted already: adopt matching rows
+            existing: Dict[Tuple, List[int]] = {}
+            for repo_id in {f["repo_id"] for _, f in creates if self._uncertain.intersection(f["seqs"])}:
+                for row in dao.list_file_meta(repo_id):
+                    existing.setdefault((repo_id, row["filename"], row.get("content_hash")), []).append(row["file_id"])
+            for key, f in creates:
+                match = existing.get((f["repo_id"], f["filename"], content_hash(f["content"])))
+                if self._uncertain.intersection(f["seqs"]) and match:
+                    ids[key] = match.pop(0)
+        todo = [(key, f) for key, f in creates if key not in ids]
+        if todo:
+            with self._lock:
+                self._write_line({"op": "flushing", "seqs": [s for _, f in todo for s in f["seqs"]]})
+            rows = [{"repo_id": f["repo_id"], "filename": f["filename"], **dao._content_fields(f["content"])} for _, f in todo]
+            created = dao.insert_files(rows)
+            if len(created) != len(rows):
+                raise JournalError("Failed to insert journaled files")
+            ids.update({key: row["file_id"] for (key, _), row in zip(todo, created)})
+        self._acknowledge([s for _, f in creates for s in f["seqs"]], ids)
+
+    def _flush_updates(self, files: Dict[int, Dict]) -> None:
+        """Upsert the updated files as whole rows: current storage rows with the pending fields applied."""
+        from dao.file_dao import File
+        updates = {key: f for key, f in files.items() if not f["create"]}
+        if not updates:
+            return
+        dao = File(journaled=False)
+        rows = []
+        for row in dao.get_files_by_ids(list(updates)):
+            f = updates[row["file_id"]]
+            merged = dict(row)
+            if f["filename"] is not None:
+                merged["filename"] = f["filename"]
+            if f["content"] is not None:
+                merged.update(dao._content_fields(f["content"]))
+            rows.append(merged)
+        # Files deleted in the storage meanwhile have no row left; their updates are dropped
+        if rows:
+            dao.upsert_files(rows)
+        self._acknowledge([s for f in updates.values() for s in f["seqs"]], {})
+
+    def _acknowledge(self, seqs: List[int], ids: Dict[int, int]) -> None:
+        with self._lock:
+            self._write_line({"op": "synced", "seqs": seqs, "ids": ids})
+            self._ids.update(ids)
+            done = set(seqs)
+            self._pending = [e for e in self._pending if e["seq"] not in done]
+            self._in_flight -= done
+            self._uncertain -= done
+            self._view = None
+
+    def _compact(self) -> None:
+        """Truncate a fully synced journal; id mappings stay in memory for callers holding temporary ids."""
+        self._fh.close()
+        self._fh = open(self.path, "w", encoding="utf-8")
+
+    def _failed(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter, capped at max_backoff seconds."""
+        return min(self.max_backoff, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    # ---------------- Worker ----------------
+    def start(self) -> None:
+        """Start the background sync worker (once)."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="compactvcs-journal", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker, make one last attempt to sync and release the file. Entries the
+        storage does not take now stay in the journal for the next process.
+        """
+        self.stop(timeout)
+        try:
+            self.sync(retries=1)
+        except JournalError:
+            pass
+        self._fh.close()
+        self._lock_fh.close()
+
+    def _run(self) -> None:
+        delay = self.sync_interval
+        while not self._stop.is_set():
+            # Woken by new entries, but still waits the interval so bursts of edits coalesce
+            self._wake.wait()
+            if self._stop.wait(delay):
+                return
+            self._wake.clear()
+            if not self.has_pending():
+                continue
+            try:
+                self.flush()
+                delay = self.sync_interval
+            except Exception as e:
+                self._failed(e)
+                delay = max(self.sync_interval, self._backoff(self.failures))
+                self._wake.set()
+
+_journals: Dict[str, Optional[Journal]] = {}
+_journals_lock = threading.Lock()
+
+def get_journal() -> Optional[Journal]:
+    """
+    The process-wide journal at journal_path; its worker starts with it and it is synced at
+    exit. None when journaling is off or another process owns the journal (writes then go
+    straight to the storage).
+    """
+    if not JOURNAL_PATH:
+        return None
+    with _journals_lock:
+        if JOURNAL_PATH not in _journals:
+            try:
+                journal = Journal(JOURNAL_PATH)
+            except JournalLockedError:
+                journal = None
+            _journals[JOURNAL_PATH] = journal
+            if journal is not None:
+                atexit.register(journal.close, 5.0)
+                if journal.has_pending():
+                    journal.start()
+                    journal._wake.set()
+        return _journals[JOURNAL_PATH]
+
+def resolve_id(file_id: int) -> int:
+    """A temporary id handed out by the journal as its storage id once synced (ids unchanged otherwise)."""
+    journal = get_journal()
+    return journal.resolve(file_id) if journal else file_id
@@ -0,0 +1,74 @@
+"""Line-wise three-way merge used when both branches changed the same file.
+
+Each side is diffed against the common base into hunks (a base line range and its
+replacement). Hunks from one side only are applied as-is; overlapping or touching hunks
+from both sides merge cleanly when they produce the same lines, otherwise they are
+reported as a conflict.
+"""
+from typing import List, Dict, Tuple
+from dao.diff import diff_opcodes
+
+def _hunks(base: List[str], other: List[str], side: str) -> List[Tuple[int, int, List[str], str]]:
+    return [
+        (i1, i2, other[j1:j2], side)
+        for tag, i1, i2, j1, j2 in diff_opcodes(base, other)
+        if tag != "equal"
+    ]
+
+def _apply(base: List[str], start: int, end: int, hunks: List[Tuple]) -> List[str]:
+    """Lines of base[start:end] with the given (non-overlapping, sorted) hunks applied."""
+    out: List[str] = []
+    pos = start
+    for i1, i2, lines, _ in hunks:
+        out.extend(base[pos:i1])
+        out.extend(lines)
+        pos = i2
+    out.extend(base[pos:end])
+    return out
+
+def merge_text(base: str, ours: str, theirs: str) -> Tuple[str, List[Dict]]:
+    """
+    Merge two descendants of `base`. Returns the merged text and a list of conflicts, each
+    {"base_start", "base_end", "base", "ours", "theirs"} (0-based base line range and the
+    competing texts). Conflicting regions keep our lines in the merged text.
+    """
+    a = base.splitlines(keepends=True)
+    o = ours.splitlines(keepends=True)
+    t = theirs.splitlines(keepends=True)
+    hunks = sorted(_hunks(a, o, "ours") + _hunks(a, t, "theirs"), key=lambda h: (h[0], h[1]))
+
+    merged: List[str] = []
+    conflicts: List[Dict] = []
+    pos = 0
+    i = 0
+    while i < len(hunks):
+        start, end = hunks[i][0], hunks[i][1]
+        group = [hunks[i]]
+        i += 1
+        # Hunks that overlap or touch the current region are resolved together
+        while i < len(hunks) and hunks[i][0] <= end:
+            end = max(end, hunks[i][1])
+            group.append(hunks[i])
+            i += 1
+        merged.extend(a[pos:start])
+        pos = end
+        ours_part = [h for h in group if h[3] == "ours"]
+        theirs_part = [h for h in group if h[3] == "theirs"]
+        ours_lines = _apply(a, start, end, ours_part)
+        if not theirs_part:
+            merged.extend(ours_lines)
+            continue
+        theirs_lines = _apply(a, start, end, theirs_part)
+        if not ours_part or ours_lines == theirs_lines:
+            merged.extend(theirs_lines)
+            continue
+        conflicts.append({
+            "base_start": start,
+            "base_end": end,
+            "base": "".join(a[start:end]),
+            "ours": "".join(ours_lines),
+            "theirs": "".join(theirs_lines),
+        })
+        merged.extend(ours_lines)
+    merged.extend(a[pos:])
+    return "".join(merged), conflicts
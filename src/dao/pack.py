@@ -0,0 +1,202 @@
+"""Single-file pack format for exporting a repository.
+
+Layout (all integers big-endian):
+
+    MAGIC
+    objects   each body zlib-compressed on its own, back to back
+    meta      zlib-compressed JSON (repository rows: files, commits, versions, branches)
+    index     one INDEX_ENTRY per object, sorted by hash: sha256, offset, stored length, size
+    refs      one REF_ENTRY per (commit, file), sorted: commit id, file id, sha256
+    trailer   meta offset, meta length, index offset, object count, refs offset, ref count, MAGIC
+
+Objects are addressed by the same sha256 as the blob store. The reader memory-maps the pack
+and binary-searches the index in place, so reading one object decompresses only that object.
+The refs map each commit to its tree (file id TREE_REF; NO_TREE for commits without one, whose
+versions are listed by file id instead), so a file version is found without reading the meta.
+Packs of the first format (MAGIC_V1: no refs, shorter trailer) are still read.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+MAGIC = b"CVSPACK2"
+MAGIC_V1 = b"CVSPACK1"
+INDEX_ENTRY = struct.Struct(">32sQII")
+REF_ENTRY = struct.Struct(">QQ32s")
+TRAILER = struct.Struct(">QQQQQQ8s")
+TRAILER_V1 = struct.Struct(">QQQQ8s")
+# File id of a commit's tree ref (real file ids start at 1), and the hash of "no tree"
+TREE_REF = 0
+NO_TREE = "00" * 32
+
+class PackFormatError(Exception):
+    pass
+
+class PackWriter:
+    """
+    Streams objects into a new pack. The file is written under a temporary name and moved
+    into place by close(), so an interrupted export never leaves a truncated pack behind.
+    """
+    def __init__(self, path: str, level: int = 6):
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._fh = open(self._tmp, "wb")
+        self._fh.write(MAGIC)
+        self._level = level
+        self._index: Dict[bytes, tuple] = {}
+        self._refs: List[bytes] = []
+        self._meta: Optional[bytes] = None
+
+    def __contains__(self, blob_hash: str) -> bool:
+        return bytes.fromhex(blob_hash) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, blob_hash: str, content: str) -> None:
+        key = bytes.fromhex(blob_hash)
+        if key in self._index:
+            return
+        raw = content.encode("utf-8")
+        data = zlib.compress(raw, self._level)
+        self._index[key] = (self._fh.tell(), len(data), len(raw))
+        self._fh.write(data)
+
+    def add_ref(self, commit_id: int, file_id: int, blob_hash: str) -> None:
+        """Record the object a commit's file (or, with TREE_REF, its tree) resolves to."""
+        self._refs.append(REF_ENTRY.pack(commit_id, file_id, bytes.fromhex(blob_hash)))
+
+    def set_meta(self, meta: Dict[str, Any]) -> None:
+        self._meta = zlib.compress(json.dumps(meta, separators=(",", ":")).encode("utf-8"), self._level)
+
+    def close(self) -> int:
+        """Write meta, index and trailer and publish the pack; returns its size in bytes."""
+        meta_offset = self._fh.tell()
+        self._fh.write(self._meta or zlib.compress(b"{}"))
+        index_offset = self._fh.tell()
+        for key in sorted(self._index):
+            self._fh.write(INDEX_ENTRY.pack(key, *self._index[key]))
+        refs_offset = self._fh.tell()
+        # Big-endian packing makes byte order the (commit id, file id) order
+        self._fh.write(b"".join(sorted(self._refs)))
+        self._fh.write(TRAILER.pack(meta_offset, index_offset - meta_offset, index_offset, len(self._index),
+                                    refs_offset, len(self._refs), MAGIC))
+        size = self._fh.tell()
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+        return size
+
+    def abort(self) -> None:
+        self._fh.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self) -> "PackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class PackReader:
+    """Random access to a pack through a read-only memory map."""
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fh.close()
+            raise PackFormatError(f"{path} is not a pack (empty file)")
+        head = self._map[:len(MAGIC)]
+        trailer = TRAILER if head == MAGIC else TRAILER_V1
+        if head not in (MAGIC, MAGIC_V1) or len(self._map) < len(MAGIC) + trailer.size:
+            self.close()
+            raise PackFormatError(f"{path} is not a pack")
+        end = len(self._map) - trailer.size
+        if head == MAGIC:
+            (self._meta_offset, self._meta_length, self._index_offset, self.count,
+             self._refs_offset, self.ref_count, magic) = TRAILER.unpack_from(self._map, end)
+        else:
+            self._meta_offset, self._meta_length, self._index_offset, self.count, magic = TRAILER_V1.unpack_from(self._map, end)
+            self._refs_offset, self.ref_count = end, 0
+        self.has_refs = head == MAGIC
+        if (magic != head or self._index_offset + self.count * INDEX_ENTRY.size != self._refs_offset
+                or self._refs_offset + self.ref_count * REF_ENTRY.size != end):
+            self.close()
+            raise PackFormatError(f"{path} is truncated or corrupt")
+        self._meta: Optional[Dict[str, Any]] = None
+
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            data = self._map[self._meta_offset:self._meta_offset + self._meta_length]
+            self._meta = json.loads(zlib.decompress(data))
+        return self._meta
+
+    def _entry(self, i: int) -> tuple:
+        return INDEX_ENTRY.unpack_from(self._map, self._index_offset + i * INDEX_ENTRY.size)
+
+    def _find(self, blob_hash: str) -> Optional[tuple]:
+        key = bytes.fromhex(blob_hash)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            if entry[0] < key:
+                lo = mid + 1
+            elif entry[0] > key:
+                hi = mid
+            else:
+                return entry
+        return None
+
+    def __contains__(self, blob_hash: str) -> bool:
+        return self._find(blob_hash) is not None
+
+    def ref(self, commit_id: int, file_id: int) -> Optional[str]:
+        """The hash a (commit, file) ref points to (see add_ref), or None if there is none."""
+        key = REF_ENTRY.pack(commit_id, file_id, b"")[:16]
+        lo, hi = 0, self.ref_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self._refs_offset + mid * REF_ENTRY.size
+            found = self._map[offset:offset + 16]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return self._map[offset + 16:offset + REF_ENTRY.size].hex()
+        return None
+
+    def get(self, blob_hash: str) -> Optional[str]:
+        """Decompress a single object, or None if the pack does not hold it."""
+        entry = self._find(blob_hash)
+        if entry is None:
+            return None
+        _, offset, length, size = entry
+        raw = zlib.decompress(self._map[offset:offset + length])
+        if len(raw) != size:
+            raise PackFormatError(f"object {blob_hash} is corrupt")
+        return raw.decode("utf-8")
+
+    def hashes(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self._entry(i)[0].hex()
+
+    def close(self) -> None:
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._fh.close()
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -1,37 +1,52 @@
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
 from typing import Optional, List, Dict
-from config import get_supabase
-from supabase import Client # pyright: ignore[reportMissingImports] 
+from config import get_backend
+from backends import StorageBackend
+from dao.cache import cached, invalidate
 
 class Repo:
     def __init__(self):
-        self._sb : Client = get_supabase()
+        self._sb : StorageBackend = get_backend()
     
     def create_repo(self,name:str)-> Optional[Dict]:
         payload={"name":name}
-        self._sb.table("repository").insert(payload).execute()
-        resp=self._sb.table("repository").select("*").execute()
+        resp=self._sb.table("repository").insert(payload).execute()
+        invalidate("repos")
         return resp.data[0] if resp.data else None
     
+    @cached("repo", tags=lambda repo_id: ["repos"])
     def get_repo_by_id(self,repo_id:int)-> Optional[Dict]:
         resp=self._sb.table("repository").select("*").eq("repo_id",repo_id).execute()
         return resp.data[0] if resp.data else None
     
+    @cached("repo", tags=lambda name: ["repos"])
     def get_repo_by_name(self,name:str)->Optional[Dict]:
         resp=self._sb.table("repository").select("*").eq("name",name).execute()
         return resp.data or []
     
+    @cached("repo", tags=lambda: ["repos"])
     def list_repos(self)-> Optional[Dict]:
         resp=self._sb.table("repository").select("*").order("repo_id",desc=True)
         q=resp.execute()
         return q.data or []
     
+    @cached("repo", tags=lambda limit=100, after_repo_id=None: ["repos"])
+    def list_repos_page(self,limit:int=100,after_repo_id:Optional[int]=None)->List[Dict]:
+        """One page of repos, newest first; pass the last repo_id seen as after_repo_id for the next page."""
+        q=self._sb.table("repository").select("*")
+        if after_repo_id is not None:
+            q=q.lt("repo_id",after_repo_id)
+        resp=q.order("repo_id",desc=True).limit(limit).execute()
+        return resp.data or []
+    
     def delete_repo(self,repo_id:int) -> bool:
         resp=self._sb.table("repository").delete().eq("repo_id",repo_id).execute()
+        invalidate("repos")
         return bool(resp.data)
     
     def update_repo(self,repo_id:int,new_name:str)->Optional[Dict]:
         resp=self._sb.table("repository").update({"name":new_name}).eq("repo_id",repo_id).execute()
+        invalidate("repos")
         return resp.data
     
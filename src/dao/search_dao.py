@@ -0,0 +1,101 @@
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+from typing import Dict, Iterable, List, Optional, Set
+from config import get_backend, SEARCH_INDEX_ENABLED, SEARCH_MAX_INDEXED_SIZE
+from backends import StorageBackend
+from dao.blob_dao import chunked
+
+# Index rows written per request
+TRIGRAM_BATCH = 5000
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct case-folded 3-character substrings of text."""
+    folded = (text or "").casefold()
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
+
+class SearchIndex:
+    """
+    Trigram index over the blobs committed to each repository. A blob containing a string
+    contains every trigram of it, so intersecting posting lists yields a small candidate set
+    that is then checked against the content. Blobs are immutable, so entries are only added.
+    """
+    def __init__(self):
+        self._sb : StorageBackend = get_backend()
+
+    def missing_docs(self, repo_id: int, hashes: Iterable[str]) -> Set[str]:
+        """The subset of blob hashes not yet indexed for repo_id."""
+        wanted = {h for h in hashes if h}
+        for chunk in chunked(list(wanted)):
+            resp = self._sb.table("search_doc").select("blob_hash").eq("repo_id", repo_id).in_("blob_hash", chunk).execute()
+            wanted -= {r["blob_hash"] for r in (resp.data or [])}
+        return wanted
+
+    def index_blobs(self, repo_id: int, contents: Dict[str, Optional[str]]) -> int:
+        """
+        Add blobs (hash -> content) to the repo's index; already indexed hashes are skipped (the
+        registering upsert ignores duplicates and returns only new docs, so no lookup is needed).
+        Docs are registered unindexed, their trigrams written, and only then marked indexed:
+        an unindexed doc is always a search candidate, so an interrupted write never hides a
+        match. Content None or longer than search_max_indexed_size stays unindexed and is
+        scanned instead. Returns the number of blobs added.
+        """
+        if not SEARCH_INDEX_ENABLED or not contents:
+            return 0
+        docs: List[Dict] = []
+        for chunk in chunked(sorted(h for h in contents if h), TRIGRAM_BATCH):
+            resp = self._sb.table("search_doc").upsert(
+                [{"repo_id": repo_id, "blob_hash": h, "indexed": False} for h in chunk],
+                on_conflict="repo_id,blob_hash", ignore_duplicates=True,
+            ).execute()
+            docs.extend(resp.data or [])
+        indexed: List[Dict] = []
+        postings: List[Dict] = []
+        for doc in docs:
+            content = contents[doc["blob_hash"]]
+            if not self._indexable(content):
+                continue
+            postings.extend({"repo_id": repo_id, "trigram": t, "doc_id": doc["doc_id"]} for t in trigrams(content))
+            indexed.append({**doc, "indexed": True})
+            if len(postings) >= TRIGRAM_BATCH:
+                self._write_postings(postings)
+                postings = []
+        self._write_postings(postings)
+        for chunk in chunked(indexed, TRIGRAM_BATCH):
+            self._sb.table("search_doc").upsert(chunk, on_conflict="doc_id").execute()
+        return len(docs)
+
+    def commit_entries(self, contents: Dict[str, Optional[str]]) -> Optional[List[Dict]]:
+        """
+        Index entries for blobs (hash -> content) in the form create_commit_with_files takes
+        them ({blob_hash, trigrams}, trigrams None for blobs left unindexed), so a commit indexes
+        its new versions in its own round trip and transaction. None when indexing is off.
+        """
+        if not SEARCH_INDEX_ENABLED:
+            return None
+        return [
+            {"blob_hash": h, "trigrams": sorted(trigrams(c)) if self._indexable(c) else None}
+            for h, c in sorted(contents.items()) if h
+        ]
+
+    @staticmethod
+    def _indexable(content: Optional[str]) -> bool:
+        return content is not None and len(content) <= SEARCH_MAX_INDEXED_SIZE
+
+    def _write_postings(self, postings: List[Dict]) -> None:
+        for chunk in chunked(postings, TRIGRAM_BATCH):
+            self._sb.table("search_trigram").upsert(
+                chunk, on_conflict="repo_id,trigram,doc_id", ignore_duplicates=True
+            ).execute()
+
+    def delete_repo(self, repo_id: int) -> None:
+        """Drop a repository's whole index (postings first, then docs)."""
+        self._sb.table("search_trigram").delete().eq("repo_id", repo_id).execute()
+        self._sb.table("search_doc").delete().eq("repo_id", repo_id).execute()
+
+    def candidates(self, repo_id: int, grams: Iterable[str]) -> List[str]:
+        """
+        Blobs of repo_id that may contain a string with the given trigrams: those holding all
+        of them plus the unindexed ones (every blob when grams is empty). One round trip.
+        """
+        resp = self._sb.rpc("search_blobs", {"p_repo_id": repo_id, "p_trigrams": sorted(set(grams))}).execute()
+        return [r["blob_hash"] for r in (resp.data or [])]
@@ -0,0 +1,68 @@
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import json
+from typing import Optional, Dict
+from config import get_backend
+from backends import StorageBackend
+from dao.blob_dao import Blob
+
+def encode_tree(entries: Dict[int, Dict]) -> str:
+    """
+    Serialize a commit tree (file_id -> entry) as one JSON line per file, sorted by file_id,
+    so consecutive trees differ only in the lines of changed files and delta-compress well.
+    """
+    lines = []
+    for file_id in sorted(entries):
+        e = entries[file_id]
+        lines.append(json.dumps(
+            [file_id, e.get("version_number"), e.get("blob_hash"), e.get("size"), e.get("filename")],
+            separators=(",", ":"),
+        ) + "\n")
+    return "".join(lines)
+
+def decode_tree(text: str) -> Dict[int, Dict]:
+    entries: Dict[int, Dict] = {}
+    for line in (text or "").splitlines():
+        if not line:
+            continue
+        file_id, version_number, blob_hash, size, filename = json.loads(line)
+        entries[file_id] = {
+            "file_id": file_id,
+            "version_number": version_number,
+            "blob_hash": blob_hash,
+            "size": size,
+            "filename": filename,
+        }
+    return entries
+
+class Tree:
+    """Resolves a commit to its full file tree: every file present at that commit and its version."""
+    def __init__(self):
+        self._sb : StorageBackend = get_backend()
+        self.blob : Blob = Blob()
+
+    def get_tree(self, tree_hash: str) -> Dict[int, Dict]:
+        text = self.blob.get_blob(tree_hash)
+        if text is None:
+            return {}
+        return decode_tree(text)
+
+    def get_commit_tree(self, commit: Optional[Dict]) -> Dict[int, Dict]:
+        """
+        Tree of a commit row. Commits written before trees existed stored a full snapshot
+        in commitfile, so their tree is read back from those rows (filenames unknown).
+        """
+        if not commit:
+            return {}
+        if commit.get("tree_hash"):
+            return self.get_tree(commit["tree_hash"])
+        resp = (
+            self._sb.table("commitfile")
+            .select("file_id, version_number, blob_hash")
+            .eq("commit_id", commit["commit_id"])
+            .execute()
+        )
+        return {
+            r["file_id"]: {**r, "size": None, "filename": None}
+            for r in (resp.data or [])
+        }
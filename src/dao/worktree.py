@@ -0,0 +1,243 @@
+"""
+Local working directories: the on-disk checkout index and the file operations behind it.
+
+The index (`.compactvcs/index.json` inside the directory) records, for every checked-out path,
+the file id, the blob hash written there and the size and mtime the file had right after the
+write. A file whose stat still matches is taken to hold that blob without reading it.
+"""
+import codecs
+import fnmatch
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_DIR = ".compactvcs"
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 1
+READ_BLOCK = 1024 * 1024
+FILE_MODE = 0o644
+IGNORE_FILE = ".compactvcsignore"
+# Names never ingested at any depth: the checkout index and other VCS metadata
+ALWAYS_IGNORED = {INDEX_DIR, ".git"}
+# Below this many files hashing runs in-process; starting workers would cost more than it saves
+PARALLEL_SCAN_MIN = 64
+
+class WorktreeError(Exception):
+    pass
+
+def safe_path(filename: str) -> str:
+    """
+    A repository filename as a normalized relative path; names that are absolute, climb out
+    of the directory or point into the index directory are rejected.
+    """
+    path = os.path.normpath((filename or "").replace("\\", "/")).replace(os.sep, "/")
+    if (not filename or os.path.isabs(path) or path in (".", "..") or path.startswith("../")
+            or path.split("/", 1)[0] == INDEX_DIR):
+        raise WorktreeError(f"Invalid path for checkout: {filename!r}")
+    return path
+
+def file_hash(full_path: str) -> Optional[str]:
+    """sha256 of a file's bytes (the blob hash of its content), or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(full_path, "rb") as fh:
+            for block in iter(lambda: fh.read(READ_BLOCK), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def scan_file(full_path: str) -> Tuple[Optional[str], int]:
+    """
+    (blob hash, size in bytes) of a file read as UTF-8 text; the hash is None if the file is
+    not valid UTF-8 (binary) or unreadable. Module-level so process pools can run it.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    size = 0
+    try:
+        with open(full_path, "rb") as fh:
+            for block in iter(lambda: fh.read(READ_BLOCK), b""):
+                decoder.decode(block)
+                digest.update(block)
+                size += len(block)
+            decoder.decode(b"", final=True)
+    except (OSError, UnicodeDecodeError):
+        return None, size
+    return digest.hexdigest(), size
+
+def scan_files(full_paths: List[str], workers: int) -> List[Tuple[Optional[str], int]]:
+    """scan_file for many files, spread over a pool of worker processes."""
+    if workers <= 1 or len(full_paths) < PARALLEL_SCAN_MIN:
+        return [scan_file(p) for p in full_paths]
+    # Imported here: multiprocessing is slow to import and most callers never need it
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scan_file, full_paths, chunksize=max(1, len(full_paths) // (workers * 8))))
+
+class IgnoreRules:
+    """
+    Ignore patterns in the gitignore style: one glob per line, `#` comments, `!` to re-include,
+    a trailing `/` for directories only, and a leading or inner `/` to anchor the pattern at
+    the root (otherwise it matches a name at any depth). The last matching pattern wins.
+    """
+    def __init__(self, lines: Iterable[str] = ()):
+        self.rules: List[Tuple[str, bool, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            anchored = "/" in line
+            self.rules.append((line.lstrip("/"), negate, dir_only, anchored))
+
+    @classmethod
+    def load(cls, root: str, ignore_file: Optional[str] = IGNORE_FILE) -> "IgnoreRules":
+        """Rules from root/ignore_file; none if it is missing or ignore_file is None."""
+        if not ignore_file:
+            return cls()
+        try:
+            with open(os.path.join(root, ignore_file), "r", encoding="utf-8") as fh:
+                return cls(fh.readlines())
+        except FileNotFoundError:
+            return cls()
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether a root-relative path ("/"-separated) is ignored, itself or through a parent directory."""
+        parts = path.split("/")
+        for depth in range(1, len(parts) + 1):
+            if self.matches("/".join(parts[:depth]), is_dir or depth < len(parts)):
+                return True
+        return False
+
+    def matches(self, path: str, is_dir: bool = False) -> bool:
+        """Whether the path itself is ignored (its parent directories are not checked)."""
+        name = path.rsplit("/", 1)[-1]
+        if name in ALWAYS_IGNORED:
+            return True
+        result = False
+        for pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(path if anchored else name, pattern):
+                result = not negate
+        return result
+
+def walk_files(root: str, rules: IgnoreRules) -> Iterator[str]:
+    """Root-relative ("/"-separated) paths of the regular files under root that rules keep, sorted."""
+    root = os.path.abspath(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        prefix = "" if rel == "." else rel + "/"
+        # Ignored directories are pruned here, so entries only need checking themselves
+        dirnames[:] = sorted(d for d in dirnames if not rules.matches(prefix + d, is_dir=True))
+        for name in sorted(filenames):
+            path = prefix + name
+            if not rules.matches(path) and os.path.isfile(os.path.join(dirpath, name)):
+                yield path
+
+class WorktreeIndex:
+    """The checkout index of one directory: path -> {file_id, hash, size, mtime_ns}."""
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.repo_id: Optional[int] = None
+        self.commit_id: Optional[int] = None
+        self.entries: Dict[str, Dict] = {}
+        self._written_ns = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, INDEX_DIR, INDEX_FILE)
+
+    def load(self) -> "WorktreeIndex":
+        """Read the index; a missing or unreadable one leaves it empty (every path is then checked)."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+                written_ns = os.fstat(fh.fileno()).st_mtime_ns
+        except (OSError, ValueError):
+            return self
+        if data.get("format") == INDEX_FORMAT:
+            self.repo_id = data.get("repo_id")
+            self.commit_id = data.get("commit_id")
+            self.entries = data.get("entries") or {}
+            self._written_ns = written_ns
+        return self
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        data = {
+            "format": INDEX_FORMAT,
+            "repo_id": self.repo_id,
+            "commit_id": self.commit_id,
+            "entries": self.entries,
+        }
+        # dumps runs the C encoder; dump to a file would encode in Python
+        text = json.dumps(data, separators=(",", ":"))
+        _atomic_write(self.index_path, lambda fh: fh.write(text))
+
+    def full_path(self, path: str) -> str:
+        return os.path.join(self.root, *path.split("/"))
+
+    def is_clean(self, path: str) -> bool:
+        """
+        Whether path still holds the blob the index recorded for it. Matching size and mtime
+        are trusted, except for files not older than the index itself (an edit in the same
+        timestamp tick could keep both), which are hashed like any mismatching file.
+        """
+        entry = self.entries.get(path)
+        if not entry:
+            return False
+        try:
+            st = os.stat(self.full_path(path))
+        except FileNotFoundError:
+            return False
+        if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"] and st.st_mtime_ns < self._written_ns:
+            return True
+        return file_hash(self.full_path(path)) == entry["hash"]
+
+    def record(self, path: str, file_id: int, blob_hash: str) -> None:
+        st = os.stat(self.full_path(path))
+        self.entries[path] = {"file_id": file_id, "hash": blob_hash, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def write_file(full_path: str, pieces: Iterable[str]) -> None:
+    """Write text pieces (UTF-8, newlines untranslated) to full_path, replacing it atomically."""
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    def fill(fh):
+        for piece in pieces:
+            fh.write(piece)
+    _atomic_write(full_path, fill)
+
+def remove_file(root: str, full_path: str) -> None:
+    """Delete a file and any directories it leaves empty (up to, not including, root)."""
+    try:
+        os.remove(full_path)
+    except FileNotFoundError:
+        pass
+    parent = os.path.dirname(full_path)
+    while os.path.abspath(parent) != os.path.abspath(root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+def _atomic_write(full_path: str, fill) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            fill(fh)
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, full_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
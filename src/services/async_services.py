@@ -0,0 +1,116 @@
+"""Async facades over the DAOs and services for fanning out independent requests.
+
+Every call runs the existing synchronous code in a worker thread of a shared pool, so the
+storage backend stays pluggable (the shared Supabase client keeps a keep-alive pool sized by
+supabase_pool_size) and there is a single implementation of each operation. A semaphore
+bounds how many requests are in flight; independent calls awaited together with
+asyncio.gather overlap, so a page load costs about its slowest query instead of the sum.
+"""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, AsyncIterator
+from config import ASYNC_CONCURRENCY, DAO_CACHE_ENABLED
+from services.vcs_services import VCSService
+from services.history_services import HistoryService
+from services.branch_services import BranchService
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_CONCURRENCY, thread_name_prefix="compactvcs")
+# Semaphores bind to an event loop, so each loop (e.g. one asyncio.run per request) gets its own
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    return semaphore
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call in the worker pool, at most ASYNC_CONCURRENCY at a time."""
+    async with _limit():
+        return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+_DONE = object()
+
+class AsyncFacade:
+    """
+    Wraps a DAO or service: public methods become coroutines and `iter_*` generators
+    become async iterators that fetch each page in the worker pool.
+    """
+    def __init__(self, target: Any):
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        if name.startswith("iter_"):
+            return functools.partial(self._aiter, attr)
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await run(attr, *args, **kwargs)
+        return call
+
+    async def _aiter(self, fn: Callable, *args, **kwargs) -> AsyncIterator:
+        it = await run(fn, *args, **kwargs)
+        while True:
+            item = await run(next, it, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+def async_dao(dao: Any) -> AsyncFacade:
+    """Async variant of any DAO instance, e.g. async_dao(File())."""
+    return AsyncFacade(dao)
+
+class AsyncVCSService(AsyncFacade):
+    def __init__(self, service: Optional[VCSService] = None):
+        super().__init__(service or VCSService())
+
+    async def make_commit(self, repo_id: int, message: str, branch_id: Optional[int] = None) -> Dict:
+        """make_commit, with its independent reads (parent commit, file metadata) issued together."""
+        svc = self._target
+        if DAO_CACHE_ENABLED and branch_id is None:
+            # Warm the DAO cache concurrently; the commit itself then reads from memory
+            previous, _ = await asyncio.gather(
+                run(svc.commit.get_latest_commit, repo_id),
+                run(svc.file.list_file_meta, repo_id),
+            )
+            if previous:
+                await run(svc.tree.get_commit_tree, previous)
+        return await run(svc.make_commit, repo_id, message, branch_id)
+
+    async def rollback_commit(self, commit_id: int, dry_run: bool = False) -> Dict:
+        """rollback_commit, with the target tree and the working file metadata fetched together."""
+        svc = self._target
+        if DAO_CACHE_ENABLED:
+            commit = await run(svc.commit.get_commit_by_id, commit_id)
+            if commit:
+                await asyncio.gather(
+                    run(svc.tree.get_commit_tree, commit),
+                    run(svc.file.list_file_meta, commit["repo_id"]),
+                )
+        return await run(svc.rollback_commit, commit_id, dry_run)
+
+class AsyncHistoryService(AsyncFacade):
+    def __init__(self, service: Optional[HistoryService] = None):
+        super().__init__(service or HistoryService())
+
+class AsyncBranchService(AsyncFacade):
+    def __init__(self, service: Optional[BranchService] = None):
+        super().__init__(service or BranchService())
+
+async def load_repo_view(vcs: AsyncVCSService, history: AsyncHistoryService, branches: AsyncBranchService,
+                         repo_id: int, history_limit: int = 50) -> Dict:
+    """Everything the repository page shows below the sidebar, fetched concurrently."""
+    files, (commits, cursor), branch_list = await asyncio.gather(
+        vcs.list_files_in_repo(repo_id),
+        history.show_history_page(repo_id, history_limit),
+        branches.list_branches(repo_id),
+    )
+    return {"files": files, "commits": commits, "cursor": cursor, "branches": branch_list}
@@ -1,15 +1,41 @@
 """BranchService: handles branch creation, checkout, and merge."""
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
-from typing import Optional, List, Dict
-from dao.branch_dao import Branch
+import time
+from typing import Optional, List, Dict, Tuple
+from config import COMMIT_RETRIES
+from dao.branch_dao import Branch, StaleHeadError, retry_delay
+from dao.commit_dao import Commit
+from dao.commitFile_dao import CommitFile
+from dao.blob_dao import Blob, content_hash, content_size
+from dao.tree_dao import Tree, encode_tree
+from dao.graph_dao import CommitGraph
+from dao.search_dao import SearchIndex
+from dao.merge3 import merge_text
+from services.checkout_services import CheckoutService, CheckoutError
 
 class BranchError(Exception):
     pass
 
+class MergeConflictError(BranchError):
+    """
+    Both branches changed the same files incompatibly. `conflicts` lists one entry per file:
+    {file_id, filename, type ("content", "add/add", "modify/delete" or "rename/rename"), hunks}.
+    """
+    def __init__(self, message: str, conflicts: List[Dict]):
+        super().__init__(message)
+        self.conflicts = conflicts
+
 class BranchService:
     def __init__(self):
         self.branch: Branch = Branch()
+        self.commit: Commit = Commit()
+        self.commitfile: CommitFile = CommitFile()
+        self.blob: Blob = Blob()
+        self.tree: Tree = Tree()
+        self.graph: CommitGraph = CommitGraph()
+        self.search: SearchIndex = SearchIndex()
+        self.checkout: CheckoutService = CheckoutService()
     def add_branch(self, repo_id: int, name: str, head_commit_id: Optional[int] = None) -> Dict:
         """
         Create a new branch in a repository.
@@ -42,33 +68,241 @@ class BranchService:
             raise BranchError(f"Branch {branch_id} not found")
         return b
     
-    def checkout_branch(self, branch_id: int) -> Dict:
+    def checkout_branch(self, branch_id: int, directory: Optional[str] = None, force: bool = False) -> Dict:
         """
-        Checkout a branch: returns branch info and current head commit.
-        Actual file restoration should be handled by VCSService using head_commit_id.
+        Checkout a branch: returns branch info and current head commit. With a directory, the
+        head's files are also written there (see CheckoutService.checkout_commit) and the
+        result carries the checkout counts under "checkout".
         """
         branch = self.get_branch(branch_id)
         if not branch.get("head_commit_id"):
             raise BranchError(f"Branch {branch_id} has no commits yet")
-        return branch
+        if directory is None:
+            return branch
+        try:
+            result = self.checkout.checkout_commit(branch["head_commit_id"], directory, force)
+        except CheckoutError as e:
+            raise BranchError(str(e))
+        return {**branch, "checkout": result}
 
 
-    def merge_branches(self, source_branch_id: int, target_branch_id: int) -> Dict:
+    def compare_branches(self, branch_id: int, other_branch_id: int) -> Dict:
         """
-        Merge source branch into target branch.
-        This method just updates the head_commit_id of target branch to the latest commit of source.
-        Conflict resolution is not handled here.
+        How far two branches have diverged: commits only on branch_id (`ahead`), commits only
+        on other_branch_id (`behind`) and the merge base of their heads.
         """
+        branch = self.get_branch(branch_id)
+        other = self.get_branch(other_branch_id)
+        head, other_head = branch.get("head_commit_id"), other.get("head_commit_id")
+        if not head or not other_head:
+            raise BranchError("Both branches need commits to be compared")
+        return self.graph.divergence(head, other_head)
+
+    def merge_branches(self, source_branch_id: int, target_branch_id: int, message: Optional[str] = None) -> Dict:
+        """
+        Merge source branch into target branch and return the updated target branch; what the
+        merge did is under "merge" (status up_to_date, fast_forward or merge, the merge base and
+        the files taken from the source or merged line-wise).
+        If the target head is an ancestor of the source head the target is fast-forwarded; if the
+        source is already contained in the target nothing changes. Otherwise the heads are merged
+        three-way against their merge base into a merge commit on the target branch.
+        Raises MergeConflictError (with the structured conflicts) and writes nothing if both
+        branches changed the same lines differently.
+        The target head only moves if it is still the head the merge was planned against; if a
+        concurrent writer moved it, the merge is planned again on the new head and retried
+        (up to commit_retries times).
+        """
+        for attempt in range(1, COMMIT_RETRIES + 1):
+            try:
+                return self._merge_once(source_branch_id, target_branch_id, message)
+            except StaleHeadError:
+                if attempt == COMMIT_RETRIES:
+                    break
+                time.sleep(retry_delay(attempt))
+        raise BranchError(f"Branch {target_branch_id} kept moving: merge failed after {COMMIT_RETRIES} attempts")
+
+    def _merge_once(self, source_branch_id: int, target_branch_id: int, message: Optional[str]) -> Dict:
+        """One merge_branches attempt; raises StaleHeadError if the target head moved meanwhile."""
+        source_branch, target_branch = self._merge_pair(source_branch_id, target_branch_id)
+        source_head = source_branch["head_commit_id"]
+        target_head = target_branch.get("head_commit_id")
+        if target_head and self.graph.is_ancestor(source_head, target_head):
+            return {**target_branch, "merge": self._merge_result("up_to_date", source_head)}
+        if not target_head or self.graph.is_ancestor(target_head, source_head):
+            # Fast-forward target branch head commit
+            branch = self.branch.compare_and_set_head(target_branch_id, target_head, source_head)
+            return {**branch, "merge": self._merge_result("fast_forward", target_head)}
+
+        plan = self._plan_merge(source_head, target_head)
+        if plan["conflicts"]:
+            raise MergeConflictError(
+                f"Merging branch {source_branch_id} into {target_branch_id} conflicts in "
+                f"{len(plan['conflicts'])} file(s)",
+                plan["conflicts"],
+            )
+        message = message or f"Merge branch '{source_branch['name']}' into '{target_branch['name']}'"
+        commit = self._write_merge(target_branch, source_head, target_head, plan, message)
+        if not commit:
+            raise BranchError("Failed to create merge commit")
+        # The branch as this merge left it (a concurrent commit may already have moved it on)
+        result = self._merge_result("merge", plan["base"], plan["taken"], sorted(plan["contents"]))
+        return {**target_branch, "head_commit_id": commit["commit_id"], "merge": result}
+
+    @staticmethod
+    def _merge_result(status: str, base: Optional[int], taken: Optional[List] = None,
+                      merged: Optional[List] = None) -> Dict:
+        return {"status": status, "base": base, "taken": taken or [], "merged": merged or []}
+
+    def preview_merge(self, source_branch_id: int, target_branch_id: int) -> Dict:
+        """
+        What merge_branches would do, without writing: `status` (up_to_date, fast_forward or
+        merge), the merge base, files taken from the source, files merged line-wise and conflicts.
+        """
+        source_branch, target_branch = self._merge_pair(source_branch_id, target_branch_id)
+        source_head = source_branch["head_commit_id"]
+        target_head = target_branch.get("head_commit_id")
+        if target_head and self.graph.is_ancestor(source_head, target_head):
+            return {"status": "up_to_date", "base": source_head, "taken": [], "merged": [], "conflicts": []}
+        if not target_head or self.graph.is_ancestor(target_head, source_head):
+            return {"status": "fast_forward", "base": target_head, "taken": [], "merged": [], "conflicts": []}
+        plan = self._plan_merge(source_head, target_head)
+        return {
+            "status": "merge",
+            "base": plan["base"],
+            "taken": plan["taken"],
+            "merged": sorted(plan["contents"]),
+            "conflicts": plan["conflicts"],
+        }
+
+    def _merge_pair(self, source_branch_id: int, target_branch_id: int) -> Tuple[Dict, Dict]:
         source_branch = self.get_branch(source_branch_id)
         target_branch = self.get_branch(target_branch_id)
-
-        source_head = source_branch.get("head_commit_id")
-        if not source_head:
+        if source_branch["repo_id"] != target_branch["repo_id"]:
+            raise BranchError("Branches belong to different repositories")
+        if not source_branch.get("head_commit_id"):
             raise BranchError(f"Source branch {source_branch_id} has no commits to merge")
+        return source_branch, target_branch
 
-        # Update target branch head commit
-        updated_branch = self.branch.update_head_commit(target_branch_id, source_head)
-        if not updated_branch:
-            raise BranchError("Failed to merge branches")
-        
-        return updated_branch
+    def _plan_merge(self, source_head: int, target_head: int) -> Dict:
+        """
+        Three-way merge of the heads' trees against their merge base.
+        Files are compared by blob hash: a file changed on one side only is taken from that
+        side, and content is read only for files both sides changed differently.
+        """
+        base_id = self.graph.merge_base(target_head, source_head)
+        base = self.tree.get_commit_tree(self.commit.get_commit_by_id(base_id)) if base_id else {}
+        ours = self.tree.get_commit_tree(self.commit.get_commit_by_id(target_head))
+        theirs = self.tree.get_commit_tree(self.commit.get_commit_by_id(source_head))
+
+        tree: Dict[int, Dict] = {}
+        taken: List[int] = []
+        both: List[int] = []
+        names: Dict[int, Optional[str]] = {}
+        conflicts: List[Dict] = []
+        for file_id in sorted(set(base) | set(ours) | set(theirs)):
+            b, o, t = (side.get(file_id) for side in (base, ours, theirs))
+            bh, oh, th = (e["blob_hash"] if e else None for e in (b, o, t))
+            if o and t:
+                name, renames = self._merge_names(b, o, t)
+                if renames:
+                    conflicts.append({
+                        "file_id": file_id,
+                        "filename": name,
+                        "type": "rename/rename",
+                        "renamed_to": renames,
+                        "hunks": [],
+                    })
+                    continue
+            else:
+                name = (o or t or {}).get("filename")
+            if oh == th or th == bh:
+                if o:
+                    tree[file_id] = {**o, "filename": name}
+            elif oh == bh:
+                if t:
+                    tree[file_id] = {**t, "filename": name}
+                taken.append(file_id)
+            elif o is None or t is None:
+                kept = o or t
+                conflicts.append({
+                    "file_id": file_id,
+                    "filename": kept.get("filename"),
+                    "type": "modify/delete",
+                    "deleted_in": "target" if o is None else "source",
+                    "hunks": [],
+                })
+            else:
+                both.append(file_id)
+                names[file_id] = name
+
+        contents: Dict[int, str] = {}
+        if both:
+            blobs = self.blob.get_blobs(
+                h for i in both for h in (base.get(i, {}).get("blob_hash"), ours[i]["blob_hash"], theirs[i]["blob_hash"])
+            )
+            for file_id in both:
+                b = base.get(file_id)
+                merged, hunks = merge_text(
+                    blobs.get(b["blob_hash"], "") if b else "",
+                    blobs.get(ours[file_id]["blob_hash"], ""),
+                    blobs.get(theirs[file_id]["blob_hash"], ""),
+                )
+                if hunks:
+                    conflicts.append({
+                        "file_id": file_id,
+                        "filename": names[file_id],
+                        "type": "content" if b else "add/add",
+                        "hunks": hunks,
+                    })
+                else:
+                    contents[file_id] = merged
+        return {"base": base_id, "ours": ours, "tree": tree, "taken": taken, "contents": contents,
+                "names": names, "conflicts": conflicts}
+
+    @staticmethod
+    def _merge_names(base: Optional[Dict], ours: Dict, theirs: Dict) -> Tuple[Optional[str], List[str]]:
+        """
+        Three-way merge of a file's name, like its content: a rename on one side only wins.
+        Returns (name, []) or, if both sides renamed it differently, (our name, [ours, theirs]).
+        Trees of old commits lack names; a missing name never counts as a rename.
+        """
+        b = (base or {}).get("filename")
+        o, t = ours.get("filename"), theirs.get("filename")
+        if not o or not t or o == t or t == b:
+            return o or t, []
+        if o == b:
+            return t, []
+        return o, [o, t]
+
+    def _write_merge(self, target_branch: Dict, source_head: int, target_head: int, plan: Dict, message: str) -> Optional[Dict]:
+        """
+        Store merged blobs and the merged tree, then commit with both parents and advance the
+        target branch, provided its head is still target_head (StaleHeadError otherwise).
+        """
+        ours, tree, contents = plan["ours"], plan["tree"], plan["contents"]
+        merged_ids = sorted(contents)
+        latest = self.commitfile.get_latest_versions(merged_ids) if merged_ids else {}
+        for file_id in merged_ids:
+            tree[file_id] = {
+                "file_id": file_id,
+                "version_number": latest.get(file_id, 0) + 1,
+                "blob_hash": content_hash(contents[file_id]),
+                "size": content_size(contents[file_id]),
+                "filename": plan["names"][file_id],
+            }
+        target_commit = self.commit.get_commit_by_id(target_head)
+        hashes = self.blob.put_blobs(
+            [contents[i] for i in merged_ids] + [encode_tree(tree)],
+            [ours[i]["blob_hash"] for i in merged_ids] + [target_commit.get("tree_hash")],
+        )
+        # File rows record what the merge changed relative to the target (first parent)
+        rows = [
+            {"file_id": e["file_id"], "version_number": e["version_number"], "blob_hash": e["blob_hash"]}
+            for file_id, e in tree.items()
+            if ours.get(file_id, {}).get("blob_hash") != e["blob_hash"]
+        ]
+        return self.commit.create_commit_with_files(
+            target_branch["repo_id"], message, rows, tree_hash=hashes[-1],
+            parent_id=target_head, merge_parent_id=source_head, branch_id=target_branch["branch_id"],
+            search=self.search.commit_entries(dict(zip(hashes, (contents[i] for i in merged_ids)))),
+        )
@@ -0,0 +1,171 @@
+"""CheckoutService: materialize a commit or branch head into a local directory."""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from config import CHECKOUT_WORKERS
+from dao.branch_dao import Branch
+from dao.commit_dao import Commit
+from dao.file_dao import File
+from dao.blob_dao import Blob, is_chunked_size, chunked
+from dao.tree_dao import Tree
+from dao.worktree import WorktreeIndex, WorktreeError, safe_path, file_hash, write_file, remove_file
+
+class CheckoutError(Exception):
+    pass
+
+class CheckoutService:
+    """
+    A checkout compares the commit's tree with the directory's checkout index by blob hash,
+    so only paths whose blob differs are fetched, written (by a thread pool, each through a
+    temporary file) or deleted; the rest of the directory is not touched or even read.
+    """
+    def __init__(self, workers: int = CHECKOUT_WORKERS):
+        self.branch : Branch = Branch()
+        self.commit : Commit = Commit()
+        self.file : File = File()
+        self.blob : Blob = Blob()
+        self.tree : Tree = Tree()
+        self.workers = max(1, workers)
+
+    def checkout_branch(self, branch_id: int, directory: str, force: bool = False) -> Dict:
+        """Check out a branch's head commit into directory (see checkout_commit)."""
+        branch = self.branch.get_branch_by_id(branch_id)
+        if not branch:
+            raise CheckoutError(f"Branch {branch_id} not found")
+        if not branch.get("head_commit_id"):
+            raise CheckoutError(f"Branch {branch_id} has no commits yet")
+        return {**self.checkout_commit(branch["head_commit_id"], directory, force), "branch_id": branch_id}
+
+    def checkout_commit(self, commit_id: int, directory: str, force: bool = False) -> Dict:
+        """
+        Make directory hold exactly the files of commit_id. Files the previous checkout wrote
+        and that were changed locally since are never overwritten or deleted, nor are untracked
+        files in the way, unless force=True; force also compares every path's content with the
+        tree instead of trusting the index. Local changes to paths the checkout does not touch
+        are kept. Returns file, written, deleted and unchanged counts.
+        """
+        commit = self.commit.get_commit_by_id(commit_id)
+        if not commit:
+            raise CheckoutError(f"Commit {commit_id} not found")
+        target = self._target(commit)
+        index = WorktreeIndex(directory).load()
+
+        writes: List[str] = []
+        for path, entry in target.items():
+            known = index.entries.get(path)
+            if known and known["hash"] == entry["blob_hash"] and (
+                    not force or file_hash(index.full_path(path)) == entry["blob_hash"]):
+                known["file_id"] = entry["file_id"]
+                continue
+            writes.append(path)
+        deletes = [path for path in index.entries if path not in target]
+
+        # What each path holds now: the indexed blob if unchanged, else its hash (None if absent)
+        current: Dict[str, Optional[str]] = {}
+        conflicts: List[str] = []
+        for path in writes + deletes:
+            if path in index.entries and index.is_clean(path):
+                current[path] = index.entries[path]["hash"]
+                continue
+            current[path] = file_hash(index.full_path(path))
+            wanted = target[path]["blob_hash"] if path in target else None
+            if current[path] not in (None, wanted) and not force:
+                conflicts.append(path)
+        if conflicts:
+            shown = ", ".join(sorted(conflicts)[:5])
+            more = f" and {len(conflicts) - 5} more" if len(conflicts) > 5 else ""
+            raise CheckoutError(f"Local changes would be overwritten: {shown}{more} (use force to discard them)")
+
+        for path in deletes:
+            remove_file(index.root, index.full_path(path))
+            del index.entries[path]
+        # Paths that already hold the wanted blob are adopted instead of rewritten
+        pending: List[str] = []
+        for path in writes:
+            if current[path] == target[path]["blob_hash"]:
+                index.record(path, target[path]["file_id"], current[path])
+            else:
+                pending.append(path)
+        if not (writes or deletes or force) and (index.repo_id, index.commit_id) == (commit["repo_id"], commit_id):
+            return self._result(commit_id, index, target, [], [])
+        index.repo_id = commit["repo_id"]
+        try:
+            self._write(index, target, pending)
+        finally:
+            index.commit_id = commit_id if all(p in index.entries for p in target) else None
+            index.save()
+        return self._result(commit_id, index, target, pending, deletes)
+
+    def status(self, directory: str) -> Dict:
+        """The repo and commit directory was last checked out at and the tracked paths changed since."""
+        index = WorktreeIndex(directory).load()
+        return {
+            "repo_id": index.repo_id,
+            "commit_id": index.commit_id,
+            "modified": sorted(p for p in index.entries if not index.is_clean(p)),
+        }
+
+    @staticmethod
+    def _result(commit_id: int, index: WorktreeIndex, target: Dict, written: List[str], deleted: List[str]) -> Dict:
+        return {
+            "commit_id": commit_id,
+            "directory": index.root,
+            "files": len(target),
+            "written": len(written),
+            "deleted": len(deleted),
+            "unchanged": len(target) - len(written),
+        }
+
+    def _target(self, commit: Dict) -> Dict[str, Dict]:
+        """The commit's tree keyed by path. Trees of old commits lack filenames; the working file's name is used."""
+        tree = self.tree.get_commit_tree(commit)
+        names: Dict[int, str] = {}
+        if any(not e.get("filename") for e in tree.values()):
+            names = {f["file_id"]: f["filename"] for f in self.file.list_file_meta(commit["repo_id"])}
+        target: Dict[str, Dict] = {}
+        for file_id, entry in tree.items():
+            if not entry.get("blob_hash"):
+                continue
+            try:
+                path = safe_path(entry.get("filename") or names.get(file_id) or f"file-{file_id}")
+            except WorktreeError as e:
+                raise CheckoutError(str(e))
+            if path in target:
+                raise CheckoutError(f"Files {target[path]['file_id']} and {file_id} both check out to {path}")
+            target[path] = entry
+        return target
+
+    def _write(self, index: WorktreeIndex, target: Dict[str, Dict], paths: List[str]) -> None:
+        """
+        Fetch blobs in batches while the pool writes the previous ones. Large (chunked) blobs
+        are streamed by the writing thread itself instead of being fetched whole.
+        """
+        large = [p for p in paths if is_chunked_size(target[p].get("size"))]
+        small = [p for p in paths if not is_chunked_size(target[p].get("size"))]
+
+        def write(path: str, pieces) -> str:
+            write_file(index.full_path(path), pieces)
+            return path
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(write, p, self._stream(p, target[p]["blob_hash"])) for p in large]
+            for batch in chunked(small):
+                hashes = list(dict.fromkeys(target[p]["blob_hash"] for p in batch))
+                contents = self.blob.get_blobs(hashes)
+                for path in batch:
+                    content = contents.get(target[path]["blob_hash"])
+                    if content is None:
+                        raise CheckoutError(f"Blob {target[path]['blob_hash']} of {path} is missing")
+                    futures.append(pool.submit(write, path, (content,)))
+            for future in futures:
+                path = future.result()
+                index.record(path, target[path]["file_id"], target[path]["blob_hash"])
+
+    def _stream(self, path: str, blob_hash: str):
+        found = False
+        for piece in self.blob.iter_blob(blob_hash):
+            found = True
+            yield piece
+        if not found:
+            raise CheckoutError(f"Blob {blob_hash} of {path} is missing")
@@ -0,0 +1,113 @@
+"""DiffService: compare commits with each other or with the working files."""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+from typing import List, Dict, Optional, Callable
+from config import DIFF_CACHE_SIZE
+from dao.commit_dao import Commit
+from dao.file_dao import File
+from dao.blob_dao import Blob
+from dao.tree_dao import Tree
+from dao.cache import new_cache
+from dao.diff import unified_diff
+
+class DiffError(Exception):
+    pass
+
+# Commits never change, so a pair's diff is computed once per process
+_diff_cache = new_cache("diff", DIFF_CACHE_SIZE)
+
+class DiffService:
+    def __init__(self):
+        self.commit: Commit = Commit()
+        self.file: File = File()
+        self.blob: Blob = Blob()
+        self.tree: Tree = Tree()
+
+    def diff_commits(self, old_commit_id: int, new_commit_id: int, context: int = 3) -> Dict:
+        """
+        Files added, removed and modified from one commit to another, with unified line diffs.
+        Files with identical blob hashes are skipped without reading content. Results are
+        cached per commit pair and shared, so treat them as read-only.
+        """
+        key = (old_commit_id, new_commit_id, context)
+        found, result = _diff_cache.get(key, "diff")
+        if found:
+            return result
+        old = self.tree.get_commit_tree(self._get_commit(old_commit_id))
+        new = self.tree.get_commit_tree(self._get_commit(new_commit_id))
+        result = self._diff(old, new, self.blob.get_blobs, f"commit {old_commit_id}", f"commit {new_commit_id}", context)
+        result.update({"old": old_commit_id, "new": new_commit_id})
+        _diff_cache.set(key, result, namespace="diff")
+        return result
+
+    def diff_working(self, commit_id: int, context: int = 3) -> Dict:
+        """
+        Changes in the working files of the commit's repository since that commit.
+        Files are matched by content hash first; content is read only for changed files.
+        """
+        commit = self._get_commit(commit_id)
+        old = self.tree.get_commit_tree(commit)
+        working = {
+            f["file_id"]: {**f, "blob_hash": f.get("content_hash")}
+            for f in self.file.list_file_meta(commit["repo_id"])
+        }
+
+        def load(keys: List[str]) -> Dict[str, str]:
+            # Working entries are keyed by file_id (their hash may be missing on legacy rows)
+            wanted = [k for k in keys if k.startswith("file:")]
+            contents = self.blob.get_blobs(k for k in keys if not k.startswith("file:"))
+            working_contents = self.file.get_contents([int(k[5:]) for k in wanted]) if wanted else {}
+            contents.update((f"file:{file_id}", c or "") for file_id, c in working_contents.items())
+            return contents
+
+        result = self._diff(old, working, load, f"commit {commit_id}", "working", context, new_key=lambda e: f"file:{e['file_id']}")
+        result.update({"old": commit_id, "new": None})
+        return result
+
+    def _get_commit(self, commit_id: int) -> Dict:
+        commit = self.commit.get_commit_by_id(commit_id)
+        if not commit:
+            raise DiffError(f"Commit {commit_id} not found")
+        return commit
+
+    def _diff(self, old: Dict[int, Dict], new: Dict[int, Dict], load: Callable, old_label: str, new_label: str,
+              context: int, new_key: Optional[Callable[[Dict], str]] = None) -> Dict:
+        new_key = new_key or (lambda e: e["blob_hash"])
+        changed = []
+        for file_id in sorted(set(old) | set(new)):
+            o, n = old.get(file_id), new.get(file_id)
+            if o and n and o["blob_hash"] == n["blob_hash"] and (
+                not o.get("filename") or o["filename"] == n.get("filename")
+            ):
+                continue
+            changed.append((file_id, o, n))
+
+        wanted = [o["blob_hash"] for _, o, n in changed if o and (not n or o["blob_hash"] != n["blob_hash"])]
+        wanted += [new_key(n) for _, o, n in changed if n and (not o or o["blob_hash"] != n["blob_hash"])]
+        contents = load(wanted) if wanted else {}
+
+        files: List[Dict] = []
+        for file_id, o, n in changed:
+            old_name = (o or {}).get("filename") or f"file-{file_id}"
+            new_name = (n or {}).get("filename") or old_name
+            status = "added" if not o else "removed" if not n else "modified"
+            entry = {"file_id": file_id, "filename": new_name if n else old_name, "status": status,
+                     "diff": "", "added": 0, "removed": 0}
+            if o and n and o["blob_hash"] == n["blob_hash"]:
+                entry.update({"status": "renamed", "old_filename": old_name})
+            else:
+                entry["diff"], entry["added"], entry["removed"] = unified_diff(
+                    contents.get(o["blob_hash"], "") if o else "",
+                    contents.get(new_key(n), "") if n else "",
+                    f"{old_label}/{old_name}" if o else "/dev/null",
+                    f"{new_label}/{new_name}" if n else "/dev/null",
+                    context,
+                )
+                if o and n and old_name != new_name:
+                    entry["old_filename"] = old_name
+            files.append(entry)
+        return {
+            "files": files,
+            "added": sum(f["added"] for f in files),
+            "removed": sum(f["removed"] for f in files),
+        }
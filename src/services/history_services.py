@@ -1,9 +1,16 @@
 """HistoryService: View logs and manage commit metadata."""
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 from dao.commit_dao import Commit
 from dao.commitFile_dao import CommitFile
+from dao.blob_dao import Blob
+from dao.tree_dao import Tree
+from dao.file_dao import LazyFile
+from dao.graph_dao import CommitGraph
+from dao.blame_dao import BlameCache
+from dao.journal import resolve_id
+from dao.diff import diff_opcodes
 
 class HistoryError(Exception):
     pass
@@ -12,6 +19,10 @@ class HistoryService:
     def __init__(self):
         self.commit: Commit = Commit()
         self.commitfile: CommitFile = CommitFile()
+        self.blob: Blob = Blob()
+        self.tree: Tree = Tree()
+        self.graph: CommitGraph = CommitGraph()
+        self.blame_cache: BlameCache = BlameCache()
 
     # ---------------- Commit Logs ----------------
     def get_commit_by_id(self, commit_id: int) -> Dict:
@@ -28,20 +39,150 @@ class HistoryService:
             raise HistoryError(f"No commits found for repository {repo_id}")
         return commits
 
+    def iter_commits(self, repo_id: int, page_size: int = 100) -> Iterator[Dict]:
+        """Stream all commits of a repository, newest first, fetching one keyset page at a time."""
+        cursor = None
+        while True:
+            page = self.commit.list_commits_page(repo_id, page_size, cursor)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = self.commit.cursor_of(page[-1])
+
     # ---------------- Commit Files ----------------
-    def get_files_in_commit(self, commit_id: int) -> List[Dict]:
-        """Get all files associated with a specific commit."""
-        files = self.commitfile.get_files_by_commit(commit_id)
-        if not files:
+    def get_files_in_commit(self, commit_id: int) -> List[LazyFile]:
+        """
+        Get every file as it was at a specific commit (the commit's full tree).
+        Handles carry metadata; each file's content is read only when accessed.
+        """
+        tree = self.tree.get_commit_tree(self.get_commit_by_id(commit_id))
+        if not tree:
             raise HistoryError(f"No files found for commit {commit_id}")
-        return files
+        return [self.commitfile.lazy({**e, "commit_id": commit_id}) for e in tree.values()]
+
+    def get_changed_files(self, commit_id: int) -> List[LazyFile]:
+        """Get only the file versions written by a specific commit (content loaded on access)."""
+        return [self.commitfile.lazy(r) for r in self.commitfile.get_file_meta_by_commit(commit_id)]
 
     def get_file_version(self, commit_id: int, file_id: int) -> Dict:
-        """Get a specific file version in a commit."""
-        file_version = self.commitfile.get_file_version(commit_id, file_id)
-        if not file_version:
+        """Get a specific file version in a commit (unchanged files resolve through the tree)."""
+        file_id = resolve_id(file_id)
+        entry = self.tree.get_commit_tree(self.get_commit_by_id(commit_id)).get(file_id)
+        if not entry:
+            raise HistoryError(f"File {file_id} not found in commit {commit_id}")
+        return {**entry, "commit_id": commit_id, "content": self.blob.get_blob(entry["blob_hash"])}
+
+    def iter_file_version(self, commit_id: int, file_id: int) -> Iterator[str]:
+        """Stream a file version's content in pieces (large files chunk batch by chunk batch)."""
+        file_id = resolve_id(file_id)
+        entry = self.tree.get_commit_tree(self.get_commit_by_id(commit_id)).get(file_id)
+        if not entry:
+            raise HistoryError(f"File {file_id} not found in commit {commit_id}")
+        return self.blob.iter_blob(entry["blob_hash"])
+
+    # ---------------- Blame ----------------
+    def blame(self, commit_id: int, file_id: int) -> List[Dict]:
+        """
+        Every line of a file at a commit with the commit that last changed it:
+        {line_number, content, commit_id, version_number}.
+        A version's blame is derived from its parent versions' blame plus a diff: lines the
+        diff keeps inherit their origin, the rest originate in the commit that wrote the version
+        (merges inherit from both parents). Each computed blame is persisted, so only versions
+        never blamed before are computed, newest back to the first cached one.
+        """
+        file_id = resolve_id(file_id)
+        entry = self.tree.get_commit_tree(self.get_commit_by_id(commit_id)).get(file_id)
+        if not entry:
             raise HistoryError(f"File {file_id} not found in commit {commit_id}")
-        return file_version
+        rows = self.commitfile.list_by_files([file_id])
+        target = self._writer(rows, entry, commit_id)
+        runs = self._blame_runs(target, file_id, rows)
+        lines = (self.blob.get_blob(entry["blob_hash"]) or "").splitlines()
+        versions = {r["commit_id"]: r["version_number"] for r in rows}
+        origins = [origin for origin, count in runs for _ in range(count)]
+        return [
+            {"line_number": n, "content": line, "commit_id": origin, "version_number": versions.get(origin)}
+            for n, (line, origin) in enumerate(zip(lines, origins), start=1)
+        ]
+
+    def _blame_runs(self, target: int, file_id: int, rows: List[Dict]) -> List[List[int]]:
+        """Blame runs of the version written by target, computing uncached ancestors first (no recursion)."""
+        blames: Dict[int, List[List[int]]] = {}
+        parents: Dict[int, List[int]] = {}
+        stack = [target]
+        while stack:
+            writer = stack[-1]
+            if writer in blames:
+                stack.pop()
+                continue
+            cached = self.blame_cache.get(writer, file_id)
+            if cached is not None:
+                blames[writer] = cached
+                stack.pop()
+                continue
+            if writer not in parents:
+                parents[writer] = self._parent_writers(writer, file_id, rows)
+            pending = [p for p in parents[writer] if p not in blames]
+            if pending:
+                stack.extend(pending)
+                continue
+            blames[writer] = self._blame_step(writer, parents[writer], blames, rows)
+            self.blame_cache.put(writer, file_id, blames[writer])
+            stack.pop()
+        return blames[target]
+
+    def _blame_step(self, writer: int, parent_writers: List[int], blames: Dict[int, List[List[int]]],
+                    rows: List[Dict]) -> List[List[int]]:
+        hashes = {r["commit_id"]: r["blob_hash"] for r in rows}
+        contents = self.blob.get_blobs(hashes[c] for c in [writer] + parent_writers)
+        lines = (contents.get(hashes[writer]) or "").splitlines()
+        origins = [writer] * len(lines)
+        for parent in parent_writers:
+            parent_lines = (contents.get(hashes[parent]) or "").splitlines()
+            parent_origins = [origin for origin, count in blames[parent] for _ in range(count)]
+            for tag, i1, i2, j1, j2 in diff_opcodes(parent_lines, lines):
+                if tag != "equal":
+                    continue
+                for k in range(j2 - j1):
+                    # The first parent takes precedence on lines both parents kept
+                    if origins[j1 + k] == writer:
+                        origins[j1 + k] = parent_origins[i1 + k]
+        runs: List[List[int]] = []
+        for origin in origins:
+            if runs and runs[-1][0] == origin:
+                runs[-1][1] += 1
+            else:
+                runs.append([origin, 1])
+        return runs
+
+    def _parent_writers(self, writer: int, file_id: int, rows: List[Dict]) -> List[int]:
+        """Commits that wrote the file's version in each parent of writer (parents without the file are skipped)."""
+        found: List[int] = []
+        for parent in self.graph.parents(writer):
+            entry = self.tree.get_commit_tree(self.commit.get_commit_by_id(parent)).get(file_id)
+            if entry:
+                source = self._writer(rows, entry, parent)
+                if source not in found:
+                    found.append(source)
+        return found
+
+    def _writer(self, rows: List[Dict], entry: Dict, commit_id: int) -> int:
+        """
+        The commit that wrote a tree entry as seen from commit_id. Version numbers are per branch,
+        so among rows with the entry's version and blob the nearest ancestor of commit_id wins.
+        """
+        matches = [
+            r["commit_id"] for r in rows
+            if r["version_number"] == entry["version_number"] and r["blob_hash"] == entry["blob_hash"]
+        ]
+        if not matches:
+            raise HistoryError(f"No version row for file {entry['file_id']} version {entry['version_number']}")
+        if commit_id in matches:
+            return commit_id
+        if len(matches) > 1:
+            ancestors = [c for c in matches if self.graph.is_ancestor(c, commit_id)]
+            matches = ancestors or matches
+        return max(matches, key=self.graph.generation)
 
     # ---------------- Utility ----------------
     def show_history(self, repo_id: int) -> List[Dict]:
@@ -51,3 +192,12 @@ class HistoryService:
         """
         commits = self.list_commits(repo_id)
         return [{"commit_id": c["commit_id"], "message": c["message"], "timestamp": c["timestamp"]} for c in commits]
+
+    def show_history_page(self, repo_id: int, limit: int = 50, cursor: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """
+        One page of summarized history plus the cursor for the next page
+        (None when this was the last page).
+        """
+        commits = self.commit.list_commits_page(repo_id, limit, cursor)
+        next_cursor = self.commit.cursor_of(commits[-1]) if len(commits) == limit else None
+        return [{"commit_id": c["commit_id"], "message": c["message"], "timestamp": c["timestamp"]} for c in commits], next_cursor
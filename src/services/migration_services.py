@@ -0,0 +1,70 @@
+"""MigrationService: one-off data migrations that accompany the SQL files in migrations/."""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+from typing import Dict
+from config import get_backend
+from backends import StorageBackend
+from dao.blob_dao import Blob, content_hash
+
+class MigrationError(Exception):
+    pass
+
+class MigrationService:
+    def __init__(self):
+        self._sb : StorageBackend = get_backend()
+        self.blob : Blob = Blob()
+
+    def migrate_commitfile_blobs(self, batch_size: int = 500) -> Dict:
+        """
+        Move inline commitfile.content into the blob store (requires migrations/001_blob_store.sql).
+        Identical contents collapse into a single blob; rows keep only the hash.
+        Safe to re-run: only rows without a blob_hash are touched.
+        """
+        migrated = 0
+        while True:
+            resp = (
+                self._sb.table("commitfile")
+                .select("*")
+                .is_("blob_hash", "null")
+                .order("id", desc=False)
+                .limit(batch_size)
+                .execute()
+            )
+            rows = resp.data or []
+            if not rows:
+                break
+            hashes = self.blob.put_blobs(r.get("content") or "" for r in rows)
+            for r, h in zip(rows, hashes):
+                r["blob_hash"] = h
+                r["content"] = None
+            result = self._sb.table("commitfile").upsert(rows, on_conflict="id").execute()
+            if not result.data:
+                raise MigrationError("Failed to update commitfile rows with blob hashes")
+            migrated += len(rows)
+        return {"migrated_rows": migrated}
+
+    def backfill_file_hashes(self, batch_size: int = 500) -> Dict:
+        """
+        Fill file.content_hash for rows created before change tracking (migrations/004).
+        Until then make_commit treats those files as changed and reads their content.
+        """
+        updated = 0
+        while True:
+            resp = (
+                self._sb.table("file")
+                .select("*")
+                .is_("content_hash", "null")
+                .order("file_id", desc=False)
+                .limit(batch_size)
+                .execute()
+            )
+            rows = resp.data or []
+            if not rows:
+                break
+            for r in rows:
+                r["content_hash"] = content_hash(r.get("content") or "")
+            result = self._sb.table("file").upsert(rows, on_conflict="file_id").execute()
+            if not result.data:
+                raise MigrationError("Failed to update file hashes")
+            updated += len(rows)
+        return {"updated_files": updated}
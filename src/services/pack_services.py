@@ -0,0 +1,276 @@
+"""PackService: export a repository's full history to a pack file and import it back."""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+from typing import Dict, List, Optional, Set
+from dao.repo_dao import Repo
+from dao.file_dao import File
+from dao.commit_dao import Commit
+from dao.commitFile_dao import CommitFile
+from dao.branch_dao import Branch
+from dao.blob_dao import Blob, content_hash, content_size, is_chunked, chunked
+from dao.tree_dao import Tree, encode_tree, decode_tree
+from dao.search_dao import SearchIndex
+from dao.pack import PackWriter, PackReader, PackFormatError, TREE_REF, NO_TREE
+
+PACK_FORMAT = 1
+# Commit columns carried over on import (ids and parents are remapped)
+COMMIT_COLUMNS = ("message", "timestamp", "tree_hash", "parent_id", "merge_parent_id", "generation")
+
+class PackError(Exception):
+    pass
+
+class PackService:
+    """
+    A pack holds every row of a repository (working files, commits, commit file versions,
+    branches) plus each distinct blob once. Export reads in batches and streams objects to
+    disk; import writes blobs and rows with batched requests, giving every row a new id.
+    """
+    def __init__(self):
+        self.repo : Repo = Repo()
+        self.file : File = File()
+        self.commit : Commit = Commit()
+        self.commitfile : CommitFile = CommitFile()
+        self.branch : Branch = Branch()
+        self.blob : Blob = Blob()
+        self.tree : Tree = Tree()
+        self.search : SearchIndex = SearchIndex()
+
+    # ---------------- Export ----------------
+    def export_repo(self, repo_id: int, path: str, batch_size: int = 200) -> Dict:
+        """Write repository repo_id to a pack at path; returns object, row and byte counts."""
+        repo = self.repo.get_repo_by_id(repo_id)
+        if not repo:
+            raise PackError(f"Repository {repo_id} not found")
+        files = self.file.list_file_meta(repo_id)
+        commits = sorted(self.commit.list_commits(repo_id), key=lambda c: (c.get("generation") or 0, c["commit_id"]))
+        versions = self.commitfile.list_by_commits([c["commit_id"] for c in commits])
+        branches = self.branch.list_branches(repo_id)
+        trees = sorted({c["tree_hash"] for c in commits if c.get("tree_hash")})
+
+        with PackWriter(path) as pack:
+            # Working contents may not be committed yet, so they are read from the files themselves
+            working: Dict[int, str] = {}
+            for ids in chunked([f["file_id"] for f in files], batch_size):
+                for file_id, content in self.file.get_contents(ids).items():
+                    working[file_id] = content_hash(content)
+                    pack.add(working[file_id], content)
+            files = [{**f, "content_hash": working[f["file_id"]]} for f in files]
+            wanted = [h for h in dict.fromkeys([v["blob_hash"] for v in versions if v.get("blob_hash")] + trees)
+                      if h not in pack]
+            for hashes in chunked(wanted, batch_size):
+                contents = self.blob.get_blobs(hashes)
+                missing = [h for h in hashes if h not in contents]
+                if missing:
+                    raise PackError(f"Blob {missing[0]} referenced by repository {repo_id} is missing")
+                for h in hashes:
+                    pack.add(h, contents[h])
+            by_commit: Dict[int, List[Dict]] = {}
+            for v in versions:
+                by_commit.setdefault(v["commit_id"], []).append(v)
+            for c in commits:
+                pack.add_ref(c["commit_id"], TREE_REF, c.get("tree_hash") or NO_TREE)
+                if not c.get("tree_hash"):
+                    for v in by_commit.get(c["commit_id"], []):
+                        if v.get("blob_hash"):
+                            pack.add_ref(c["commit_id"], v["file_id"], v["blob_hash"])
+            pack.set_meta({
+                "format": PACK_FORMAT,
+                "repo": repo,
+                "files": files,
+                "commits": commits,
+                "versions": versions,
+                "branches": branches,
+                "trees": trees,
+            })
+            objects = len(pack)
+        return {
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "objects": objects,
+            "files": len(files),
+            "commits": len(commits),
+            "versions": len(versions),
+            "branches": len(branches),
+        }
+
+    # ---------------- Import ----------------
+    def import_pack(self, path: str, name: Optional[str] = None, batch_size: int = 500) -> Dict:
+        """
+        Restore a pack as a new repository (named after the exported one unless name is given).
+        Blobs keep their hashes; files, commits and branches get new ids, and commit trees are
+        rewritten with the new file ids. If any step fails the new repository and the rows
+        written for it are deleted again (stored blobs are shared and stay).
+        """
+        with self._open(path) as pack:
+            meta = pack.meta()
+            repo = self.repo.create_repo(name or meta["repo"]["name"])
+            if not repo:
+                raise PackError("Failed to create repository")
+            repo_id = repo["repo_id"]
+            trees = set(meta["trees"])
+
+            try:
+                self._import_blobs(pack, meta, repo_id, trees, batch_size)
+                file_ids = self._import_files(pack, meta, repo_id, batch_size)
+                commit_ids = self._import_commits(pack, meta, repo_id, file_ids, batch_size)
+                self.commitfile.insert_rows([
+                    {"commit_id": commit_ids[v["commit_id"]], "file_id": file_ids[v["file_id"]],
+                     "version_number": v["version_number"], "blob_hash": v["blob_hash"]}
+                    for v in meta["versions"]
+                ], batch_size)
+                branches = self.branch.create_branches([
+                    {"repo_id": repo_id, "name": b["name"],
+                     "head_commit_id": commit_ids.get(b["head_commit_id"]) if b.get("head_commit_id") else None}
+                    for b in meta["branches"]
+                ])
+            except BaseException:
+                self._discard_repo(repo_id)
+                raise
+        return {
+            "repo": repo,
+            "files": len(meta["files"]),
+            "commits": len(commit_ids),
+            "versions": len(meta["versions"]),
+            "branches": len(branches),
+        }
+
+    def read_file_version(self, path: str, commit_id: int, file_id: int) -> Optional[str]:
+        """
+        Content of a file at a commit, read straight from a pack (ids as exported). The commit's
+        tree is found through the pack's ref index, so only the tree and the version itself are
+        decompressed; packs without refs fall back to the meta.
+        """
+        with self._open(path, check_meta=False) as pack:
+            if pack.has_refs:
+                tree_hash = pack.ref(commit_id, TREE_REF)
+                if tree_hash is None:
+                    raise PackError(f"Commit {commit_id} not found in {path}")
+                commit = {"tree_hash": None if tree_hash == NO_TREE else tree_hash}
+            else:
+                self._check_meta(pack, path)
+                commit = next((c for c in pack.meta()["commits"] if c["commit_id"] == commit_id), None)
+                if not commit:
+                    raise PackError(f"Commit {commit_id} not found in {path}")
+            if commit.get("tree_hash"):
+                entry = decode_tree(pack.get(commit["tree_hash"])).get(file_id)
+                blob_hash = entry["blob_hash"] if entry else None
+            elif pack.has_refs:
+                blob_hash = pack.ref(commit_id, file_id)
+            else:
+                blob_hash = next((v["blob_hash"] for v in pack.meta()["versions"]
+                                  if v["commit_id"] == commit_id and v["file_id"] == file_id), None)
+            if blob_hash is None:
+                raise PackError(f"File {file_id} not found in commit {commit_id}")
+            return pack.get(blob_hash)
+
+    def _open(self, path: str, check_meta: bool = True) -> PackReader:
+        try:
+            pack = PackReader(path)
+        except (OSError, PackFormatError) as e:
+            raise PackError(f"Cannot read pack {path}: {e}")
+        if check_meta:
+            self._check_meta(pack, path)
+        return pack
+
+    @staticmethod
+    def _check_meta(pack: PackReader, path: str) -> None:
+        if pack.meta().get("format") != PACK_FORMAT:
+            pack.close()
+            raise PackError(f"Unsupported pack format in {path}")
+
+    def _discard_repo(self, repo_id: int) -> None:
+        """Delete a partly imported repository: its branches, versions, commits, files and index."""
+        commit_ids = [c["commit_id"] for c in self.commit.list_commits(repo_id)]
+        self.branch.delete_branches(repo_id)
+        self.commitfile.delete_by_commits(commit_ids)
+        self.commit.delete_commits(repo_id)
+        self.file.delete_files([f["file_id"] for f in self.file.list_file_meta(repo_id)])
+        self.search.delete_repo(repo_id)
+        self.repo.delete_repo(repo_id)
+
+    def _import_blobs(self, pack: PackReader, meta: Dict, repo_id: int, trees: Set[str], batch_size: int) -> None:
+        """
+        Store every content object. Versions go in version order with the file's previous
+        version as delta base, so in delta mode the bases are already stored when needed.
+        Committed versions are added to the new repository's search index on the way.
+        """
+        order: Dict[str, int] = {}
+        bases: Dict[str, Optional[str]] = {}
+        previous: Dict[int, str] = {}
+        for v in sorted(meta["versions"], key=lambda v: (v["version_number"] or 0, v["file_id"])):
+            h = v["blob_hash"]
+            if h and h not in order:
+                order[h] = v["version_number"] or 0
+                bases[h] = previous.get(v["file_id"])
+            if h:
+                previous[v["file_id"]] = h
+        hashes = sorted((h for h in pack.hashes() if h not in trees), key=lambda h: order.get(h, 0))
+        for batch in chunked(hashes, batch_size):
+            contents = [pack.get(h) for h in batch]
+            self.blob.put_blobs(contents, [bases.get(h) for h in batch])
+            self.search.index_blobs(repo_id, {h: c for h, c in zip(batch, contents) if h in order})
+
+    def _import_files(self, pack: PackReader, meta: Dict, repo_id: int, batch_size: int) -> Dict[int, int]:
+        """
+        Insert the working files and map old file ids to new ones. Files that only exist in
+        history are inserted too (to reserve ids a rollback can restore them under) and then
+        deleted again.
+        """
+        rows: List[Dict] = []
+        old_ids: List[int] = []
+        for f in meta["files"]:
+            content = pack.get(f["content_hash"])
+            large = is_chunked(content)
+            rows.append({
+                "repo_id": repo_id,
+                "filename": f["filename"],
+                "content": None if large else content,
+                "content_hash": f["content_hash"],
+                "size": content_size(content),
+            })
+            old_ids.append(f["file_id"])
+        working = set(old_ids)
+        removed = sorted({v["file_id"] for v in meta["versions"]} - working)
+        for file_id in removed:
+            rows.append({"repo_id": repo_id, "filename": f"file-{file_id}", "content": None,
+                         "content_hash": None, "size": None})
+            old_ids.append(file_id)
+        created = self.file.insert_files(rows, batch_size)
+        if len(created) != len(rows):
+            raise PackError("Failed to import files")
+        file_ids = {old: new["file_id"] for old, new in zip(old_ids, created)}
+        if removed:
+            self.file.delete_files([file_ids[i] for i in removed])
+        return file_ids
+
+    def _import_commits(self, pack: PackReader, meta: Dict, repo_id: int, file_ids: Dict[int, int],
+                        batch_size: int) -> Dict[int, int]:
+        """Insert commits in generation order with remapped trees, then link their parents."""
+        new_trees: Dict[str, str] = {}
+        for hashes in chunked(meta["trees"], batch_size):
+            texts = []
+            for h in hashes:
+                tree = {}
+                for file_id, e in decode_tree(pack.get(h)).items():
+                    tree[file_ids[file_id]] = {**e, "file_id": file_ids[file_id]}
+                texts.append(encode_tree(tree))
+            new_trees.update(zip(hashes, self.blob.put_blobs(texts)))
+
+        commits = meta["commits"]
+        rows = [
+            {"repo_id": repo_id, **{k: c.get(k) for k in COMMIT_COLUMNS},
+             "tree_hash": new_trees.get(c.get("tree_hash")), "parent_id": None, "merge_parent_id": None}
+            for c in commits
+        ]
+        created = self.commit.insert_commits(rows, batch_size)
+        if len(created) != len(rows):
+            raise PackError("Failed to import commits")
+        commit_ids = {c["commit_id"]: new["commit_id"] for c, new in zip(commits, created)}
+        linked = [
+            {**new, "parent_id": commit_ids.get(c.get("parent_id")), "merge_parent_id": commit_ids.get(c.get("merge_parent_id"))}
+            for c, new in zip(commits, created)
+            if c.get("parent_id") or c.get("merge_parent_id")
+        ]
+        if linked:
+            self.commit.upsert_commits(linked, batch_size)
+        return commit_ids
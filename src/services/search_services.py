@@ -0,0 +1,234 @@
+"""SearchService: substring/regex search and pickaxe queries over every committed file version."""
+import sys, os
+sys.path.append(os.path.join(os.getcwd(), 'src'))
+import re
+from typing import Callable, Dict, List, Optional, Set
+from dao.search_dao import SearchIndex, trigrams
+from dao.blob_dao import Blob, chunked
+from dao.commit_dao import Commit
+from dao.commitFile_dao import CommitFile
+from dao.file_dao import File
+
+class SearchError(Exception):
+    pass
+
+def _regex_literals(pattern: str) -> List[str]:
+    r"""
+    Literal runs every match of pattern must contain. Conservative: alternation, lookarounds,
+    optional groups and verbose mode yield no literals (so every blob is a candidate). Escapes
+    with an argument (\x41, \u0041, \N{...}, octal and group references) end a run whole.
+
+    >>> _regex_literals(r"foo\.bar")
+    ['foo.bar']
+    >>> _regex_literals(r"\x41BCD"), _regex_literals(r"\101BCD"), _regex_literals(r"\u0041BCD")
+    (['BCD'], ['BCD'], ['BCD'])
+    >>> _regex_literals(r"\U00000041BCD"), _regex_literals(r"\N{LATIN CAPITAL LETTER A}BCD")
+    (['BCD'], ['BCD'])
+    >>> _regex_literals(r"(abc)\1xyz"), _regex_literals(r"\d+abc\s")
+    (['abc', 'xyz'], ['abc'])
+    """
+    if (re.search(r"(?<!\\)\|", pattern) or re.search(r"\(\?([=!<]|[a-zA-Z]*x)", pattern)
+            or re.search(r"\)[*?{]", pattern)):
+        return []
+    runs: List[str] = []
+    run = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            nxt = pattern[i + 1:i + 2]
+            if nxt and not nxt.isalnum():
+                run += nxt
+                i += 2
+            else:
+                runs.append(run)
+                run = ""
+                i = _escape_end(pattern, i)
+            continue
+        if c in "*?{":
+            # The preceding character is optional or repeated, so the run ends before it
+            runs.append(run[:-1])
+            run = ""
+            if c == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+                continue
+        elif c == "+":
+            runs.append(run)
+            run = ""
+        elif c == "[":
+            runs.append(run)
+            run = ""
+            j = i + 1
+            if pattern[j:j + 1] == "^":
+                j += 1
+            if pattern[j:j + 1] == "]":
+                j += 1
+            while j < len(pattern) and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            i = j + 1
+            continue
+        elif c in ".^$()":
+            runs.append(run)
+            run = ""
+            if c == "(" and pattern[i + 1:i + 2] == "?":
+                # Non-capturing group or inline flags: skip to the group body
+                j = pattern.find(":", i)
+                close = pattern.find(")", i)
+                i = (close + 1) if j < 0 or (0 <= close < j) else j + 1
+                continue
+        else:
+            run += c
+        i += 1
+    runs.append(run)
+    return [r for r in runs if len(r) >= 3]
+
+def _escape_end(pattern: str, i: int) -> int:
+    """Index just past the alphanumeric escape starting at pattern[i] (a backslash), argument included."""
+    kind = pattern[i + 1:i + 2]
+    if kind in ("x", "u", "U"):
+        width = {"x": 2, "u": 4, "U": 8}[kind]
+        return i + 2 + width
+    if kind == "N" and pattern[i + 2:i + 3] == "{":
+        close = pattern.find("}", i)
+        return close + 1 if close >= 0 else len(pattern)
+    if kind.isdigit():
+        # Octal escapes and group references: all their digits belong to the escape
+        j = i + 1
+        while j < len(pattern) and pattern[j].isdigit():
+            j += 1
+        return j
+    return i + 2
+
+class SearchService:
+    """
+    Queries go through the trigram index: the query's trigrams select candidate blobs in one
+    request, only candidates are read and checked, and matching blobs are mapped back to the
+    commit file versions that reference them.
+    """
+    def __init__(self):
+        self.index : SearchIndex = SearchIndex()
+        self.blob : Blob = Blob()
+        self.commit : Commit = Commit()
+        self.commitfile : CommitFile = CommitFile()
+        self.file : File = File()
+
+    def search(self, repo_id: int, query: str, regex: bool = False, ignore_case: bool = False,
+               limit: int = 100, batch_size: int = 100) -> List[Dict]:
+        """
+        File versions whose content matches query (a substring, or a regular expression with
+        regex=True), newest commit first, at most limit of them. Each result carries commit_id,
+        file_id, version_number, blob_hash, filename (of the working file, if it still exists)
+        and the matching lines as (line_number, line).
+        Candidate blobs are read in order of the newest version referencing them, and reading
+        stops once limit matching versions are known to be newer than any blob left.
+        """
+        matcher = self._matcher(query, regex, ignore_case)
+        versions = self._versions(repo_id, self._candidates(repo_id, query, regex))
+        key = lambda v: (v["generation"] or 0, v["commit_id"], v["file_id"])
+        by_blob: Dict[str, List[Dict]] = {}
+        for v in versions:
+            by_blob.setdefault(v["blob_hash"], []).append(v)
+        newest = {h: max(map(key, vs)) for h, vs in by_blob.items()}
+        matches: Dict[str, List] = {}
+        found: List = []
+        for hashes in chunked(sorted(newest, key=newest.get, reverse=True), batch_size):
+            if len(found) >= limit and found[limit - 1] > newest[hashes[0]]:
+                break
+            for h, content in self.blob.get_blobs(hashes).items():
+                if matcher(content):
+                    matches[h] = [(n, line) for n, line in enumerate(content.splitlines(), start=1) if matcher(line)]
+                    found.extend(map(key, by_blob[h]))
+            found = sorted(found, reverse=True)[:limit]
+        names = {f["file_id"]: f["filename"] for f in self.file.list_file_meta(repo_id)}
+        hits = sorted((v for h in matches for v in by_blob[h]), key=key, reverse=True)
+        return [
+            {**v, "filename": names.get(v["file_id"]), "lines": matches[v["blob_hash"]]}
+            for v in hits[:limit]
+        ]
+
+    def pickaxe(self, repo_id: int, query: str, regex: bool = False, ignore_case: bool = False) -> List[Dict]:
+        """
+        Commits that added or removed query in some file, oldest first: one event
+        {commit_id, generation, file_id, version_number, change ("added" or "removed")} per
+        file version whose content matches while the file's previous version did not, or the
+        reverse. Only candidate blobs are read; any other version is known not to match.
+        Deleting a file is not an event (deletions are not recorded as versions).
+        """
+        matcher = self._matcher(query, regex, ignore_case)
+        matching: Set[str] = set()
+        for hashes in chunked(self._candidates(repo_id, query, regex)):
+            matching |= {h for h, content in self.blob.get_blobs(hashes).items() if matcher(content)}
+        if not matching:
+            return []
+        file_ids = {v["file_id"] for v in self._versions(repo_id, matching)}
+        history = self._repo_versions(repo_id, self.commitfile.list_by_files(sorted(file_ids)))
+        by_file: Dict[int, List[Dict]] = {}
+        for v in history:
+            by_file.setdefault(v["file_id"], []).append(v)
+        events: List[Dict] = []
+        for file_id, versions in by_file.items():
+            present = False
+            for v in sorted(versions, key=lambda v: (v["version_number"] or 0, v["generation"] or 0)):
+                found = v["blob_hash"] in matching
+                if found != present:
+                    events.append({
+                        "commit_id": v["commit_id"],
+                        "generation": v["generation"],
+                        "file_id": file_id,
+                        "version_number": v["version_number"],
+                        "change": "added" if found else "removed",
+                    })
+                present = found
+        events.sort(key=lambda e: (e["generation"] or 0, e["commit_id"], e["file_id"]))
+        return events
+
+    def first_appearance(self, repo_id: int, query: str, regex: bool = False, ignore_case: bool = False) -> Optional[Dict]:
+        """The earliest commit in which some file contains query (with the file_id), or None."""
+        added = next((e for e in self.pickaxe(repo_id, query, regex, ignore_case) if e["change"] == "added"), None)
+        if not added:
+            return None
+        return {**self.commit.get_commit_by_id(added["commit_id"]), "file_id": added["file_id"]}
+
+    def reindex(self, repo_id: int, batch_size: int = 100) -> int:
+        """Index every committed version not yet in the index (e.g. after an import); returns blobs added."""
+        commits = self.commit.list_commits(repo_id)
+        hashes = {v["blob_hash"] for v in self.commitfile.list_by_commits([c["commit_id"] for c in commits])}
+        added = 0
+        for chunk in chunked(sorted(self.index.missing_docs(repo_id, hashes)), batch_size):
+            contents = self.blob.get_blobs(chunk)
+            added += self.index.index_blobs(repo_id, {h: contents.get(h) for h in chunk})
+        return added
+
+    def _matcher(self, query: str, regex: bool, ignore_case: bool) -> Callable[[str], bool]:
+        if not query:
+            raise SearchError("Empty search query")
+        if regex:
+            try:
+                compiled = re.compile(query, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+            except re.error as e:
+                raise SearchError(f"Invalid regular expression: {e}")
+            return lambda text: compiled.search(text) is not None
+        if ignore_case:
+            folded = query.casefold()
+            return lambda text: folded in text.casefold()
+        return lambda text: query in text
+
+    def _candidates(self, repo_id: int, query: str, regex: bool) -> List[str]:
+        literals = _regex_literals(query) if regex else [query]
+        grams: Set[str] = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        return self.index.candidates(repo_id, grams)
+
+    def _versions(self, repo_id: int, hashes) -> List[Dict]:
+        """Commit file versions of repo_id that reference any of the blob hashes."""
+        return self._repo_versions(repo_id, self.commitfile.list_by_blobs(list(hashes)))
+
+    def _repo_versions(self, repo_id: int, rows: List[Dict]) -> List[Dict]:
+        """Keep rows whose commit belongs to repo_id (blobs are shared between repos), with its generation."""
+        nodes = {n["commit_id"]: n for n in self.commit.get_graph_nodes(sorted({r["commit_id"] for r in rows}))}
+        return [
+            {**r, "generation": nodes[r["commit_id"]].get("generation")}
+            for r in rows
+            if r["commit_id"] in nodes and nodes[r["commit_id"]]["repo_id"] == repo_id
+        ]
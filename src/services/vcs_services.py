@@ -1,11 +1,22 @@
 """VCSService: orchestrates commits, rollback, and file operations."""
 import sys, os
 sys.path.append(os.path.join(os.getcwd(), 'src')) 
-from typing import List, Dict
+import time
+from typing import List, Dict, Iterable, Iterator, Optional
+from config import INGEST_WORKERS, COMMIT_RETRIES
 from dao.repo_dao import Repo
-from dao.file_dao import File
+from dao.file_dao import File, LazyFile
 from dao.commit_dao import Commit
 from dao.commitFile_dao import CommitFile
+from dao.branch_dao import Branch, StaleHeadError, retry_delay
+from dao.blob_dao import Blob, content_hash, content_size, is_chunked_size
+from dao.tree_dao import Tree, encode_tree
+from dao.search_dao import SearchIndex
+from dao.journal import JournalError
+from dao.worktree import IgnoreRules, IGNORE_FILE, walk_files, scan_files, READ_BLOCK
+
+# Bytes of file content read into memory per batched insert/upsert during add_directory
+INGEST_BATCH_BYTES = 8 * 1024 * 1024
 
 class VCSError(Exception):
     pass
@@ -15,6 +26,10 @@ class VCSService:
         self.file : File=File()
         self.commit : Commit=Commit()
         self.commitfile : CommitFile=CommitFile()
+        self.branch : Branch=Branch()
+        self.blob : Blob=Blob()
+        self.tree : Tree=Tree()
+        self.search : SearchIndex=SearchIndex()
     
     # ---------------- Repository Operations ----------------
     def create_repo(self, name: str) -> Dict:
@@ -26,6 +41,16 @@ class VCSService:
     def list_repos(self) -> List[Dict]:
         return self.repo.list_repos()
 
+    def iter_repos(self, page_size: int = 100) -> Iterator[Dict]:
+        """Stream all repositories, newest first, one keyset page at a time."""
+        after = None
+        while True:
+            page = self.repo.list_repos_page(page_size, after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]["repo_id"]
+
     def get_repo(self, repo_id: int) -> Dict:
         repo = self.repo.get_repo_by_id(repo_id)
         if not repo:
@@ -39,8 +64,37 @@ class VCSService:
             raise VCSError("Failed to add file")
         return file
 
-    def list_files_in_repo(self, repo_id: int) -> List[Dict]:
-        return self.file.list_files_in_repo(repo_id)
+    def add_file_stream(self, repo_id: int, filename: str, pieces: Iterable[str]) -> Dict:
+        """Add a file from text pieces (e.g. a file object read in blocks); stored as chunks."""
+        file = self.file.create_file_stream(repo_id, filename, pieces)
+        if not file:
+            raise VCSError("Failed to add file")
+        return file
+
+    def update_file_stream(self, file_id: int, pieces: Iterable[str]) -> Dict:
+        self._settle()
+        file = self.file.update_file_stream(file_id, pieces)
+        if not file:
+            raise VCSError(f"File {file_id} not found")
+        return file
+
+    def iter_file_content(self, file_id: int) -> Iterator[str]:
+        """Stream a working file's content in pieces."""
+        return self.file.iter_content(file_id)
+
+    def list_files_in_repo(self, repo_id: int) -> List[LazyFile]:
+        """Files of a repository, highest file_id first; metadata only, content fetched on access."""
+        return [self.file.lazy(f) for f in self.file.list_file_meta(repo_id)]
+
+    def iter_files_in_repo(self, repo_id: int, page_size: int = 100) -> Iterator[LazyFile]:
+        """Stream the files of a repository, highest file_id first, one keyset page at a time."""
+        after = None
+        while True:
+            page = self.file.list_files_page(repo_id, page_size, after, meta_only=True)
+            yield from (self.file.lazy(f) for f in page)
+            if len(page) < page_size:
+                return
+            after = page[-1]["file_id"]
 
     def update_file(self, file_id: int, new_filename: str = None, new_content: str = None) -> Dict:
         updated_file = self.file.update_file(
@@ -52,39 +106,307 @@ class VCSService:
             raise VCSError(f"Failed to update file {file_id}")
         return updated_file
 
+    def add_directory(self, repo_id: int, directory: str, ignore_file: Optional[str] = IGNORE_FILE,
+                      delete_missing: bool = True, workers: int = INGEST_WORKERS, batch_size: int = 200) -> Dict:
+        """
+        Make the repo's working files match a local directory tree ("add all"). Files are
+        hashed in parallel worker processes and compared by content_hash with the working
+        files of the same name, so only new and changed files are read and uploaded, in
+        batched inserts and upserts; large ones are streamed as chunks. With delete_missing,
+        working files with no counterpart on disk are deleted, unless the ignore file (read
+        from the directory root) excludes their path. Files that are not UTF-8 text are
+        skipped. Returns counts, the skipped paths and throughput (files and bytes per second).
+        """
+        self.get_repo(repo_id)
+        self._settle()
+        if not os.path.isdir(directory):
+            raise VCSError(f"Directory {directory} not found")
+        started = time.perf_counter()
+        rules = IgnoreRules.load(directory, ignore_file)
+        paths = list(walk_files(directory, rules))
+        scans = scan_files([os.path.join(directory, *p.split("/")) for p in paths], workers)
+        existing: Dict[str, Dict] = {}
+        for f in self.file.list_file_meta(repo_id):
+            existing.setdefault(f["filename"], f)
+
+        added: List[str] = []
+        updated: List[str] = []
+        skipped: List[str] = []
+        for path, (h, _) in zip(paths, scans):
+            if h is None:
+                skipped.append(path)
+            elif path not in existing:
+                added.append(path)
+            elif existing[path].get("content_hash") != h:
+                updated.append(path)
+        sizes = {p: size for p, (_, size) in zip(paths, scans)}
+        uploaded = self._ingest(repo_id, directory, added, existing, sizes, batch_size)
+        uploaded += self._ingest(repo_id, directory, updated, existing, sizes, batch_size)
+
+        deleted: List[int] = []
+        if delete_missing:
+            present = set(paths)
+            deleted = [f["file_id"] for name, f in existing.items()
+                       if name not in present and not rules.ignored(name)]
+            self.file.delete_files(deleted)
+
+        seconds = time.perf_counter() - started
+        scanned = sum(sizes.values())
+        return {
+            "files": len(paths),
+            "added": len(added),
+            "updated": len(updated),
+            "deleted": len(deleted),
+            "unchanged": len(paths) - len(added) - len(updated) - len(skipped),
+            "skipped": skipped,
+            "bytes_scanned": scanned,
+            "bytes_uploaded": uploaded,
+            "seconds": round(seconds, 3),
+            "files_per_second": round(len(paths) / seconds, 1) if seconds else None,
+            "bytes_per_second": round(scanned / seconds) if seconds else None,
+        }
+
+    def _ingest(self, repo_id: int, directory: str, paths: List[str], existing: Dict[str, Dict],
+                sizes: Dict[str, int], batch_size: int) -> int:
+        """Upload the given paths: new ones as inserts, known ones as upserts over their file_id."""
+        uploaded = 0
+        rows: List[Dict] = []
+        pending = 0
+
+        def flush():
+            new = [r for r in rows if "file_id" not in r]
+            if new and len(self.file.insert_files(new, batch_size)) != len(new):
+                raise VCSError("Failed to add files")
+            changed = [r for r in rows if "file_id" in r]
+            if changed:
+                self.file.upsert_files(changed, batch_size)
+            rows.clear()
+
+        for path in paths:
+            full_path = os.path.join(directory, *path.split("/"))
+            known = existing.get(path)
+            if is_chunked_size(sizes[path]):
+                with open(full_path, "r", encoding="utf-8", newline="") as fh:
+                    pieces = iter(lambda: fh.read(READ_BLOCK), "")
+                    if known:
+                        self.file.update_file_stream(known["file_id"], pieces)
+                    else:
+                        self.file.create_file_stream(repo_id, path, pieces)
+                uploaded += sizes[path]
+                continue
+            with open(full_path, "r", encoding="utf-8", newline="") as fh:
+                content = fh.read()
+            row = {"repo_id": repo_id, "filename": path, "content": content,
+                   "content_hash": content_hash(content), "size": content_size(content)}
+            if known:
+                row["file_id"] = known["file_id"]
+            rows.append(row)
+            pending += row["size"]
+            uploaded += row["size"]
+            if len(rows) >= batch_size or pending >= INGEST_BATCH_BYTES:
+                flush()
+                pending = 0
+        flush()
+        return uploaded
+
+    def _settle(self) -> None:
+        """Sync the offline journal (if any) before work that reads and rewrites stored rows."""
+        try:
+            self.file.settle()
+        except JournalError as e:
+            raise VCSError(str(e))
+
     # ---------------- Commit Operations ----------------
-    def make_commit(self, repo_id: int, message: str) -> Dict:
-        commit = self.commit.create_commit(repo_id, message)
-        if not commit:
-            raise VCSError("Failed to create commit")
+    def make_commit(self, repo_id: int, message: str, branch_id: Optional[int] = None) -> Dict:
+        """
+        Commit the files that changed since the previous commit.
+        The parent is the head of branch_id (which then advances to the new commit in the same
+        transaction) or, without a branch, the repository's latest commit.
+        Each file's content_hash is compared with its entry in the parent tree, so only changed
+        files are read, get a blob and a commitfile row with the next version_number. The new
+        tree still lists every file, so any commit resolves to its full state.
+        Blobs are written first (content-addressed, so a failed commit only leaves reusable blobs);
+        the commit row and its file rows are then inserted atomically in a single call.
+        Large files already live in the blob store, so their rows are committed by hash alone.
+        Pending offline journal writes are synced first, so the commit sees stored files only.
+        On a branch the head advances by compare-and-swap: if another writer moved it since it
+        was read, the commit is rebuilt on the new head and retried (up to commit_retries times).
+        """
+        self._settle()
+        for attempt in range(1, COMMIT_RETRIES + 1):
+            try:
+                return self._commit_once(repo_id, message, branch_id)
+            except StaleHeadError:
+                if attempt == COMMIT_RETRIES:
+                    break
+                time.sleep(retry_delay(attempt))
+        raise VCSError(f"Branch {branch_id} kept moving: commit failed after {COMMIT_RETRIES} attempts")
+
+    def _commit_once(self, repo_id: int, message: str, branch_id: Optional[int]) -> Dict:
+        """One make_commit attempt against the current head; raises StaleHeadError if it moved meanwhile."""
+        if branch_id is not None:
+            branch = self.branch.get_branch_by_id(branch_id)
+            if not branch or branch["repo_id"] != repo_id:
+                raise VCSError(f"Branch {branch_id} not found in repository {repo_id}")
+            previous = self.commit.get_commit_by_id(branch["head_commit_id"]) if branch.get("head_commit_id") else None
+        else:
+            previous = self.commit.get_latest_commit(repo_id)
+        parent_tree = self.tree.get_commit_tree(previous)
+
+        files = self.file.list_file_meta(repo_id)
+        dirty = [
+            f["file_id"] for f in files
+            if not f.get("content_hash")
+            or f["content_hash"] != parent_tree.get(f["file_id"], {}).get("blob_hash")
+        ]
+        rows_by_id = self.file.get_files_by_ids(dirty) if dirty else []
+        stored = {f["file_id"]: f["content_hash"] for f in rows_by_id if f.get("content") is None and f.get("content_hash")}
+        contents = {f["file_id"]: f.get("content") or "" for f in rows_by_id if f["file_id"] not in stored}
+
+        # Files missing from the parent tree may be restored ones; continue their version sequence
+        added = [i for i in list(contents) + list(stored) if i not in parent_tree]
+        latest = self.commitfile.get_latest_versions(added) if added else {}
 
-        files = self.file.list_files_in_repo(repo_id)
+        tree: Dict[int, Dict] = {}
+        rows: List[Dict] = []
         for f in files:
-            self.commitfile.add_file_to_commit(
-                commit_id=commit["commit_id"],
-                file_id=f["file_id"],
-                version_number=1,  
-                content=f["content"]
-            )
+            file_id = f["file_id"]
+            entry = parent_tree.get(file_id)
+            if file_id in contents or file_id in stored:
+                h = stored[file_id] if file_id in stored else content_hash(contents[file_id])
+                if not entry or entry["blob_hash"] != h:
+                    version = (entry["version_number"] or 0) + 1 if entry else latest.get(file_id, 0) + 1
+                    entry = {
+                        "file_id": file_id,
+                        "version_number": version,
+                        "blob_hash": h,
+                        "size": f.get("size") if file_id in stored else content_size(contents[file_id]),
+                    }
+                    rows.append({"file_id": file_id, "version_number": version, "blob_hash": h})
+                else:
+                    contents.pop(file_id, None)
+            tree[file_id] = {**entry, "filename": f["filename"]}
+
+        # Changed contents are delta-encoded against their previous version, the tree against the parent tree
+        changed = [r["file_id"] for r in rows if r["file_id"] in contents]
+        hashes = self.blob.put_blobs(
+            [contents[i] for i in changed] + [encode_tree(tree)],
+            [parent_tree[i]["blob_hash"] if i in parent_tree else None for i in changed]
+            + [previous.get("tree_hash") if previous else None],
+        )
+        # New versions join the search index with the commit; large stored bodies are recorded as unindexed
+        search = self.search.commit_entries({
+            **{stored[r["file_id"]]: None for r in rows if r["file_id"] in stored},
+            **{h: contents[i] for i, h in zip(changed, hashes)},
+        })
+        commit = self.commit.create_commit_with_files(
+            repo_id, message, rows, tree_hash=hashes[-1],
+            parent_id=previous["commit_id"] if previous else None, branch_id=branch_id, search=search,
+        )
+        if not commit:
+            raise VCSError("Failed to create commit")
         return commit
 
     def list_commits(self, repo_id: int) -> List[Dict]:
         return self.commit.list_commits(repo_id)
 
+    def iter_commits(self, repo_id: int, page_size: int = 100) -> Iterator[Dict]:
+        """Stream the commits of a repository, newest first, one keyset page at a time."""
+        cursor = None
+        while True:
+            page = self.commit.list_commits_page(repo_id, page_size, cursor)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = self.commit.cursor_of(page[-1])
+
     # ---------------- Rollback Operation ----------------
-    def rollback_commit(self, commit_id: int) -> bool:
+    def rollback_commit(self, commit_id: int, dry_run: bool = False) -> Dict:
+        """
+        Restore the working files of a repository to a commit's tree.
+        Working files are compared by metadata (hash and name) only: files whose hash differs are
+        rewritten, renamed files only get their name back (no content is read), files added since
+        the commit are deleted and files removed since are restored with their old id. Large
+        bodies are restored as pointers to their blob, without reading them.
+        With dry_run=True nothing is written and the change set (with byte counts) is returned.
+        """
+        self._settle()
         commit = self.commit.get_commit_by_id(commit_id)
         if not commit:
             raise VCSError(f"Commit {commit_id} not found")
 
-        commit_files = self.commitfile.get_files_by_commit(commit_id)
-        if not commit_files:
+        tree = self.tree.get_commit_tree(commit)
+        if not tree:
             raise VCSError(f"No files found for commit {commit_id}")
 
-        for cf in commit_files:
-            file_id = cf["file_id"]
-            content = cf["content"]
-            self.file.update_file(file_id, new_content=content)
-        return True
+        working = {f["file_id"]: f for f in self.file.list_file_meta(commit["repo_id"])}
+        modified, restored, renamed = [], [], set()
+        for file_id, entry in tree.items():
+            current = working.get(file_id)
+            if current is None:
+                restored.append(entry)
+            elif current.get("content_hash") != entry["blob_hash"]:
+                modified.append(entry)
+            elif entry.get("filename") and entry["filename"] != current["filename"]:
+                modified.append(entry)
+                renamed.add(file_id)
+        deleted = [f for file_id, f in working.items() if file_id not in tree]
+
+        unknown = [e["blob_hash"] for e in modified + restored if e.get("size") is None and e["file_id"] not in renamed]
+        sizes = self.blob.get_sizes(unknown) if unknown else {}
+
+        def _item(entry: Dict, filename: str) -> Dict:
+            size = 0 if entry["file_id"] in renamed else entry.get("size")
+            return {
+                "file_id": entry["file_id"],
+                "filename": filename,
+                "bytes": size if size is not None else sizes.get(entry["blob_hash"], 0),
+            }
 
+        changes = {
+            "commit_id": commit_id,
+            "modified": [_item(e, e.get("filename") or working[e["file_id"]]["filename"]) for e in modified],
+            "restored": [_item(e, e.get("filename") or f"file-{e['file_id']}") for e in restored],
+            "deleted": [{"file_id": f["file_id"], "filename": f["filename"]} for f in deleted],
+            "applied": False,
+        }
+        changes["bytes"] = sum(i["bytes"] for i in changes["modified"] + changes["restored"])
+        if dry_run:
+            return changes
 
+        items = changes["modified"] + changes["restored"]
+        rewrite = [i for i in items if i["file_id"] not in renamed]
+        contents = self.blob.get_blobs(tree[i["file_id"]]["blob_hash"] for i in rewrite if not is_chunked_size(i["bytes"]))
+        rows = []
+        for item in rewrite:
+            blob_hash = tree[item["file_id"]]["blob_hash"]
+            large = is_chunked_size(item["bytes"])
+            content = None if large else contents.get(blob_hash, "")
+            rows.append({
+                "file_id": item["file_id"],
+                "repo_id": commit["repo_id"],
+                "filename": item["filename"],
+                "content": content,
+                "content_hash": blob_hash,
+                "size": item["bytes"] if large else content_size(content),
+            })
+        if rows:
+            self.file.upsert_files(rows)
+        # Renames leave content untouched: their rows carry no content column, so they go in a
+        # batch of their own (PostgREST would null columns missing from some rows of a batch)
+        renames = [
+            {
+                "file_id": item["file_id"],
+                "repo_id": commit["repo_id"],
+                "filename": item["filename"],
+                "content_hash": working[item["file_id"]].get("content_hash"),
+                "size": working[item["file_id"]].get("size"),
+            }
+            for item in items if item["file_id"] in renamed
+        ]
+        if renames:
+            self.file.upsert_files(renames)
+        if deleted:
+            self.file.delete_files([f["file_id"] for f in deleted])
+        changes["applied"] = True
+        return changes
@@ -1,12 +1,19 @@
 import os
+import io
 import sys
+import asyncio
+import tempfile
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
 import streamlit as st
 from services.vcs_services import VCSService, VCSError
-from services.branch_services import BranchService, BranchError
+from services.branch_services import BranchService, BranchError, MergeConflictError
 from services.history_services import HistoryService, HistoryError
-from config import get_supabase, get_supabase_admin
+from services.diff_services import DiffService, DiffError
+from services.pack_services import PackService, PackError
+from services.search_services import SearchService, SearchError
+from services.async_services import AsyncVCSService, AsyncHistoryService, AsyncBranchService, load_repo_view
+from config import get_supabase, get_supabase_admin, STORAGE_BACKEND, SQLITE_PATH
 
 # -----------------------
 # App Setup
@@ -17,16 +24,22 @@ st.title("📂 CompactVCS")
 # -----------------------
 # Auth setup and helpers
 # -----------------------
-sb = None
-try:
-    sb = get_supabase()
-except Exception:
-    # handled below by services init try/except as well
-    pass
+# Auth gets a private client per browser session: signing in rewrites the client's auth
+# headers, so it must not be the process-wide client the DAOs share.
+if "auth_client" not in st.session_state:
+    try:
+        st.session_state["auth_client"] = get_supabase(shared=False)
+    except Exception:
+        # handled below by services init try/except as well
+        st.session_state["auth_client"] = None
+sb = st.session_state["auth_client"]
 
 if "user" not in st.session_state:
     st.session_state["user"] = None
 
+# Embedded backends run single-node without Supabase auth
+LOCAL_MODE = STORAGE_BACKEND != "supabase"
+
 def sign_up(email: str, password: str, name: str):
     try:
         if not sb:
@@ -73,11 +86,13 @@ def login(email: str, password: str):
 def logout():
     st.session_state.pop("user", None)
 
-# Initialize services
+# Initialize services once per process; every session and rerun reuses them (and the pooled client)
+@st.cache_resource
+def get_services():
+    return VCSService(), BranchService(), HistoryService(), DiffService(), PackService(), SearchService()
+
 try:
-    vcs = VCSService()
-    branches = BranchService()
-    history = HistoryService()
+    vcs, branches, history, diffs, packs, search = get_services()
 except Exception as e:
     st.error("❌ Supabase configuration missing!")
     st.markdown("""
@@ -92,7 +107,7 @@ except Exception as e:
     """)
     st.stop()
 
-if st.session_state["user"] is None:
+if not LOCAL_MODE and st.session_state["user"] is None:
     auth_tab = st.radio("Account", ["Login", "Sign Up"], horizontal=True)
     if auth_tab == "Sign Up":
         st.subheader("📝 Sign Up")
@@ -121,10 +136,32 @@ if st.session_state["user"] is None:
 # -----------------------
 # Sidebar: Repository selection and creation (only for logged-in users)
 # -----------------------
-st.sidebar.write(f"Logged in as: {st.session_state['user'].email}")
-if st.sidebar.button("Logout"):
-    logout()
-    st.rerun()
+if LOCAL_MODE:
+    st.sidebar.write(f"Local mode ({STORAGE_BACKEND}: {SQLITE_PATH})")
+else:
+    st.sidebar.write(f"Logged in as: {st.session_state['user'].email}")
+    if st.sidebar.button("Logout"):
+        logout()
+        st.rerun()
+
+# Query tracing: per-operation latency, rows and bytes of sampled storage queries
+with st.sidebar.expander("Query tracing"):
+    from backends import tracing
+    if tracing.query_stats is None:
+        st.caption("Tracing is off; set trace_sample_rate (e.g. 0.1) to enable it.")
+    else:
+        snapshot = tracing.query_stats.snapshot()
+        st.caption(f"Sample rate {snapshot['sample_rate']:g}")
+        st.dataframe([
+            {"operation": t["operation"], "dao": t["dao"], "caller": t["caller"], "count": t["count"],
+             "avg ms": round(t["avg_s"] * 1000, 2), "max ms": round(t["max_s"] * 1000, 2),
+             "rows": t["rows"], "bytes": t["bytes"]}
+            for t in snapshot["series"]
+        ])
+        st.download_button("Export JSON", tracing.query_stats.to_json(), "query_stats.json", "application/json")
+        st.download_button("Export Prometheus", tracing.query_stats.to_prometheus(), "query_stats.prom", "text/plain")
+        if st.button("Reset tracing"):
+            tracing.query_stats.reset()
 
 st.sidebar.header("Repositories")
 repos = vcs.list_repos()
@@ -146,20 +183,56 @@ with st.sidebar.expander("Create Repository"):
             except VCSError as e:
                 st.error(str(e))
 
+with st.sidebar.expander("Backup"):
+    if selected_repo_id and st.button("Export repository"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "repo.pack")
+            try:
+                info = packs.export_repo(selected_repo_id, path)
+                with open(path, "rb") as fh:
+                    st.download_button("Download pack", fh.read(), file_name=f"repo-{selected_repo_id}.pack")
+                st.caption(f"{info['commits']} commits, {info['objects']} objects, {info['bytes']} bytes")
+            except PackError as e:
+                st.error(str(e))
+    with st.form("import_pack_form", clear_on_submit=True):
+        pack_upload = st.file_uploader("Pack file")
+        import_name = st.text_input("New repository name (optional)")
+        import_submit = st.form_submit_button("Import")
+        if import_submit and pack_upload is not None:
+            # The pack is memory-mapped, so it has to be on disk
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "upload.pack")
+                with open(path, "wb") as fh:
+                    fh.write(pack_upload.getbuffer())
+                try:
+                    result = packs.import_pack(path, import_name.strip() or None)
+                    st.success(f"Imported as repository {result['repo']['repo_id']}")
+                    st.rerun()
+                except PackError as e:
+                    st.error(str(e))
+
 # -----------------------
 # Main Panels
 # -----------------------
+HISTORY_PAGE_SIZE = 50
+
 if not selected_repo_id:
     st.info("Select or create a repository to begin.")
     st.stop()
 
+# Files, the first history page and branches are fetched concurrently
+view = asyncio.run(load_repo_view(
+    AsyncVCSService(vcs), AsyncHistoryService(history), AsyncBranchService(branches),
+    selected_repo_id, HISTORY_PAGE_SIZE,
+))
+
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Files")
-    files = vcs.list_files_in_repo(selected_repo_id)
+    files = view["files"]
     if files:
-        st.table([{ "file_id": f["file_id"], "filename": f["filename"] } for f in files])
+        st.table([{ "file_id": f["file_id"], "filename": f["filename"], "size": f["size"] } for f in files])
     else:
         st.write("No files yet.")
 
@@ -175,6 +248,37 @@ with col1:
             except VCSError as e:
                 st.error(str(e))
 
+    with st.form("upload_file_form", clear_on_submit=True):
+        st.caption("Upload a text file; large files are stored in chunks and never read whole")
+        upload = st.file_uploader("File")
+        upload_submit = st.form_submit_button("Upload File")
+        if upload_submit and upload is not None:
+            try:
+                text = io.TextIOWrapper(upload, encoding="utf-8", errors="replace", newline="")
+                vcs.add_file_stream(selected_repo_id, upload.name, iter(lambda: text.read(64 * 1024), ""))
+                st.success("File uploaded")
+                st.rerun()
+            except VCSError as e:
+                st.error(str(e))
+
+    if LOCAL_MODE:
+        with st.form("add_directory_form", clear_on_submit=True):
+            st.caption("Add every file under a local directory; only new and changed files are uploaded")
+            directory = st.text_input("Directory")
+            remove_missing = st.checkbox("Delete files missing from the directory", value=True)
+            add_directory_submit = st.form_submit_button("Add Directory")
+            if add_directory_submit and directory.strip():
+                try:
+                    result = vcs.add_directory(selected_repo_id, directory.strip(), delete_missing=remove_missing)
+                    st.success(
+                        f"{result['added']} added, {result['updated']} updated, {result['deleted']} deleted, "
+                        f"{result['unchanged']} unchanged in {result['seconds']}s ({result['files_per_second']} files/s)"
+                    )
+                    if result["skipped"]:
+                        st.caption(f"Skipped {len(result['skipped'])} non-text files")
+                except VCSError as e:
+                    st.error(str(e))
+
     with st.form("update_file_form", clear_on_submit=True):
         st.caption("Update filename or content of an existing file")
         file_options = [f"{f['file_id']}: {f['filename']}" for f in files] if files else []
@@ -198,38 +302,109 @@ with col2:
     st.subheader("Commits")
     with st.form("commit_form", clear_on_submit=True):
         message = st.text_input("Commit Message")
+        commit_branches = view["branches"]
+        commit_branch = st.selectbox("On Branch", ["-"] + [f"{b['branch_id']}: {b['name']}" for b in commit_branches])
         commit_submit = st.form_submit_button("Create Commit")
         if commit_submit and message.strip():
             try:
-                vcs.make_commit(selected_repo_id, message.strip())
+                commit_branch_id = int(commit_branch.split(":", 1)[0]) if commit_branch != "-" else None
+                vcs.make_commit(selected_repo_id, message.strip(), branch_id=commit_branch_id)
                 st.success("Commit created")
                 st.rerun()
             except VCSError as e:
                 st.error(str(e))
 
-    try:
-        commits = history.show_history(selected_repo_id)
-        if commits:
-            st.table(commits)
-            commit_ids = [str(c["commit_id"]) for c in commits]
-            rollback_id = st.selectbox("Rollback to commit", ["-"] + commit_ids)
-            if st.button("Rollback") and rollback_id != "-":
-                try:
-                    vcs.rollback_commit(int(rollback_id))
+    # History loads one keyset page at a time; "Load more" fetches the next page on demand
+    pages_loaded = st.session_state.setdefault("history_pages", {}).get(selected_repo_id, 1)
+    commits, cursor = list(view["commits"]), view["cursor"]
+    for _ in range(pages_loaded - 1):
+        if cursor is None:
+            break
+        page, cursor = history.show_history_page(selected_repo_id, HISTORY_PAGE_SIZE, cursor)
+        commits.extend(page)
+    if commits:
+        st.table(commits)
+        if cursor is not None and st.button("Load more commits"):
+            st.session_state["history_pages"][selected_repo_id] = pages_loaded + 1
+            st.rerun()
+        commit_ids = [str(c["commit_id"]) for c in commits]
+        rollback_id = st.selectbox("Rollback to commit", ["-"] + commit_ids)
+        rollback_preview = st.checkbox("Preview changes only (dry run)")
+        if st.button("Rollback") and rollback_id != "-":
+            try:
+                changes = vcs.rollback_commit(int(rollback_id), dry_run=rollback_preview)
+                if rollback_preview:
+                    st.write(f"{len(changes['modified'])} modified, {len(changes['restored'])} restored, "
+                             f"{len(changes['deleted'])} deleted, {changes['bytes']} bytes to write")
+                    st.json(changes)
+                else:
                     st.success("Rollback complete")
                     st.experimental_rerun()
-                except VCSError as e:
+            except VCSError as e:
+                st.error(str(e))
+    else:
+        st.write("No commits yet.")
+
+    if commits:
+        with st.expander("Diff"):
+            # Commit pairs are cached by DiffService; the last result is kept across reruns
+            diff_from = st.selectbox("From commit", commit_ids, index=min(1, len(commit_ids) - 1), key="diff_from")
+            diff_to = st.selectbox("To", ["working files"] + commit_ids, key="diff_to")
+            if st.button("Show diff"):
+                try:
+                    if diff_to == "working files":
+                        st.session_state["diff_result"] = diffs.diff_working(int(diff_from))
+                    else:
+                        st.session_state["diff_result"] = diffs.diff_commits(int(diff_from), int(diff_to))
+                except DiffError as e:
                     st.error(str(e))
-        else:
-            st.write("No commits yet.")
-    except HistoryError as e:
-        st.info(str(e))
+            result = st.session_state.get("diff_result")
+            if result and result["old"] == int(diff_from):
+                st.write(f"{len(result['files'])} file(s) changed, +{result['added']} -{result['removed']}")
+                for f in result["files"]:
+                    label = f"{f['old_filename']} → {f['filename']}" if f.get("old_filename") else f["filename"]
+                    st.markdown(f"**{label}** ({f['status']})")
+                    if f["diff"]:
+                        st.code(f["diff"], language="diff")
+
+        with st.expander("Blame"):
+            blame_commit = st.selectbox("At commit", commit_ids, key="blame_commit")
+            blame_files = history.get_files_in_commit(int(blame_commit))
+            blame_file = st.selectbox("File", [f"{f['file_id']}: {f['filename'] or 'file-' + str(f['file_id'])}" for f in blame_files],
+                                      key="blame_file")
+            if blame_file and st.button("Show blame"):
+                try:
+                    annotated = history.blame(int(blame_commit), int(blame_file.split(":", 1)[0]))
+                    st.code("\n".join(f"{l['commit_id']:>6} {l['line_number']:>5}  {l['content']}" for l in annotated))
+                except HistoryError as e:
+                    st.error(str(e))
+
+with st.expander("Search History"):
+    search_query = st.text_input("Find text in any committed version", key="search_query")
+    search_regex = st.checkbox("Regular expression", key="search_regex")
+    search_case = st.checkbox("Ignore case", key="search_case")
+    search_col1, search_col2 = st.columns(2)
+    try:
+        if search_col1.button("Search") and search_query:
+            hits = search.search(selected_repo_id, search_query, regex=search_regex, ignore_case=search_case)
+            st.write(f"{len(hits)} matching version(s)")
+            for hit in hits:
+                st.markdown(f"**{hit['filename'] or 'file-' + str(hit['file_id'])}** v{hit['version_number']} (commit {hit['commit_id']})")
+                st.code("\n".join(f"{n}: {line}" for n, line in hit["lines"][:20]))
+        if search_col2.button("Pickaxe") and search_query:
+            events = search.pickaxe(selected_repo_id, search_query, regex=search_regex, ignore_case=search_case)
+            if events:
+                st.table(events)
+            else:
+                st.write("Never committed.")
+    except SearchError as e:
+        st.error(str(e))
 
 st.subheader("Branches")
 branch_col1, branch_col2 = st.columns(2)
 with branch_col1:
     try:
-        branch_list = branches.list_branches(selected_repo_id)
+        branch_list = view["branches"]
         if branch_list:
             st.table([{ "branch_id": b["branch_id"], "name": b["name"], "head_commit_id": b.get("head_commit_id") } for b in branch_list])
         else:
@@ -263,9 +438,12 @@ with st.expander("Merge Branches"):
             try:
                 source_id = int(source_sel.split(":", 1)[0])
                 target_id = int(target_sel.split(":", 1)[0])
-                branches.merge_branches(source_id, target_id)
-                st.success("Merge complete (head updated)")
+                merged = branches.merge_branches(source_id, target_id)
+                st.success(f"Merge complete ({merged['merge']['status'].replace('_', ' ')})")
                 st.experimental_rerun()
+            except MergeConflictError as e:
+                st.error(str(e))
+                st.json(e.conflicts)
             except BranchError as e:
                 st.error(str(e))
         else: